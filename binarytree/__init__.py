@@ -0,0 +1,7 @@
+from .binarytree import Node, BinarySearchTree
+from .redblacktree import RedBlackNode, RedBlackTree
+from .immutable import PersistentNode, ImmutableRedBlackTree
+from .compact import CompactRedBlackTree
+from .splaytree import SplayTree
+from .treap import TreapNode, Treap
+from .bplustree import BPlusTree
@@ -5,11 +5,18 @@ MIN_VAL = -MAX_VAL - 1
 
 
 class Node(object):
+    __slots__ = ('left', 'right', 'value', 'parent', 'size')
+
     def __init__(self, value):
         self.left = None
         self.right = None
         self.value = value
         self.parent = None
+        # number of nodes in the subtree rooted here, kept up to date by the tree
+        self.size = 1
+
+    def update_size(self):
+        self.size = 1 + (self.left.size if self.left else 0) + (self.right.size if self.right else 0)
 
     def set_left(self, node):
         self.left = node
@@ -29,18 +36,10 @@ class Node(object):
         return max
 
     def get_inorder_predecessor(self):
-        predecessor = None
-        current = self.left
-
-        while current:
-            if current.right:
-                predecessor = current.get_max_successor()
-                break
-            else:
-                predecessor = current
-                current = current.left
-
-        return predecessor
+        """
+        Biggest node of the left subtree.
+        """
+        return self.left.get_max_successor() if self.left else None
 
     @property
     def has_one_child(self):
@@ -54,10 +53,6 @@ class Node(object):
     def grandparent(self):
         return None if not self.parent else self.parent.parent
 
-    @property
-    def is_leaf(self):
-        return self.left is None and self.right is None
-
     @property
     def has_grandchildren(self):
         return ((self.left and (self.left.lett or self.right.left)) 
@@ -76,13 +71,21 @@ class Node(object):
         return "%s" % self.value
 
     def __str__(self):
-        txt = '%s' % self._print_node()
-        if not self.is_leaf:
-            left = str(self.left) if self.left else 'None'
-            right = str(self.right) if self.right else 'None'
-            txt += ' -> [%s | %s]' % (left, right) 
+        # pieces left to write, nodes expanded as they come: no recursion
+        parts = []
+        todo = [self]
+        while todo:
+            item = todo.pop()
+            if isinstance(item, str):
+                parts.append(item)
+            elif not item:
+                parts.append('None')
+            else:
+                parts.append('%s' % item._print_node())
+                if not item.is_leaf:
+                    todo.extend((']', item.right, ' | ', item.left, ' -> ['))
 
-        return txt  
+        return ''.join(parts)
 
 
 class BinarySearchTree(object):
@@ -91,10 +94,13 @@ class BinarySearchTree(object):
     - each node has a left and right sub-nodes. 
     - every node has its parent link as well.
     - node.left < node < node.right invariant
+    - every node knows the size of its subtree, for O(1) len and O(h) rank/select
     """
 
-    def __init__(self, value):
-        self.root = Node(value)
+    node_class = Node
+
+    def __init__(self, value=None):
+        self.root = None if value is None else self.node_class(value)
 
     def __str__(self):
         if self.root:
@@ -105,7 +111,7 @@ class BinarySearchTree(object):
     def __contains__(self, value):
         try:
             self.find(value)
-        raise KeyError:
+        except KeyError:
             return False
 
         return True
@@ -123,37 +129,303 @@ class BinarySearchTree(object):
         
         return current
 
+    def __len__(self):
+        return self.root.size if self.root else 0
+
     def size(self):
-        stack = [self]
-        size = 0
+        """
+        Number of values in the tree.
+        Run time: O(1)
+        """
+        return len(self)
 
-        while stack:
-            size += 1
-            current = stack.pop()
-            if current.left:
-                stack.append(self.left)
-            if self.right:
-                current.append(self.right)
+    def _update_sizes(self, node):
+        """
+        Recomputes subtree sizes from node up to the root, after node's subtree
+        changed shape.
+        """
+        while node is not None:
+            node.update_size()
+            node = node.parent
 
-        return size
+    def rank(self, value):
+        """
+        Number of values < value, i.e. the index value has (or would have).
+        Run time: O(h), O(logn) if balanced
+        """
+        rank = 0
+        node = self.root
+        while node:
+            if node.value < value:
+                rank += 1 + (node.left.size if node.left else 0)
+                node = node.right
+            else:
+                node = node.left
 
-    def insert(self, value, node=None):
-        if node is None:
-            node = self.root
+        return rank
 
-        if value < node.value:
-            if node.left:
-                return self.insert(value, node.left)
+    def select(self, i):
+        """
+        The value at index i in sorted order (negative counts from the end).
+        Run time: O(h), O(logn) if balanced
+        """
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('tree index out of range')
+
+        node = self.root
+        while True:
+            left = node.left.size if node.left else 0
+            if i < left:
+                node = node.left
+            elif i == left:
+                return node.value
+            else:
+                i -= left + 1
+                node = node.right
+
+    def count_range(self, lo=None, hi=None):
+        """
+        Number of values x with lo <= x < hi. None means unbounded.
+        Run time: O(h), O(logn) if balanced
+        """
+        count = len(self) if hi is None else self.rank(hi)
+        if lo is not None:
+            count -= self.rank(lo)
+        return max(count, 0)
+
+    ##########################
+    # Iteration
+    #
+    # Iterators go successor by successor through the parent links: O(1)
+    # amortized per value and O(1) extra memory, no recursion nor stack.
+    # The tree must not change while iterating over it.
+
+    @staticmethod
+    def _successor(node):
+        if node.right:
+            node = node.right
+            while node.left:
+                node = node.left
+            return node
+
+        parent = node.parent
+        while parent is not None and node is parent.right:
+            node, parent = parent, parent.parent
+        return parent
+
+    @staticmethod
+    def _predecessor(node):
+        if node.left:
+            node = node.left
+            while node.right:
+                node = node.right
+            return node
+
+        parent = node.parent
+        while parent is not None and node is parent.left:
+            node, parent = parent, parent.parent
+        return parent
+
+    def _lower_bound(self, key, inclusive=True):
+        """
+        First node with value >= key (> key if not inclusive), or None.
+        Run time: O(h), O(logn) if balanced
+        """
+        found = None
+        node = self.root
+        while node:
+            if node.value < key or (not inclusive and not key < node.value):
+                node = node.right
             else:
-                node.left = Node(value)
-                node.left.parent = node
+                found = node
+                node = node.left
+
+        return found
+
+    def __iter__(self):
+        return self.irange()
+
+    def __reversed__(self):
+        node = self.root
+        if not node:
+            return
+        while node.right:
+            node = node.right
 
+        while node:
+            yield node.value
+            node = self._predecessor(node)
+
+    def irange(self, lo=None, hi=None, inclusive=(True, True)):
+        """
+        Yields the values between lo and hi, in order. None means unbounded;
+        inclusive tells whether lo and hi themselves are in the range.
+        Run time: O(h) to start, then O(1) amortized per value
+        """
+        if lo is None:
+            node = self.root
+            while node and node.left:
+                node = node.left
         else:
-            if node.right:
-                return self.insert(value, node.right)
+            node = self._lower_bound(lo, inclusive[0])
+
+        while node:
+            value = node.value
+            if hi is not None and (hi < value if inclusive[1] else not value < hi):
+                return
+            yield value
+            node = self._successor(node)
+
+    def items_from(self, key):
+        """
+        Yields the values >= key, in order: a scan resumed where it left off.
+        """
+        return self.irange(key)
+
+    @classmethod
+    def from_sorted(cls, iterable):
+        """
+        Builds a perfectly balanced tree from sorted values (duplicates allowed):
+        each subtree's root is the middle of its range.
+        Raises ValueError if the input is not sorted.
+        Run time: O(n)
+        """
+        values = list(iterable)
+        for previous, value in zip(values, values[1:]):
+            if value < previous:
+                raise ValueError('input is not sorted: %r after %r' % (value, previous))
+
+        tree = cls()
+        tree.root = tree._build(values, 0, len(values), 0)
+        return tree
+
+    def _build(self, values, lo, hi, depth):
+        """
+        Balanced subtree over values[lo:hi], returning its root (recursion depth
+        is only logn).
+        """
+        if lo >= hi:
+            return None
+
+        mid = (lo + hi) // 2
+        node = self.node_class(values[mid])
+        node.size = hi - lo
+        left = self._build(values, lo, mid, depth + 1)
+        if left:
+            node.set_left(left)
+        right = self._build(values, mid + 1, hi, depth + 1)
+        if right:
+            node.set_right(right)
+        return node
+
+    def split(self, key):
+        """
+        Splits the tree in two along the search path of key, returning
+        (values < key, values >= key) as two trees of this class. This tree is
+        left empty: its nodes move, none is copied.
+        Run time: O(h)
+        """
+        left, right = type(self)(), type(self)()
+        # last node of each side, where the next piece hangs
+        left_tail = right_tail = None
+        path = []
+
+        node = self.root
+        while node:
+            path.append(node)
+            if node.value < key:
+                # node and its left subtree go left, node.right is still to split
+                if left_tail is None:
+                    left.root = node
+                    node.parent = None
+                else:
+                    left_tail.set_right(node)
+                left_tail = node
+                node, left_tail.right = node.right, None
             else:
-                node.right = Node(value)
-                node.right.parent = node
+                if right_tail is None:
+                    right.root = node
+                    node.parent = None
+                else:
+                    right_tail.set_left(node)
+                right_tail = node
+                node, right_tail.left = node.left, None
+
+        for node in reversed(path):
+            node.update_size()
+
+        self.root = None
+        return left, right
+
+    @classmethod
+    def join(cls, left, right):
+        """
+        A tree with the values of left then right, all of left's being <= right's.
+        left's biggest node becomes the root, over both trees. left and right are
+        left empty.
+        Run time: O(h)
+        """
+        tree = cls()
+        if not left.root or not right.root:
+            tree.root = left.root or right.root
+            left.root = right.root = None
+            return tree
+
+        middle = left.root.get_max_successor()
+        changed = middle.parent
+        left._transplant(middle, middle.left)
+        left._update_sizes(changed)
+
+        if left.root:
+            middle.set_left(left.root)
+        middle.set_right(right.root)
+        middle.update_size()
+
+        tree.root = middle
+        left.root = right.root = None
+        return tree
+
+    def insert(self, value, unique=False):
+        """
+        Returns the new node. Duplicates go right, unless unique: then a value
+        already there is left alone and None returned, in the same descent.
+        """
+        return self._insert_node(self.node_class(value), unique)
+
+    def _insert_node(self, new_node, unique=False):
+        """
+        Walks down from the root and hangs new_node as a leaf. Iterative, so sorted
+        input (a linked list in disguise) doesn't hit the recursion limit.
+        """
+        if self.root is None:
+            self.root = new_node
+            return new_node
+
+        node = self.root
+        while True:
+            # new_node ends up under every node on the way down
+            node.size += 1
+            if new_node.value < node.value:
+                if node.left:
+                    node = node.left
+                else:
+                    node.set_left(new_node)
+                    return new_node
+
+            else:
+                if unique and not node.value < new_node.value:
+                    # already there: take back the sizes counted on the way down
+                    while node is not None:
+                        node.size -= 1
+                        node = node.parent
+                    return None
+                if node.right:
+                    node = node.right
+                else:
+                    node.set_right(new_node)
+                    return new_node
 
     def _transplant(self, nodeA, nodeB):
         """
@@ -174,6 +446,37 @@ class BinarySearchTree(object):
         nodeA.left = None
         nodeA.right = None
 
+    def _rotate_up(self, node):
+        """
+        Rotates node above its parent (right rotation if it's a left child, left
+        rotation otherwise), keeping subtree sizes right.
+        Run time: O(1)
+        """
+        parent = node.parent
+        grandparent = parent.parent
+        if node is parent.left:
+            parent.left = node.right
+            if node.right:
+                node.right.parent = parent
+            node.right = parent
+        else:
+            parent.right = node.left
+            if node.left:
+                node.left.parent = parent
+            node.left = parent
+        parent.parent = node
+
+        node.parent = grandparent
+        if grandparent is None:
+            self.root = node
+        elif grandparent.left is parent:
+            grandparent.left = node
+        else:
+            grandparent.right = node
+
+        node.size = parent.size
+        parent.update_size()
+
     def delete(self, value):
         """
         1. If it's a leaf, just remove it.
@@ -183,9 +486,11 @@ class BinarySearchTree(object):
         target = self.find(value)
 
         if target.is_leaf:
+            changed = target.parent
             self._transplant(target, None)
 
         elif target.has_one_child:
+            changed = target.parent
             if target.left:
                 self._transplant(target, target.left)
             else:
@@ -194,10 +499,17 @@ class BinarySearchTree(object):
         else:
             in_order_predecessor = target.get_inorder_predecessor()
             # ideally, should alternate with in_order_successor
-            self._transplant(in_order_predecessor, in_order_predecessor.left)
-            in_order_predecessor.left = target.left
-            in_order_predecessor.right = target.right
+            if in_order_predecessor.parent is not target:
+                # below the predecessor once it takes target's place
+                changed = in_order_predecessor.parent
+                self._transplant(in_order_predecessor, in_order_predecessor.left)
+                in_order_predecessor.set_left(target.left)
+            else:
+                changed = in_order_predecessor
+            in_order_predecessor.set_right(target.right)
             self._transplant(target, in_order_predecessor)
+
+        self._update_sizes(changed)
             
 
 ##########################
@@ -206,41 +518,28 @@ class BinarySearchTree(object):
 # A collection of functions on binary trees
 
 def is_valid_bst(tree):
+    """
+    In-order values never decrease, walking successor by successor.
+    """
+    previous = None
+    for i, value in enumerate(tree):
+        if i and value < previous:
+            return False
+        previous = value
 
-    def inspect(node, min_val=None, max_val=None):
-        if min_val is None:
-          min_val = MIN_VAL
-        if max_val is None:
-          max_val = MAX_VAL
-
-        if node.value < max_val and node.value > min_val:
-          is_left_valid = True
-          if node.left:
-              is_left_valid = inspect(node.left, min_val, node.value)
-
-          is_right_valid = True
-          if is_left_valid and node.right:
-              is_right_valid = inspect(node.right, node.value, max_val)
-
-          return is_left_valid and is_right_valid
-
-        else:
-          return False
+    return True
 
-    return loop(tree.root)
-        
 
 def is_balanced(tree):
     """
     No leaf should have height difference bigger than 1 to any other leaf.
     """
-    max_depth = None
-    is_balanced = True
+    min_depth = max_depth = None
 
     # stack
-    nodes_to_visit = [(node, 0)]
+    nodes_to_visit = [(tree.root, 0)] if tree.root else []
 
-    while nodes_to_visit and is_balanced:
+    while nodes_to_visit:
       current, depth = nodes_to_visit.pop()
 
       if current.left:
@@ -248,16 +547,16 @@ def is_balanced(tree):
       if current.right:
           nodes_to_visit.append((current.right, depth+1))
 
-      if current.is_leaf():
-          if not max_depth:
-              max_depth = depth
-          else: 
-              if abs(depth - max_depth) > 1:
-                  is_balanced = False
-              elif depth > max_depth:
-                  max_depth = depth
+      if current.is_leaf:
+          if max_depth is None:
+              min_depth = max_depth = depth
+          else:
+              min_depth = min(min_depth, depth)
+              max_depth = max(max_depth, depth)
+              if max_depth - min_depth > 1:
+                  return False
 
-    return is_balanced
+    return True
 
 
 
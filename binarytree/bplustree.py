@@ -0,0 +1,398 @@
+"""
+B+ tree: up to `fanout` keys per node instead of one, so a lookup is a few
+levels of bisect over short lists (C code) rather than ~logn Python comparisons
+and pointer hops, and a range scan reads whole leaves through their links.
+
+Against RedBlackTree:
+
+    python -m binarytree.bplustree --sizes 100000 1000000 --fanouts 32 128
+"""
+from bisect import bisect_left, bisect_right
+
+
+class _Node(object):
+    """
+    A leaf (children is None) holds sorted keys and links to its neighbour
+    leaves. A branch holds len(keys) + 1 children, with
+    children[i] < keys[i] <= children[i + 1].
+    """
+
+    __slots__ = ('keys', 'children', 'next', 'prev')
+
+    def __init__(self, keys, children=None):
+        self.keys = keys
+        self.children = children
+        self.next = None
+        self.prev = None
+
+    def __str__(self):
+        return '[%s]' % ' '.join(str(key) for key in self.keys)
+
+
+class BPlusTree(object):
+    """
+    B+ tree of unique keys, every leaf at the same depth:
+
+    - keys live in the leaves, sorted lists of at most fanout keys, chained
+      both ways for in-order and reversed scans
+    - branches only route: their keys are separators, their children are at
+      most fanout
+    - every node but the root is at least half full, so the height is at most
+      log(n) / log(fanout / 2): 4 levels for 10^7 keys with fanout 128
+
+    Inserting a key that is already there does nothing. Same find, insert,
+    delete and iteration API as BinarySearchTree, without rank/select.
+    """
+
+    def __init__(self, fanout=128):
+        if fanout < 4:
+            raise ValueError('fanout must be at least 4, not %r' % fanout)
+        self.fanout = fanout
+        self.root = _Node([])
+        self.size = 0
+
+    @classmethod
+    def from_sorted(cls, iterable, fanout=128):
+        """
+        Packs sorted unique keys into full leaves (spread evenly, so each is at
+        least half full), then builds the branch levels over them.
+        Raises ValueError if the input is not strictly increasing.
+        Run time: O(n)
+        """
+        keys = list(iterable)
+        for previous, key in zip(keys, keys[1:]):
+            if not previous < key:
+                raise ValueError('input is not sorted and unique: %r after %r' % (key, previous))
+
+        tree = cls(fanout)
+        if not keys:
+            return tree
+
+        level = [_Node(chunk) for chunk in _spread(keys, fanout)]
+        for leaf, following in zip(level, level[1:]):
+            leaf.next = following
+            following.prev = leaf
+        # smallest key under each node of the level, to separate them above
+        lows = [leaf.keys[0] for leaf in level]
+
+        while len(level) > 1:
+            parents, parent_lows = [], []
+            start = 0
+            for chunk in _spread(level, fanout):
+                stop = start + len(chunk)
+                parents.append(_Node(lows[start + 1:stop], chunk))
+                parent_lows.append(lows[start])
+                start = stop
+            level, lows = parents, parent_lows
+
+        tree.root = level[0]
+        tree.size = len(keys)
+        return tree
+
+    def __str__(self):
+        """
+        The keys level by level, one node in brackets.
+        """
+        if not self.size:
+            return "[]"
+
+        lines = []
+        level = [self.root]
+        while level:
+            lines.append(' '.join(str(node) for node in level))
+            if level[0].children is None:
+                break
+            level = [child for node in level for child in node.children]
+
+        return '\n'.join(lines)
+
+    def __len__(self):
+        return self.size
+
+    def height(self):
+        """
+        Number of levels, leaves included.
+        """
+        height = 1
+        node = self.root
+        while node.children is not None:
+            node = node.children[0]
+            height += 1
+        return height
+
+    def _leaf(self, key):
+        node = self.root
+        while node.children is not None:
+            node = node.children[bisect_right(node.keys, key)]
+        return node
+
+    def __contains__(self, key):
+        keys = self._leaf(key).keys
+        i = bisect_left(keys, key)
+        return i < len(keys) and keys[i] == key
+
+    def find(self, key):
+        """
+        The stored key equal to key; KeyError if there's none.
+        Run time: O(logn)
+        """
+        keys = self._leaf(key).keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return keys[i]
+        raise KeyError(key)
+
+    def _path(self, key):
+        """
+        The leaf where key goes and the (branch, child index) pairs above it.
+        """
+        path = []
+        node = self.root
+        while node.children is not None:
+            i = bisect_right(node.keys, key)
+            path.append((node, i))
+            node = node.children[i]
+        return node, path
+
+    def insert(self, key):
+        """
+        Adds key to its leaf; a full node splits in two halves and hands a
+        separator up, which can split its parent in turn, up to a new root.
+        Run time: O(logn)
+        """
+        leaf, path = self._path(key)
+        keys = leaf.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return
+        keys.insert(i, key)
+        self.size += 1
+        if len(keys) <= self.fanout:
+            return
+
+        half = len(keys) // 2
+        new = _Node(keys[half:])
+        del keys[half:]
+        new.prev, new.next = leaf, leaf.next
+        if leaf.next is not None:
+            leaf.next.prev = new
+        leaf.next = new
+        separator = new.keys[0]
+
+        while path:
+            parent, i = path.pop()
+            parent.keys.insert(i, separator)
+            parent.children.insert(i + 1, new)
+            if len(parent.children) <= self.fanout:
+                return
+
+            half = len(parent.keys) // 2
+            separator = parent.keys[half]
+            new = _Node(parent.keys[half + 1:], parent.children[half + 1:])
+            del parent.keys[half:]
+            del parent.children[half + 1:]
+
+        self.root = _Node([separator], [self.root, new])
+
+    def delete(self, key):
+        """
+        Removes key from its leaf; a node left under half full borrows from a
+        sibling, or merges with it, which can leave its parent under half full
+        in turn. KeyError if key is not there.
+        Run time: O(logn)
+        """
+        leaf, path = self._path(key)
+        keys = leaf.keys
+        i = bisect_left(keys, key)
+        if i == len(keys) or keys[i] != key:
+            raise KeyError(key)
+        del keys[i]
+        self.size -= 1
+
+        half = self.fanout // 2
+        node = leaf
+        while path and len(node.keys if node.children is None else node.children) < half:
+            parent, i = path.pop()
+            self._rebalance(parent, i)
+            node = parent
+
+        if self.root.children is not None and len(self.root.children) == 1:
+            self.root = self.root.children[0]
+
+    def _rebalance(self, parent, i):
+        """
+        parent.children[i] is under half full: takes a key from a sibling with
+        some to spare, or else merges with one.
+        """
+        half = self.fanout // 2
+        child = parent.children[i]
+        left = parent.children[i - 1] if i > 0 else None
+        right = parent.children[i + 1] if i + 1 < len(parent.children) else None
+
+        if child.children is None:
+            if left is not None and len(left.keys) > half:
+                child.keys.insert(0, left.keys.pop())
+                parent.keys[i - 1] = child.keys[0]
+            elif right is not None and len(right.keys) > half:
+                child.keys.append(right.keys.pop(0))
+                parent.keys[i] = right.keys[0]
+            else:
+                if left is None:
+                    # merge right into child instead
+                    left, child, i = child, right, i + 1
+                left.keys.extend(child.keys)
+                left.next = child.next
+                if child.next is not None:
+                    child.next.prev = left
+                del parent.keys[i - 1]
+                del parent.children[i]
+            return
+
+        if left is not None and len(left.children) > half:
+            child.keys.insert(0, parent.keys[i - 1])
+            child.children.insert(0, left.children.pop())
+            parent.keys[i - 1] = left.keys.pop()
+        elif right is not None and len(right.children) > half:
+            child.keys.append(parent.keys[i])
+            child.children.append(right.children.pop(0))
+            parent.keys[i] = right.keys.pop(0)
+        else:
+            if left is None:
+                left, child, i = child, right, i + 1
+            left.keys.append(parent.keys[i - 1])
+            left.keys.extend(child.keys)
+            left.children.extend(child.children)
+            del parent.keys[i - 1]
+            del parent.children[i]
+
+    ##########################
+    # Iteration
+    #
+    # Leaf by leaf through the links. The tree must not change while iterating
+    # over it.
+
+    def _first_leaf(self):
+        node = self.root
+        while node.children is not None:
+            node = node.children[0]
+        return node
+
+    def __iter__(self):
+        leaf = self._first_leaf()
+        while leaf is not None:
+            yield from leaf.keys
+            leaf = leaf.next
+
+    def __reversed__(self):
+        node = self.root
+        while node.children is not None:
+            node = node.children[-1]
+
+        while node is not None:
+            yield from reversed(node.keys)
+            node = node.prev
+
+    def irange(self, lo=None, hi=None, inclusive=(True, True)):
+        """
+        Yields the keys between lo and hi, in order. None means unbounded;
+        inclusive tells whether lo and hi themselves are in the range.
+        Run time: O(logn) to start, then O(1) per key
+        """
+        if lo is None:
+            leaf, start = self._first_leaf(), 0
+        else:
+            leaf = self._leaf(lo)
+            start = (bisect_left if inclusive[0] else bisect_right)(leaf.keys, lo)
+
+        while leaf is not None:
+            keys = leaf.keys
+            if hi is not None and keys and not (keys[-1] < hi):
+                stop = (bisect_right if inclusive[1] else bisect_left)(keys, hi)
+                yield from keys[start:stop]
+                if stop < len(keys):
+                    return
+            else:
+                yield from keys[start:]
+            leaf, start = leaf.next, 0
+
+    def items_from(self, key):
+        """
+        Yields the keys >= key, in order: a scan resumed where it left off.
+        """
+        return self.irange(key)
+
+    def range(self, lo=None, hi=None):
+        """
+        Yields the keys x with lo <= x < hi, in order. None means unbounded.
+        """
+        return self.irange(lo, hi, inclusive=(True, False))
+
+
+def _spread(items, fanout):
+    """
+    Cuts items into as few chunks of at most fanout as possible, their sizes
+    differing by one at most.
+    """
+    count = -(-len(items) // fanout)
+    size, extra = divmod(len(items), count)
+    start = 0
+    for i in range(count):
+        stop = start + size + (i < extra)
+        yield items[start:stop]
+        start = stop
+
+
+def benchmark(sizes, fanouts=(32, 128), seed=0):
+    import random
+    import time
+
+    from .redblacktree import RedBlackTree
+
+    trees = [('redblack', RedBlackTree)]
+    trees += [('bplus_%d' % fanout, lambda fanout=fanout: BPlusTree(fanout)) for fanout in fanouts]
+    results = []
+    for n in sizes:
+        keys = random.Random(seed).sample(range(n * 10), n)
+        for name, factory in trees:
+            tree = factory()
+            start = time.perf_counter()
+            for key in keys:
+                tree.insert(key)
+            inserted = time.perf_counter()
+            for key in keys:
+                key in tree
+            looked_up = time.perf_counter()
+            for _ in tree:
+                pass
+            scanned = time.perf_counter()
+            for key in keys:
+                tree.delete(key)
+            deleted = time.perf_counter()
+
+            results.append({
+                'tree': name,
+                'size': n,
+                'inserts_per_sec': n / (inserted - start),
+                'lookups_per_sec': n / (looked_up - inserted),
+                'scanned_per_sec': n / (scanned - looked_up),
+                'deletes_per_sec': n / (deleted - scanned),
+            })
+
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='B+ tree vs red-black tree.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--fanouts', type=int, nargs='+', default=[32, 128])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print('%-10s %10s %14s %14s %14s %14s' % (
+        'tree', 'size', 'inserts/sec', 'lookups/sec', 'scanned/sec', 'deletes/sec'))
+    for r in benchmark(args.sizes, args.fanouts, args.seed):
+        print('%-10s %10d %14.0f %14.0f %14.0f %14.0f' % (
+            r['tree'], r['size'], r['inserts_per_sec'], r['lookups_per_sec'],
+            r['scanned_per_sec'], r['deletes_per_sec']))
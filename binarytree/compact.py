@@ -0,0 +1,602 @@
+"""
+Red-black tree stored as a struct of arrays: a node is an integer index into
+parallel arrays instead of a Python object.
+
+Memory and speed against the object nodes of RedBlackTree:
+
+    python -m binarytree.compact --sizes 100000 1000000
+"""
+from array import array
+
+BLACK = 0
+RED = 1
+
+# slot 0 is the NIL sentinel
+NIL = 0
+
+
+class CompactRedBlackTree(object):
+    """
+    Same red-black tree as RedBlackTree (same fix-ups, same in-order predecessor
+    on delete, same subtree sizes for rank/select), with node i spread over:
+
+    - left[i], right[i], parent[i]: array('q') of node indices, 0 being NIL
+    - size[i]: array('q'), the subtree size
+    - color[i]: a bytearray, BLACK (0) or RED (1)
+    - keys[i]: a list, or with typecode an array of that type (unboxed numbers)
+
+    About 41 bytes per node (plus the key object with a list), against ~90 for
+    a RedBlackNode and its attributes: no object header, no GC tracking, no
+    pointer per field. Deleted slots go on a free list, chained through left,
+    and are reused by the next inserts; arrays never shrink.
+
+    Nodes handed out (insert, find) are indices, valid until deleted.
+    """
+
+    def __init__(self, typecode=None):
+        self.typecode = typecode
+        # NIL: black, size 0, linked to itself
+        self.keys = [None] if typecode is None else array(typecode, [0])
+        self.left = array('q', [NIL])
+        self.right = array('q', [NIL])
+        self.parent = array('q', [NIL])
+        self.size = array('q', [0])
+        self.color = bytearray([BLACK])
+        self.root = NIL
+        # first free slot, NIL if none
+        self.free = NIL
+
+    @classmethod
+    def from_sorted(cls, iterable, typecode=None):
+        """
+        Builds a balanced tree from sorted values (duplicates allowed), colored
+        like RedBlackTree.from_sorted: node slots follow the sorted order, so
+        keys is the input as is. Raises ValueError if it is not sorted.
+        Run time: O(n)
+        """
+        values = list(iterable)
+        for previous, value in zip(values, values[1:]):
+            if value < previous:
+                raise ValueError('input is not sorted: %r after %r' % (value, previous))
+
+        n = len(values)
+        tree = cls(typecode)
+        tree.keys.extend(values)
+        zeros = bytes(8 * (n + 1))
+        left = tree.left = array('q', zeros)
+        right = tree.right = array('q', zeros)
+        parent = tree.parent = array('q', zeros)
+        size = tree.size = array('q', zeros)
+        color = tree.color = bytearray(n + 1)
+        red_depth = n.bit_length() - 1
+
+        def build(lo, hi, up, depth):
+            if lo >= hi:
+                return NIL
+            mid = (lo + hi) // 2
+            i = mid + 1
+            parent[i] = up
+            size[i] = hi - lo
+            if depth and depth == red_depth:
+                color[i] = RED
+            left[i] = build(lo, mid, i, depth + 1)
+            right[i] = build(mid + 1, hi, i, depth + 1)
+            return i
+
+        tree.root = build(0, n, NIL, 0)
+        return tree
+
+    def __len__(self):
+        return self.size[self.root]
+
+    def __str__(self):
+        """
+        Same format as RedBlackTree, built with an explicit stack: a degenerate
+        tree doesn't hit the recursion limit.
+        """
+        if not self.root:
+            return "[]"
+
+        keys, left, right, color = self.keys, self.left, self.right, self.color
+        parts = []
+        # node indices, and the strings between them
+        todo = [self.root]
+        while todo:
+            item = todo.pop()
+            if isinstance(item, str):
+                parts.append(item)
+            elif not item:
+                parts.append('None')
+            else:
+                parts.append("%s:%s" % ('red' if color[item] == RED else 'black', keys[item]))
+                if left[item] or right[item]:
+                    todo.extend((']', right[item], ' | ', left[item], ' -> ['))
+
+        return ''.join(parts)
+
+    ##########################
+    # Slots
+
+    def _new_node(self, key):
+        i = self.free
+        if i:
+            self.free = self.left[i]
+            self.keys[i] = key
+            self.left[i] = self.right[i] = self.parent[i] = NIL
+            self.size[i] = 1
+            self.color[i] = RED
+        else:
+            i = len(self.color)
+            self.keys.append(key)
+            self.left.append(NIL)
+            self.right.append(NIL)
+            self.parent.append(NIL)
+            self.size.append(1)
+            self.color.append(RED)
+        return i
+
+    def _free_node(self, i):
+        if self.typecode is None:
+            # drop the reference
+            self.keys[i] = None
+        self.left[i] = self.free
+        self.free = i
+
+    ##########################
+    # Lookups
+
+    def find(self, key):
+        """
+        The node (index) holding key.
+        Run time: O(logn)
+        """
+        keys, left, right = self.keys, self.left, self.right
+        i = self.root
+        while i:
+            k = keys[i]
+            if key < k:
+                i = left[i]
+            elif k < key:
+                i = right[i]
+            else:
+                return i
+
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        keys, left, right = self.keys, self.left, self.right
+        i = self.root
+        while i:
+            k = keys[i]
+            if key < k:
+                i = left[i]
+            elif k < key:
+                i = right[i]
+            else:
+                return True
+
+        return False
+
+    def rank(self, key):
+        """
+        Number of keys < key.
+        Run time: O(logn)
+        """
+        keys, left, right, size = self.keys, self.left, self.right, self.size
+        rank = 0
+        i = self.root
+        while i:
+            if keys[i] < key:
+                rank += 1 + size[left[i]]
+                i = right[i]
+            else:
+                i = left[i]
+
+        return rank
+
+    def select(self, index):
+        """
+        The key at index in sorted order (negative counts from the end).
+        Run time: O(logn)
+        """
+        left, right, size = self.left, self.right, self.size
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('tree index out of range')
+
+        i = self.root
+        while True:
+            smaller = size[left[i]]
+            if index < smaller:
+                i = left[i]
+            elif index == smaller:
+                return self.keys[i]
+            else:
+                index -= smaller + 1
+                i = right[i]
+
+    def count_range(self, lo=None, hi=None):
+        """
+        Number of keys x with lo <= x < hi. None means unbounded.
+        Run time: O(logn)
+        """
+        count = len(self) if hi is None else self.rank(hi)
+        if lo is not None:
+            count -= self.rank(lo)
+        return max(count, 0)
+
+    def __iter__(self):
+        return self.range()
+
+    def _successor(self, i):
+        left, right, parent = self.left, self.right, self.parent
+        if right[i]:
+            i = right[i]
+            while left[i]:
+                i = left[i]
+            return i
+
+        p = parent[i]
+        while p and i == right[p]:
+            i, p = p, parent[p]
+        return p
+
+    def range(self, lo=None, hi=None):
+        """
+        Yields the keys x with lo <= x < hi, in order. None means unbounded.
+        Walks from successor to successor through the parent links: O(1) extra
+        memory, O(1) amortized per key.
+        """
+        keys, left, right = self.keys, self.left, self.right
+        # first node with key >= lo
+        start = NIL
+        i = self.root
+        while i:
+            if lo is not None and keys[i] < lo:
+                i = right[i]
+            else:
+                start = i
+                i = left[i]
+
+        successor = self._successor
+        i = start
+        while i:
+            key = keys[i]
+            if hi is not None and not key < hi:
+                return
+            yield key
+            i = successor(i)
+
+    ##########################
+    # Rotations
+
+    def _rotate_left(self, x):
+        left, right, parent, size = self.left, self.right, self.parent, self.size
+        y = right[x]
+        middle = left[y]
+        right[x] = middle
+        if middle:
+            parent[middle] = x
+
+        p = parent[x]
+        parent[y] = p
+        if not p:
+            self.root = y
+        elif left[p] == x:
+            left[p] = y
+        else:
+            right[p] = y
+
+        left[y] = x
+        parent[x] = y
+        size[y] = size[x]
+        size[x] = 1 + size[left[x]] + size[middle]
+
+    def _rotate_right(self, x):
+        left, right, parent, size = self.left, self.right, self.parent, self.size
+        y = left[x]
+        middle = right[y]
+        left[x] = middle
+        if middle:
+            parent[middle] = x
+
+        p = parent[x]
+        parent[y] = p
+        if not p:
+            self.root = y
+        elif right[p] == x:
+            right[p] = y
+        else:
+            left[p] = y
+
+        right[y] = x
+        parent[x] = y
+        size[y] = size[x]
+        size[x] = 1 + size[middle] + size[right[x]]
+
+    ##########################
+    # Insertion
+
+    def insert(self, key, unique=False):
+        """
+        Inserts key (duplicates go right, like RedBlackTree), returning its node;
+        with unique, a key already there is left alone and None returned.
+        Run time: O(logn)
+        """
+        keys, left, right, parent, size = self.keys, self.left, self.right, self.parent, self.size
+
+        p = NIL
+        node = self.root
+        while node:
+            # the new node ends up under every node on the way down
+            size[node] += 1
+            p = node
+            if key < keys[node]:
+                node = left[node]
+            elif unique and not keys[node] < key:
+                while node:
+                    size[node] -= 1
+                    node = parent[node]
+                return None
+            else:
+                node = right[node]
+
+        i = self._new_node(key)
+        parent[i] = p
+        if not p:
+            self.root = i
+        elif key < keys[p]:
+            left[p] = i
+        else:
+            right[p] = i
+
+        self._fix_insertion(i)
+        return i
+
+    def _fix_insertion(self, node):
+        """
+        RedBlackTree._fix_insertion on indices.
+        """
+        left, right, parent, color = self.left, self.right, self.parent, self.color
+
+        p = parent[node]
+        while color[p] == RED:
+            # a red parent isn't the root: there is a grandparent
+            granny = parent[p]
+            if p == left[granny]:
+                uncle = right[granny]
+                if color[uncle] == RED:
+                    color[p] = color[uncle] = BLACK
+                    color[granny] = RED
+                    node = granny
+                    p = parent[node]
+                    continue
+
+                if node == right[p]:
+                    self._rotate_left(p)
+                    node, p = p, node
+
+                color[p] = BLACK
+                color[granny] = RED
+                self._rotate_right(granny)
+
+            else:
+                uncle = left[granny]
+                if color[uncle] == RED:
+                    color[p] = color[uncle] = BLACK
+                    color[granny] = RED
+                    node = granny
+                    p = parent[node]
+                    continue
+
+                if node == left[p]:
+                    self._rotate_right(p)
+                    node, p = p, node
+
+                color[p] = BLACK
+                color[granny] = RED
+                self._rotate_left(granny)
+
+            break
+
+        color[self.root] = BLACK
+
+    ##########################
+    # Deletion
+
+    def _transplant(self, old, new):
+        parent = self.parent
+        p = parent[old]
+        if not p:
+            self.root = new
+        elif self.left[p] == old:
+            self.left[p] = new
+        else:
+            self.right[p] = new
+
+        if new:
+            parent[new] = p
+
+    def delete(self, key):
+        """
+        Removes key (KeyError if absent), recycling its slot.
+        Run time: O(logn)
+        """
+        left, right, parent, size, color = self.left, self.right, self.parent, self.size, self.color
+        target = self.find(key)
+
+        if left[target] and right[target]:
+            removed = left[target]
+            while right[removed]:
+                removed = right[removed]
+        else:
+            removed = target
+
+        # every node above removed loses one descendant
+        node = parent[removed]
+        while node:
+            size[node] -= 1
+            node = parent[node]
+
+        removed_color = color[removed]
+        child = left[removed] if left[removed] else right[removed]
+        p = parent[removed]
+        self._transplant(removed, child)
+
+        if removed != target:
+            # the predecessor takes target's place, color and size
+            if p == target:
+                p = removed
+            self._transplant(target, removed)
+            left[removed] = left[target]
+            right[removed] = right[target]
+            if left[removed]:
+                parent[left[removed]] = removed
+            if right[removed]:
+                parent[right[removed]] = removed
+            color[removed] = color[target]
+            size[removed] = size[target]
+
+        self._free_node(target)
+
+        if removed_color == BLACK:
+            self._fix_deletion(child, p)
+
+    def _fix_deletion(self, node, p):
+        """
+        RedBlackTree._fix_deletion on indices.
+        """
+        left, right, parent, color = self.left, self.right, self.parent, self.color
+
+        while node != self.root and color[node] == BLACK:
+            if node == left[p]:
+                sibling = right[p]
+                if color[sibling] == RED:
+                    color[sibling] = BLACK
+                    color[p] = RED
+                    self._rotate_left(p)
+                    sibling = right[p]
+
+                if color[left[sibling]] == BLACK and color[right[sibling]] == BLACK:
+                    color[sibling] = RED
+                    node = p
+                    p = parent[node]
+                    continue
+
+                if color[right[sibling]] == BLACK:
+                    color[left[sibling]] = BLACK
+                    color[sibling] = RED
+                    self._rotate_right(sibling)
+                    sibling = right[p]
+
+                color[sibling] = color[p]
+                color[p] = BLACK
+                color[right[sibling]] = BLACK
+                self._rotate_left(p)
+
+            else:
+                sibling = left[p]
+                if color[sibling] == RED:
+                    color[sibling] = BLACK
+                    color[p] = RED
+                    self._rotate_right(p)
+                    sibling = left[p]
+
+                if color[left[sibling]] == BLACK and color[right[sibling]] == BLACK:
+                    color[sibling] = RED
+                    node = p
+                    p = parent[node]
+                    continue
+
+                if color[left[sibling]] == BLACK:
+                    color[right[sibling]] = BLACK
+                    color[sibling] = RED
+                    self._rotate_left(sibling)
+                    sibling = left[p]
+
+                color[sibling] = color[p]
+                color[p] = BLACK
+                color[left[sibling]] = BLACK
+                self._rotate_right(p)
+
+            break
+
+        if node:
+            color[node] = BLACK
+
+
+##########################
+# Benchmark
+#
+# Object nodes (RedBlackTree) against slots (CompactRedBlackTree, with a list of
+# keys and with unboxed 'q' keys): memory kept by a tree of n random integers
+# (tracemalloc, keys excluded: they exist before), and ops/sec of inserts,
+# lookups and deletes.
+
+def _footprint(tree_factory, keys):
+    import tracemalloc
+
+    tracemalloc.start()
+    tree = tree_factory()
+    for key in keys:
+        tree.insert(key)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return retained
+
+
+def benchmark(sizes, seed=0):
+    import random
+    import time
+
+    from .redblacktree import RedBlackTree
+
+    trees = [
+        ('objects', RedBlackTree),
+        ('compact', CompactRedBlackTree),
+        ('compact_q', lambda: CompactRedBlackTree('q')),
+    ]
+    results = []
+    for n in sizes:
+        keys = random.Random(seed).sample(range(n * 10), n)
+        for name, factory in trees:
+            tree = factory()
+            start = time.perf_counter()
+            for key in keys:
+                tree.insert(key)
+            inserted = time.perf_counter()
+            for key in keys:
+                key in tree
+            looked_up = time.perf_counter()
+            for key in keys:
+                tree.delete(key)
+            deleted = time.perf_counter()
+
+            retained = _footprint(factory, keys)
+            results.append({
+                'tree': name,
+                'size': n,
+                'bytes_per_node': retained / n,
+                'inserts_per_sec': n / (inserted - start),
+                'lookups_per_sec': n / (looked_up - inserted),
+                'deletes_per_sec': n / (deleted - looked_up),
+            })
+
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Object nodes vs struct-of-arrays nodes.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print('%-10s %10s %14s %14s %14s %14s' % (
+        'tree', 'size', 'bytes/node', 'inserts/sec', 'lookups/sec', 'deletes/sec'))
+    for r in benchmark(args.sizes, args.seed):
+        print('%-10s %10d %14.1f %14.0f %14.0f %14.0f' % (
+            r['tree'], r['size'], r['bytes_per_node'],
+            r['inserts_per_sec'], r['lookups_per_sec'], r['deletes_per_sec']))
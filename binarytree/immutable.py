@@ -1,138 +1,335 @@
+from .redblacktree import BLACK, RED
 
-from .binarytree import BinaryTree
-from .redblacktree import RedBlackNode
 
+class PersistentNode(object):
+    """
+    Red-black tree node that is never changed once built: a new version of a
+    tree builds new nodes on the path it changes and points to the old ones
+    everywhere else. No parent link, so a node can have many "parents", one per
+    version sharing it.
+    """
 
-class ImmutableRedBlackTree(BinaryTree):
+    __slots__ = ('color', 'left', 'value', 'right')
 
-    def insert(self, value):
-        pass
+    def __init__(self, color, left, value, right):
+        self.color = color
+        self.left = left
+        self.value = value
+        self.right = right
 
-    def delete(self, value):
-        pass
+    def _print_node(self):
+        return "%s:%s" % (self.color, self.value)
 
+    def __str__(self):
+        txt = self._print_node()
+        if self.left is not None or self.right is not None:
+            left = str(self.left) if self.left else 'None'
+            right = str(self.right) if self.right else 'None'
+            txt += ' -> [%s | %s]' % (left, right)
 
-def insert(node, value):
-    new = None
+        return txt
 
-    if value > node.value:
-        if node.right:
-            return insert(node.right, value)
-        else:
-            new = RBTNode(value, color=RED, parent=node)
-            node.right = new
 
-    else:
-        if node.left:
-            return insert(node.left, value)
-        else:
-            new = RBTNode(value, color=RED, parent=node)
-            node.left = new
+def _is_red(node):
+    return node is not None and node.color == RED
 
-    return rebalance(new)
-    
 
-def rebalance(node):
+def balance(left, value, right):
     """
-    Okasaki's balance method.
+    Okasaki's balance method, building a black node over left, value and right.
 
     Consider that x < y < z (nodes) and a < b < c < d (subtrees).
     There are four ways rebalance is needed (parenthized nodes are RED):
 
       Case I:     Case II:       Case3:         Case 4
            z           z            x               x
-          / \         / \          / \             / \ 
-        (y)  d      (x)  d        a  (z)          a  (y) 
-        / \         / \              /  \            / \ 
+          / \         / \          / \             / \
+        (y)  d      (x)  d        a  (z)          a  (y)
+        / \         / \              /  \            / \
       (x)  c       a  (y)         (y)    d          b  (z)
-      / \             / \         /  \                 / \ 
+      / \             / \         /  \                 / \
      a   b           b   c       b    c               c   d
 
     For all patterns above, the resulting tree is:
 
             (y)
-           /   \ 
+           /   \
           x     z
-         / \   / \ 
+         / \   / \
         a   b c   d
 
-    Recursion goes bottom-up.
+    Kahrs adds a fifth case for deletion: both children red just get painted
+    black, under a red node.
     """
-    if node.is_root:
-        if node.is_red: 
-            # base case: root is red => recolor it  
-            node.color = BLACK
-        
+    if _is_red(left) and _is_red(right):
+        return PersistentNode(RED, _blacken(left), value, _blacken(right))
+
+    if _is_red(left):
+        if _is_red(left.left):
+            x, y = left.left, left
+            return PersistentNode(
+                RED,
+                PersistentNode(BLACK, x.left, x.value, x.right),
+                y.value,
+                PersistentNode(BLACK, y.right, value, right))
+        if _is_red(left.right):
+            x, y = left, left.right
+            return PersistentNode(
+                RED,
+                PersistentNode(BLACK, x.left, x.value, y.left),
+                y.value,
+                PersistentNode(BLACK, y.right, value, right))
+
+    if _is_red(right):
+        if _is_red(right.left):
+            y, z = right.left, right
+            return PersistentNode(
+                RED,
+                PersistentNode(BLACK, left, value, y.left),
+                y.value,
+                PersistentNode(BLACK, y.right, z.value, z.right))
+        if _is_red(right.right):
+            y, z = right, right.right
+            return PersistentNode(
+                RED,
+                PersistentNode(BLACK, left, value, y.left),
+                y.value,
+                PersistentNode(BLACK, z.left, z.value, z.right))
+
+    return PersistentNode(BLACK, left, value, right)
+
+
+def _blacken(node):
+    if node is None or node.color == BLACK:
         return node
+    return PersistentNode(BLACK, node.left, node.value, node.right)
 
-    if node.is_leaf or not node.has_grandchildren or node.is_black:
-        return rebalance(node.parent)
-
-    if node.is_black:
-        case1 = node.left and node.left.is_red and node.left.left and node.left.left.is_red
-        case2 = node.left and node.left.is_red and node.left.right and node.left.right.is_red
-        case3 = node.right and node.right.is_red and node.right.left and node.right.left.is_red
-        case4 = node.right and node.right.is_red and node.right.right and node.right.right.is_red
-
-        parent = node.parent
-        if case1:
-            x = node.left.left
-            y = node.left
-            z = node
-            a = x.left
-            b = y.right
-            c = y.right
-            d = node.right
-        elif case2:
-            x = node.left
-            y = node.left.right
-            z = node
-            a = x.left
-            b = y.left
-            c = y.right
-            d = z.right
-        elif case3:
-            x = node
-            y = x.right
-            z = y.left
-            a = x.left
-            b = z.left
-            c = z.right
-            d = y.right
-        elif case4:
-            x = node
-            y = x.right
-            z = y.right
-            a = x.left
-            b = y.left
-            c = z.left
-            d = z.right
-        
-        if case1 or case2 or case3 or case4:
-            return RBTNode(value=y.value, 
-                           parent=parent,
-                           color=RED,   
-                           left=RTBNode(value=x.node, color=BLACK, left=a, right=b), 
-                           right=RTBNode(value=z.node, color=BLACK, left=c, right=d))
-        else:
-            return node
 
+def _redden(node):
+    """
+    Kahrs' sub1: one black less on a black node's paths, by painting it red.
+    """
+    return PersistentNode(RED, node.left, node.value, node.right)
+
+
+def insert(node, value):
+    """
+    The subtree with value added, its root possibly red with a red child: the
+    caller (balance, or the tree painting the root black) fixes it.
+    """
+    if node is None:
+        return PersistentNode(RED, None, value, None)
+
+    if value < node.value:
+        left = insert(node.left, value)
+        if node.color == BLACK:
+            return balance(left, node.value, node.right)
+        return PersistentNode(RED, left, node.value, node.right)
 
-class RBTNodeTestCase(unittest.TestCase):
+    right = insert(node.right, value)
+    if node.color == BLACK:
+        return balance(node.left, node.value, right)
+    return PersistentNode(RED, node.left, node.value, right)
 
-    def test(self):
-        root = RBTNode(10)
-        print(root)
-        print(insert(root, 11))
-        print(insert(root, 5))
-        print(insert(root, 1))
 
+def _balance_left(left, value, right):
+    """
+    left lost one black height: borrows from right to make up for it.
+    """
+    if _is_red(left):
+        return PersistentNode(RED, _blacken(left), value, right)
+    if right.color == BLACK:
+        return balance(left, value, _redden(right))
+    # right is red, with black children
+    return PersistentNode(
+        RED,
+        PersistentNode(BLACK, left, value, right.left.left),
+        right.left.value,
+        balance(right.left.right, right.value, _redden(right.right)))
 
-if __name__ == '__main__':
-    unittest.main()
 
+def _balance_right(left, value, right):
+    """
+    right lost one black height: the mirror of _balance_left.
+    """
+    if _is_red(right):
+        return PersistentNode(RED, left, value, _blacken(right))
+    if left.color == BLACK:
+        return balance(_redden(left), value, right)
+    # left is red, with black children
+    return PersistentNode(
+        RED,
+        balance(_redden(left.left), left.value, left.right.left),
+        left.right.value,
+        PersistentNode(BLACK, left.right.right, value, right))
 
 
+def _fuse(left, right):
+    """
+    Kahrs' app: joins the two subtrees of a deleted node, all of left's values
+    being smaller than right's.
+    """
+    if left is None:
+        return right
+    if right is None:
+        return left
+
+    if left.color == RED and right.color == RED:
+        middle = _fuse(left.right, right.left)
+        if _is_red(middle):
+            return PersistentNode(
+                RED,
+                PersistentNode(RED, left.left, left.value, middle.left),
+                middle.value,
+                PersistentNode(RED, middle.right, right.value, right.right))
+        return PersistentNode(
+            RED, left.left, left.value, PersistentNode(RED, middle, right.value, right.right))
+
+    if left.color == BLACK and right.color == BLACK:
+        middle = _fuse(left.right, right.left)
+        if _is_red(middle):
+            return PersistentNode(
+                RED,
+                PersistentNode(BLACK, left.left, left.value, middle.left),
+                middle.value,
+                PersistentNode(BLACK, middle.right, right.value, right.right))
+        return _balance_left(
+            left.left, left.value, PersistentNode(BLACK, middle, right.value, right.right))
+
+    if right.color == RED:
+        return PersistentNode(RED, _fuse(left, right.left), right.value, right.right)
+    return PersistentNode(RED, left.left, left.value, _fuse(left.right, right))
+
+
+def delete(node, value):
+    """
+    Kahrs' deletion. The subtree without value (which must be there): one black
+    height shorter if node was black, the caller rebalances.
+    """
+    if value < node.value:
+        left = delete(node.left, value)
+        if node.left.color == BLACK:
+            return _balance_left(left, node.value, node.right)
+        return PersistentNode(RED, left, node.value, node.right)
+
+    if node.value < value:
+        right = delete(node.right, value)
+        if node.right.color == BLACK:
+            return _balance_right(node.left, node.value, right)
+        return PersistentNode(RED, node.left, node.value, right)
+
+    return _fuse(node.left, node.right)
+
+
+def _build(values, lo, hi, depth, red_depth):
+    if lo >= hi:
+        return None
+    mid = (lo + hi) // 2
+    return PersistentNode(
+        RED if depth == red_depth else BLACK,
+        _build(values, lo, mid, depth + 1, red_depth),
+        values[mid],
+        _build(values, mid + 1, hi, depth + 1, red_depth))
+
+
+class ImmutableRedBlackTree(object):
+    """
+    Persistent red-black tree: insert and delete don't change the tree, they
+    return a new version of it. The new version copies only the O(logn) nodes on
+    the path to the change and shares every other node with the old one, so
+    keeping old versions around costs O(logn) memory per change, and taking one
+    costs nothing: any tree object is a frozen snapshot, safe to read from other
+    threads.
+
+    Insertion is Okasaki's, deletion Kahrs' ("Red-black trees with types").
+    """
+
+    __slots__ = ('root', 'size')
+
+    def __init__(self, values=()):
+        self.root = None
+        self.size = 0
+        tree = self
+        for value in values:
+            tree = tree.insert(value)
+        self.root = tree.root
+        self.size = tree.size
+
+    @classmethod
+    def _make(cls, root, size):
+        tree = cls.__new__(cls)
+        tree.root = root
+        tree.size = size
+        return tree
+
+    @classmethod
+    def from_sorted(cls, values):
+        """
+        Builds a balanced tree from a sorted sequence without duplicates in O(n):
+        every level black but the deepest one, red unless it's the root.
+        """
+        red_depth = len(values).bit_length() - 1
+        return cls._make(_build(values, 0, len(values), 0, red_depth or -1), len(values))
+
+    def __str__(self):
+        if self.root:
+            return str(self.root)
+        else:
+            return "[]"
+
+    def __contains__(self, value):
+        node = self.root
+        while node is not None:
+            if value < node.value:
+                node = node.left
+            elif node.value < value:
+                node = node.right
+            else:
+                return True
+        return False
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, value):
+        """
+        Returns the tree with value added (this same tree if already there).
+        Run time: O(logn)
+        """
+        if value in self:
+            return self
+        root = insert(self.root, value)
+        return self._make(_blacken(root), self.size + 1)
+
+    def delete(self, value):
+        """
+        Returns the tree without value; KeyError if it's not there.
+        Run time: O(logn)
+        """
+        if value not in self:
+            raise KeyError(value)
+        root = delete(self.root, value)
+        return self._make(_blacken(root), self.size - 1)
 
+    def __iter__(self):
+        return self.range()
 
-        
+    def range(self, lo=None, hi=None):
+        """
+        Yields the values x with lo <= x < hi, in order. None means unbounded.
+        """
+        stack = []
+        node = self.root
+        while stack or node is not None:
+            if node is not None:
+                if lo is None or not node.value < lo:
+                    stack.append(node)
+                    node = node.left
+                else:
+                    node = node.right
+            else:
+                node = stack.pop()
+                if hi is not None and not node.value < hi:
+                    return
+                yield node.value
+                node = node.right
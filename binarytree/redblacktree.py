@@ -4,13 +4,28 @@ BLACK = 'black'
 RED = 'red'
 
 class RedBlackNode(Node):
+    """
+    Children are never None: missing ones are the shared NIL sentinel, a black
+    node of size 0, so colors and sizes can be read without None checks. The
+    root's parent is None.
+    """
+
+    __slots__ = ('color',)
+
     def __init__(self, value):
+        self.left = NIL
+        self.right = NIL
+        self.value = value
+        self.parent = None
+        self.size = 1
         self.color = BLACK
-        super(RedBlackNode, self).__init__(value)
 
     def _print_node(self):
       return "%s:%s" % (self.color, self.value)
 
+    def update_size(self):
+        self.size = 1 + self.left.size + self.right.size
+
     @property
     def uncle(self):
         granny = self.grandparent
@@ -19,6 +34,86 @@ class RedBlackNode(Node):
         else:
             return None
 
+    def rotate(self, rotate_right):
+        """
+        Given a subtree:
+
+         (whatever)
+             |
+             A
+            / \
+           B   z
+          / \
+         x   y
+
+        where x,y,z are subtrees. Right-rotation is:
+
+         (whatever)
+             |
+             B
+            / \
+           x   A
+              / \
+             y   z
+
+        Called on node A, returns node B (since it is the new root of the rotated subtree).
+        Rotation to the left is the opposite operation.
+        Parent links are updated, including (whatever)'s child link, and so are
+        the subtree sizes of A and B.
+        """
+        pivot = self.left if rotate_right else self.right
+        if not pivot:
+            return self
+
+        if rotate_right:
+            y_subtree = pivot.right
+            self.left = y_subtree
+            pivot.right = self
+        else:
+            y_subtree = pivot.left
+            self.right = y_subtree
+            pivot.left = self
+
+        if y_subtree:
+            y_subtree.parent = self
+
+        whatever = self.parent
+        if whatever is not None:
+            if whatever.left is self:
+                whatever.left = pivot
+            else:
+                whatever.right = pivot
+        pivot.parent = whatever
+        self.parent = pivot
+
+        pivot.size = self.size
+        self.update_size()
+
+        return pivot
+
+
+class _Nil(RedBlackNode):
+    """
+    Type of the NIL sentinel: false like None, so code written for None
+    children (BinarySearchTree's) keeps working.
+    """
+
+    __slots__ = ()
+
+    def __bool__(self):
+        return False
+
+    def __str__(self):
+        return 'None'
+
+
+NIL = _Nil.__new__(_Nil)
+NIL.left = NIL.right = NIL
+NIL.value = None
+NIL.parent = None
+NIL.size = 0
+NIL.color = BLACK
+
 
 class RedBlackTree(BinarySearchTree):
     """
@@ -31,135 +126,510 @@ class RedBlackTree(BinarySearchTree):
     Example (parenthesized nodes are RED)
 
         (40)
-        /  \ 
+        /  \
        30   50
-             \ 
+             \
              (60)
+
+    The longest path is at most twice the shortest: insert, delete and find are
+    O(logn) worst case. All of them are loops, no recursion, and none writes to
+    the NIL sentinel (shared by every tree).
     """
 
-    def insert_as_bst(self, new_node):
-        if new_node.value < self.value:
-            if self.left:
-                return self.left.insert_as_bst(new_node)
+    node_class = RedBlackNode
+
+    def __init__(self, value=None):
+        self.root = NIL
+        if value is not None:
+            self.insert(value)
+
+    def find(self, value):
+        """
+        Run time: O(logn)
+        """
+        node = self.root
+        while node is not NIL:
+            if value < node.value:
+                node = node.left
+            elif node.value < value:
+                node = node.right
             else:
-                self.left = new_node
-                new_node.parent = self
+                return node
+
+        raise KeyError(value)
+
+    def __contains__(self, value):
+        node = self.root
+        while node is not NIL:
+            if value < node.value:
+                node = node.left
+            elif node.value < value:
+                node = node.right
+            else:
+                return True
+
+        return False
+
+    def __len__(self):
+        return self.root.size
+
+    def _build(self, values, lo, hi, depth):
+        """
+        Balanced subtree over values[lo:hi]: every level black but the deepest
+        one, red (unless it's the root's), so all paths have the same number of
+        black nodes.
+        """
+        if lo >= hi:
+            return NIL
+
+        mid = (lo + hi) // 2
+        node = self.node_class(values[mid])
+        node.size = hi - lo
+        if depth and depth == (len(values)).bit_length() - 1:
+            node.color = RED
+        node.left = self._build(values, lo, mid, depth + 1)
+        if node.left is not NIL:
+            node.left.parent = node
+        node.right = self._build(values, mid + 1, hi, depth + 1)
+        if node.right is not NIL:
+            node.right.parent = node
+        return node
+
+    def black_height(self):
+        """
+        Black nodes on every path from the root down to a leaf.
+        Run time: O(logn)
+        """
+        height = 0
+        node = self.root
+        while node is not NIL:
+            if node.color == BLACK:
+                height += 1
+            node = node.left
+        return height
+
+    @classmethod
+    def _subtree(cls, node, height):
+        """
+        node's subtree, cut from its parent, as a tree of its own (root painted
+        black), and its black height, given node's (counting node itself).
+        """
+        tree = cls()
+        tree.root = node
+        if node is NIL:
+            return tree, 0
+
+        node.parent = None
+        if node.color == RED:
+            node.color = BLACK
+            height += 1
+        return tree, height
+
+    @classmethod
+    def _join3(cls, left, left_height, node, right, right_height):
+        """
+        Joins left, the detached node and right (in this order) into one tree,
+        given the black heights of both: node hangs, red, from the spine of the
+        taller tree at the first black node as high as the other tree, then the
+        insertion fix-up rebalances. Returns the tree (left or right, reused)
+        and its black height.
+        Run time: O(|left_height - right_height| + 1)
+        """
+        node.parent = None
+
+        if left_height == right_height:
+            node.color = BLACK
+            node.left, node.right = left.root, right.root
+            for child in (node.left, node.right):
+                if child is not NIL:
+                    child.parent = node
+            node.size = 1 + len(left) + len(right)
+            left.root = node
+            return left, left_height + 1
+
+        node.color = RED
+        if left_height > right_height:
+            tree, taller, added = left, left.root, len(right) + 1
+            spine = 'right'
+        else:
+            tree, taller, added = right, right.root, len(left) + 1
+            spine = 'left'
+
+        height = max(left_height, right_height)
+        target = min(left_height, right_height)
+        parent = None
+        while not (taller.color == BLACK and height == target):
+            if taller.color == BLACK:
+                height -= 1
+            taller.size += added
+            parent = taller
+            taller = getattr(taller, spine)
 
+        # node takes the place of taller, which goes under it
+        if spine == 'right':
+            node.left, node.right = taller, right.root
+            parent.right = node
         else:
-            if self.right:
-                self.right.insert_as_bst(new_node)
+            node.left, node.right = left.root, taller
+            parent.left = node
+        node.parent = parent
+        for child in (node.left, node.right):
+            if child is not NIL:
+                child.parent = node
+        node.update_size()
+
+        grew = tree._fix_insertion(node)
+        return tree, max(left_height, right_height) + grew
+
+    def split(self, key):
+        """
+        Splits the tree into (values < key, values >= key), two red-black trees.
+        Goes down the search path of key, cutting off the subtrees hanging from
+        it, then joins them back bottom-up on each side with their path node in
+        the middle. This tree is left empty: its nodes move, none is copied.
+        Run time: O(logn) (the joins' costs telescope)
+        """
+        # path nodes with the black height of their children
+        path = []
+        node = self.root
+        height = self.black_height()
+        while node is not NIL:
+            if node.color == BLACK:
+                height -= 1
+            path.append((node, height))
+            node = node.left if not node.value < key else node.right
+
+        left, left_height = type(self)(), 0
+        right, right_height = type(self)(), 0
+        for node, height in reversed(path):
+            lower, upper = node.left, node.right
+            node.left = node.right = NIL
+            if node.value < key:
+                # node and everything on its left go left
+                subtree, height = self._subtree(lower, height)
+                left, left_height = self._join3(subtree, height, node, left, left_height)
             else:
-                self.right = new_node
-                new_node.parent = self
+                subtree, height = self._subtree(upper, height)
+                right, right_height = self._join3(right, right_height, node, subtree, height)
+
+        self.root = NIL
+        return left, right
+
+    @classmethod
+    def join(cls, left, right):
+        """
+        A red-black tree with the values of left then right, all of left's being
+        <= right's: right's smallest node is taken out and hung from left's right
+        spine (or right's left one) at the matching black height. left and right
+        are left empty.
+        Run time: O(logn)
+        """
+        tree = cls()
+        if left.root is NIL or right.root is NIL:
+            tree.root = left.root if left.root is not NIL else right.root
+            left.root = right.root = NIL
+            return tree
 
-    def insert(self, value):
+        middle = right.root
+        while middle.left is not NIL:
+            middle = middle.left
+        right._delete_node(middle)
+
+        joined, _ = cls._join3(left, left.black_height(), middle, right, right.black_height())
+        tree.root = joined.root
+        left.root = right.root = NIL
+        return tree
+
+    def _rotate(self, node, rotate_right):
+        """
+        Rotates the subtree under node, keeping the tree root up to date.
+        """
+        new_root = node.rotate(rotate_right)
+        if new_root.parent is None:
+            self.root = new_root
+        return new_root
+
+    def insert(self, value, unique=False):
         """
-        First, insert node as a regular BinarySearchTree would do.
+        First, insert node as a regular BinarySearchTree would do (unique as in
+        BinarySearchTree.insert).
 
-        Always insert as RED to avoid black distance problem. 
+        Always insert as RED to avoid black distance problem.
         After inserting a given node n, there are three cases to be considered:
 
         1 - father of the inserted node and uncle is RED
 
              |
              x
-           /   \ 
+           /   \
          (y)   (z)
-           \ 
+           \
             (n)
 
         2 - uncle is BLACK and a child in the opposite direction
 
              |
              x
-           /   \ 
+           /   \
          (y)    z
-           \ 
+           \
             (n)
 
         3 - uncle is BLACK but in the same direction
 
               |
               x
-            /  \ 
+            /  \
           (y)   z
-          /  
+          /
         (n)
 
+        Run time: O(logn)
         """
-        new_node = RedBlackTree(value)
+        new_node = self.node_class(value)
         new_node.color = RED
 
-        self.insert_as_bst(new_node)
-        new_node.verify_insertion_case_1()
+        parent = None
+        node = self.root
+        while node is not NIL:
+            # new_node ends up under every node on the way down
+            node.size += 1
+            parent = node
+            if value < node.value:
+                node = node.left
+            elif unique and not node.value < value:
+                while node is not None:
+                    node.size -= 1
+                    node = node.parent
+                return None
+            else:
+                node = node.right
+
+        new_node.parent = parent
+        if parent is None:
+            self.root = new_node
+        elif value < parent.value:
+            parent.left = new_node
+        else:
+            parent.right = new_node
+
+        self._fix_insertion(new_node)
+        return new_node
 
-    def verify_insertion_case_1(self):
+    def _fix_insertion(self, node):
         """
+        Climbs from node while it is red under a red parent. Returns True if the
+        black height of the tree grew (the root had to be painted black).
+
+        Case 1, red uncle: swap the colors of grandparent, parent and uncle, then
+        repeat on the grandparent.
+
              |             |
              G            (G)
-           /   \         /   \ 
+           /   \         /   \
          (P)   (U)  =>  P     U
-           \             \ 
-            (n)          (n) 
-
-        Solution: 
-            - switch grandparent, parent and uncle colors. 
-            - repeat process on grandparent
-        """
-        if self.parent and self.parent.color == RED:
-            uncle = self.uncle()
-            if uncle and uncle.color == RED:
-                print('case 1 on %s' % self.value)
-                granny = self.grandparent()
+           \             \
+            (n)          (n)
+
+        Case 2, black uncle and n an inner grandchild: rotate it up, so the
+        former parent becomes an outer grandchild (case 3).
+
+             G               G
+           /   \           /   \
+         (P)    U   =>   (n)    U
+           \             /
+            (n)         (P)
+
+        Case 3, black uncle and n an outer grandchild: rotate the grandparent
+        away and swap its color with the parent's. Done.
+
+             G               P
+           /   \           /   \
+         (P)    U   =>   (n)   (G)
+         /                       \
+       (n)                        U
+        """
+        parent = node.parent
+        while parent is not None and parent.color == RED:
+            # a red parent isn't the root: there is a grandparent
+            granny = parent.parent
+            if parent is granny.left:
+                uncle = granny.right
+                if uncle.color == RED:
+                    parent.color = BLACK
+                    uncle.color = BLACK
+                    granny.color = RED
+                    node = granny
+                    parent = node.parent
+                    continue
+
+                if node is parent.right:
+                    self._rotate(parent, rotate_right=False)
+                    node, parent = parent, node
+
+                parent.color = BLACK
                 granny.color = RED
-                uncle.color = BLACK
-                self.parent.color = BLACK
-                print('calling again on %s' % granny.value)
-                granny.verify_insertion_case_1()
+                self._rotate(granny, rotate_right=True)
 
-        
-    def rotate(self, rotate_right):
+            else:
+                uncle = granny.left
+                if uncle.color == RED:
+                    parent.color = BLACK
+                    uncle.color = BLACK
+                    granny.color = RED
+                    node = granny
+                    parent = node.parent
+                    continue
+
+                if node is parent.left:
+                    self._rotate(parent, rotate_right=True)
+                    node, parent = parent, node
+
+                parent.color = BLACK
+                granny.color = RED
+                self._rotate(granny, rotate_right=False)
+
+            break
+
+        grew = self.root.color == RED
+        self.root.color = BLACK
+        return grew
+
+    def _transplant(self, old, new):
         """
-        Given a subtree:
+        Puts new (maybe NIL) into old's position, as far as old's parent is
+        concerned.
+        """
+        parent = old.parent
+        if parent is None:
+            self.root = new
+        elif parent.left is old:
+            parent.left = new
+        else:
+            parent.right = new
 
-         (whatever)
-             |
-             A
-            / \  
-           B   z
-          / \ 
-         x   y
+        if new is not NIL:
+            new.parent = parent
 
-        where x,y,z are subtrees. Right-rotation is:
+    def delete(self, value):
+        """
+        Removes the node holding value (KeyError if none). A node with two
+        children is first substituted by its in-order predecessor, so the node
+        actually taken out of the tree, `removed`, has at most one child.
 
-         (whatever)
-             |
-             B
-            / \  
-           x   A
-              / \ 
-             y   z
+        If removed was black, its paths are one black short: see _fix_deletion.
 
-        Called on node A, returns node B (since it is the new root of the rotated subtree).
-        Rotation to the left is the opposite operation.
+        Run time: O(logn)
         """
-        # TODO: does not update parent links
-        if rotate_right:
-            if self.left:
-                new_root = self.left
-                y_subtree = new_root.right
-                new_root.right = self
-                self.left = y_subtree
-                return new_root
-            else:
-                return self
+        self._delete_node(self.find(value))
 
+    def _delete_node(self, target):
+        if target.left is not NIL and target.right is not NIL:
+            removed = target.left
+            while removed.right is not NIL:
+                removed = removed.right
         else:
-            if self.right:
-                new_root = self.right
-                y_subtree = new_root.left
-                new_root.left = self
-                self.right = y_subtree
-                return new_root
+            removed = target
+
+        # every node above removed loses one descendant
+        node = removed.parent
+        while node is not None:
+            node.size -= 1
+            node = node.parent
+
+        removed_color = removed.color
+        child = removed.left if removed.left is not NIL else removed.right
+        parent = removed.parent
+        self._transplant(removed, child)
+
+        if removed is not target:
+            # the predecessor takes target's place, color and size
+            if parent is target:
+                parent = removed
+            self._transplant(target, removed)
+            removed.left = target.left
+            removed.right = target.right
+            if removed.left is not NIL:
+                removed.left.parent = removed
+            if removed.right is not NIL:
+                removed.right.parent = removed
+            removed.color = target.color
+            removed.size = target.size
+
+        target.parent = None
+        target.left = target.right = NIL
+
+        if removed_color == BLACK:
+            self._fix_deletion(child, parent)
+
+    def _fix_deletion(self, node, parent):
+        """
+        node (maybe NIL, so its parent is passed along) took the place of a
+        black node: its paths are one black short. A red node just turns black;
+        otherwise, with s the sibling:
+
+        Case 1, red sibling: rotate it up above the parent, so the sibling is
+        black (one of the other cases).
+        Case 2, black sibling with black children: paint the sibling red, both
+        sides are now short, repeat on the parent.
+        Case 3, black sibling whose far child is black (so the near one is red):
+        rotate the sibling to make that red child the sibling (case 4).
+        Case 4, black sibling with a red far child: rotate the parent towards
+        node, the sibling takes the parent's color and both the parent and the
+        far child turn black. Done.
+        """
+        while node is not self.root and node.color == BLACK:
+            if node is parent.left:
+                sibling = parent.right
+                if sibling.color == RED:
+                    sibling.color = BLACK
+                    parent.color = RED
+                    self._rotate(parent, rotate_right=False)
+                    sibling = parent.right
+
+                if sibling.left.color == BLACK and sibling.right.color == BLACK:
+                    sibling.color = RED
+                    node = parent
+                    parent = node.parent
+                    continue
+
+                if sibling.right.color == BLACK:
+                    sibling.left.color = BLACK
+                    sibling.color = RED
+                    self._rotate(sibling, rotate_right=True)
+                    sibling = parent.right
+
+                sibling.color = parent.color
+                parent.color = BLACK
+                sibling.right.color = BLACK
+                self._rotate(parent, rotate_right=False)
+
             else:
-                return self
\ No newline at end of file
+                sibling = parent.left
+                if sibling.color == RED:
+                    sibling.color = BLACK
+                    parent.color = RED
+                    self._rotate(parent, rotate_right=True)
+                    sibling = parent.left
+
+                if sibling.left.color == BLACK and sibling.right.color == BLACK:
+                    sibling.color = RED
+                    node = parent
+                    parent = node.parent
+                    continue
+
+                if sibling.left.color == BLACK:
+                    sibling.right.color = BLACK
+                    sibling.color = RED
+                    self._rotate(sibling, rotate_right=False)
+                    sibling = parent.left
+
+                sibling.color = parent.color
+                parent.color = BLACK
+                sibling.left.color = BLACK
+                self._rotate(parent, rotate_right=True)
+
+            break
+
+        if node is not NIL:
+            node.color = BLACK
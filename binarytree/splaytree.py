@@ -0,0 +1,167 @@
+"""
+Splay tree: every access moves the node it reaches up to the root, so a small
+set of hot keys ends up near the top. Against RedBlackTree on Zipf-distributed
+lookups:
+
+    python -m binarytree.splaytree --sizes 100000 --skew 1.1
+"""
+from .binarytree import BinarySearchTree
+
+
+class SplayTree(BinarySearchTree):
+    """
+    Sleator and Tarjan's bottom-up splay tree on plain Nodes: no balance
+    information at all, the shape adapts to the accesses instead. O(logn)
+    amortized per operation, and a key accessed often stays within a few levels
+    of the root (the working set theorem), which beats any fixed balanced tree
+    on skewed traffic. Lookups change the tree, so even `in` is a write.
+
+    Rank, select, iteration and ranges are the BinarySearchTree ones, and don't
+    splay.
+    """
+
+    def _splay(self, node):
+        """
+        Zig, zig-zig and zig-zag rotations until node is the root.
+        Run time: O(logn) amortized
+        """
+        while node.parent is not None:
+            parent = node.parent
+            grandparent = parent.parent
+            if grandparent is None:
+                # zig
+                self._rotate_up(node)
+            elif (node is parent.left) == (parent is grandparent.left):
+                # zig-zig: the parent goes first, which is what halves the depth
+                self._rotate_up(parent)
+                self._rotate_up(node)
+            else:
+                # zig-zag
+                self._rotate_up(node)
+                self._rotate_up(node)
+
+    def find(self, value):
+        """
+        Splays the node with value, or the last node on the way if there's none
+        (KeyError then).
+        Run time: O(logn) amortized
+        """
+        last = None
+        current = self.root
+        while current and current.value != value:
+            last = current
+            if value < current.value:
+                current = current.left
+            else:
+                current = current.right
+
+        if not current:
+            if last is not None:
+                self._splay(last)
+            raise KeyError(value)
+
+        self._splay(current)
+        return current
+
+    def insert(self, value, unique=False):
+        """
+        Run time: O(logn) amortized
+        """
+        node = self._insert_node(self.node_class(value), unique)
+        if node is not None:
+            self._splay(node)
+        return node
+
+    def delete(self, value):
+        """
+        Splays the target to the root and drops it, then splays the biggest
+        node of its left subtree, which has no right child, and hangs the right
+        subtree there.
+        Run time: O(logn) amortized
+        """
+        target = self.find(value)
+        left, right = target.left, target.right
+        if not left:
+            self._transplant(target, right)
+            return
+
+        self._transplant(target, left)
+        top = left.get_max_successor()
+        self._splay(top)
+        if right:
+            top.set_right(right)
+        top.update_size()
+
+
+def zipf_keys(keys, count, skew, rng):
+    """
+    count draws from keys, the i-th most popular (in a random order) with
+    probability proportional to 1 / i**skew.
+    """
+    from bisect import bisect
+    from itertools import accumulate
+
+    popular = list(keys)
+    rng.shuffle(popular)
+    weights = list(accumulate(1.0 / i ** skew for i in range(1, len(popular) + 1)))
+    total = weights[-1]
+    return [popular[min(bisect(weights, rng.random() * total), len(popular) - 1)]
+            for _ in range(count)]
+
+
+def benchmark(sizes, skew=1.1, seed=0):
+    import random
+    import time
+
+    from .redblacktree import RedBlackTree
+    from .treap import Treap
+
+    trees = [
+        ('redblack', RedBlackTree),
+        ('splay', SplayTree),
+        ('treap', Treap),
+    ]
+    results = []
+    for n in sizes:
+        rng = random.Random(seed)
+        keys = rng.sample(range(n * 10), n)
+        lookups = zipf_keys(keys, n, skew, rng)
+        for name, factory in trees:
+            tree = factory()
+            start = time.perf_counter()
+            for key in keys:
+                tree.insert(key)
+            inserted = time.perf_counter()
+            for key in lookups:
+                key in tree
+            looked_up = time.perf_counter()
+            for key in keys:
+                tree.delete(key)
+            deleted = time.perf_counter()
+
+            results.append({
+                'tree': name,
+                'size': n,
+                'inserts_per_sec': n / (inserted - start),
+                'lookups_per_sec': n / (looked_up - inserted),
+                'deletes_per_sec': n / (deleted - looked_up),
+            })
+
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Splay tree and treap vs red-black tree on skewed lookups.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of the lookups')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print('%-10s %10s %14s %14s %14s' % (
+        'tree', 'size', 'inserts/sec', 'lookups/sec', 'deletes/sec'))
+    for r in benchmark(args.sizes, args.skew, args.seed):
+        print('%-10s %10d %14.0f %14.0f %14.0f' % (
+            r['tree'], r['size'],
+            r['inserts_per_sec'], r['lookups_per_sec'], r['deletes_per_sec']))
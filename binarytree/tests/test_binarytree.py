@@ -1,6 +1,11 @@
+import random
 import unittest
 
-from ..binarytree import BinarySearchTree
+from ..binarytree import BinarySearchTree, is_balanced, is_valid_bst
+from ..compact import CompactRedBlackTree
+from ..redblacktree import RedBlackTree
+from ..splaytree import SplayTree
+from ..treap import Treap
 
 class BSTInsertTestCase(unittest.TestCase):
 
@@ -20,6 +25,21 @@ class BSTInsertTestCase(unittest.TestCase):
         tree.insert(6)
         self.assertEqual(str(tree), '10 -> [5 -> [4 | 6] | 11]')
 
+    def test_insert_unique(self):
+        values = [random.Random(2).randrange(100) for _ in range(300)]
+        for tree_class in (BinarySearchTree, RedBlackTree, CompactRedBlackTree, SplayTree, Treap):
+            with self.subTest(tree=tree_class.__name__):
+                tree = tree_class()
+                added = [x for x in values if tree.insert(x, unique=True) is not None]
+                self.assertEqual(sorted(added), sorted(set(values)))
+                self.assertEqual(list(tree), sorted(set(values)))
+                # subtree sizes were taken back on every duplicate
+                self.assertEqual(len(tree), len(added))
+                self.assertEqual([tree.rank(x) for x in sorted(added)], list(range(len(added))))
+
+                tree.insert(values[0])
+                self.assertEqual(len(tree), len(added) + 1)
+
 
 class BSTDeleteTestCase(unittest.TestCase):
 
@@ -60,4 +80,125 @@ class BSTDeleteTestCase(unittest.TestCase):
 
     def test_delete_root(self):
         self.tree.delete(10)
-        self.assertEqual(str(self.tree), '8 -> [5 -> [4 | 6] | 13 -> [11 -> [None | 12] | 15]]')
\ No newline at end of file
+        self.assertEqual(str(self.tree), '8 -> [5 -> [4 | 6] | 13 -> [11 -> [None | 12] | 15]]')
+
+class BSTOrderStatisticTestCase(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Same tree as BSTDeleteTestCase: 4 5 6 8 10 11 12 13 15
+        """
+        self.tree = BinarySearchTree(10)
+        for x in [5, 4, 8, 6, 13, 11, 12, 15]:
+            self.tree.insert(x)
+        self.values = [4, 5, 6, 8, 10, 11, 12, 13, 15]
+
+    def test_len(self):
+        self.assertEqual(len(self.tree), 9)
+        self.assertEqual(self.tree.size(), 9)
+        self.assertEqual(len(BinarySearchTree()), 0)
+
+    def test_rank(self):
+        self.assertEqual(self.tree.rank(4), 0)
+        self.assertEqual(self.tree.rank(10), 4)
+        self.assertEqual(self.tree.rank(9), 4)
+        self.assertEqual(self.tree.rank(100), 9)
+
+    def test_select(self):
+        self.assertEqual([self.tree.select(i) for i in range(9)], self.values)
+        self.assertEqual(self.tree.select(-1), 15)
+        self.assertRaises(IndexError, self.tree.select, 9)
+
+    def test_count_range(self):
+        self.assertEqual(self.tree.count_range(5, 12), 5)
+        self.assertEqual(self.tree.count_range(None, 10), 4)
+        self.assertEqual(self.tree.count_range(11), 4)
+        self.assertEqual(self.tree.count_range(12, 5), 0)
+
+    def test_sizes_after_deletes(self):
+        for x in [13, 10, 4]:
+            self.tree.delete(x)
+            self.values.remove(x)
+            self.assertEqual(len(self.tree), len(self.values))
+            self.assertEqual([self.tree.select(i) for i in range(len(self.values))], self.values)
+            self.assertEqual(self.tree.rank(12), self.values.index(12))
+
+
+class BSTBulkTestCase(unittest.TestCase):
+
+    def test_from_sorted(self):
+        tree = BinarySearchTree.from_sorted([1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(str(tree), '4 -> [2 -> [1 | 3] | 6 -> [5 | 7]]')
+        self.assertEqual(len(tree), 7)
+        self.assertEqual(str(BinarySearchTree.from_sorted([])), '[]')
+        self.assertRaises(ValueError, BinarySearchTree.from_sorted, [1, 3, 2])
+
+    def test_from_sorted_deep(self):
+        # inserting these one by one would make a linked list
+        tree = BinarySearchTree.from_sorted(range(100000))
+        self.assertEqual(len(tree), 100000)
+        self.assertEqual(tree.select(54321), 54321)
+        self.assertIn(99999, tree)
+
+    def test_split(self):
+        tree = BinarySearchTree.from_sorted(range(10))
+        left, right = tree.split(4)
+
+        self.assertEqual([left.select(i) for i in range(len(left))], [0, 1, 2, 3])
+        self.assertEqual([right.select(i) for i in range(len(right))], [4, 5, 6, 7, 8, 9])
+        self.assertIsNone(left.root.parent)
+        self.assertIsNone(right.root.parent)
+        self.assertEqual(len(tree), 0)
+
+    def test_join(self):
+        left = BinarySearchTree.from_sorted([1, 2, 3])
+        right = BinarySearchTree.from_sorted([10, 20])
+        tree = BinarySearchTree.join(left, right)
+
+        self.assertEqual(str(tree), '3 -> [2 -> [1 | None] | 20 -> [10 | None]]')
+        self.assertEqual(len(tree), 5)
+        self.assertEqual((len(left), len(right)), (0, 0))
+        self.assertEqual(len(BinarySearchTree.join(tree, BinarySearchTree())), 5)
+
+
+class BSTIterationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = BinarySearchTree()
+        for x in [50, 20, 80, 10, 30, 70, 90, 25, 35, 75]:
+            self.tree.insert(x)
+        self.values = sorted([50, 20, 80, 10, 30, 70, 90, 25, 35, 75])
+
+    def test_iter(self):
+        self.assertEqual(list(self.tree), self.values)
+        self.assertEqual(list(reversed(self.tree)), self.values[::-1])
+        self.assertEqual(list(BinarySearchTree()), [])
+        self.assertEqual(list(reversed(BinarySearchTree())), [])
+
+    def test_irange(self):
+        self.assertEqual(list(self.tree.irange(25, 75)), [25, 30, 35, 50, 70, 75])
+        self.assertEqual(list(self.tree.irange(25, 75, inclusive=(False, False))), [30, 35, 50, 70])
+        self.assertEqual(list(self.tree.irange(26, 74)), [30, 35, 50, 70])
+        self.assertEqual(list(self.tree.irange(hi=20)), [10, 20])
+        self.assertEqual(list(self.tree.irange(91)), [])
+        self.assertEqual(list(self.tree.items_from(72)), [75, 80, 90])
+
+    def test_iter_deep(self):
+        # a linked list: a recursive walk would blow the stack
+        tree = BinarySearchTree()
+        for x in range(5000):
+            tree.insert(x)
+        self.assertEqual(list(tree.irange(4990)), list(range(4990, 5000)))
+        self.assertEqual(next(reversed(tree)), 4999)
+        self.assertTrue(str(tree).startswith('0 -> [None | 1 -> [None | 2'))
+        self.assertTrue(is_valid_bst(tree))
+
+    def test_checks(self):
+        self.assertTrue(is_valid_bst(self.tree))
+        self.assertTrue(is_balanced(BinarySearchTree.from_sorted(range(100))))
+        lopsided = BinarySearchTree()
+        for x in [10, 5, 20, 30, 40]:
+            lopsided.insert(x)
+        self.assertFalse(is_balanced(lopsided))
+        self.tree.root.left.value = 60
+        self.assertFalse(is_valid_bst(self.tree))
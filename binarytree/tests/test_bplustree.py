@@ -0,0 +1,95 @@
+import random
+import unittest
+
+from ..bplustree import BPlusTree
+
+
+def check_tree(testcase, tree):
+    """
+    Node fill, separators, equal leaf depth and the leaf chain.
+    """
+    half = tree.fanout // 2
+    leaves = []
+    nodes = [(tree.root, None, None, 0)]
+    while nodes:
+        node, lo, hi, depth = nodes.pop()
+        if node is not tree.root:
+            testcase.assertGreaterEqual(len(node.keys if node.children is None else node.children), half)
+        for key in node.keys:
+            testcase.assertTrue((lo is None or lo <= key) and (hi is None or key < hi))
+
+        if node.children is None:
+            testcase.assertEqual(node.keys, sorted(node.keys))
+            testcase.assertLessEqual(len(node.keys), tree.fanout)
+            leaves.append((node, depth))
+        else:
+            testcase.assertEqual(len(node.children), len(node.keys) + 1)
+            testcase.assertLessEqual(len(node.children), tree.fanout)
+            bounds = [lo] + node.keys + [hi]
+            for i in reversed(range(len(node.children))):
+                nodes.append((node.children[i], bounds[i], bounds[i + 1], depth + 1))
+
+    testcase.assertEqual(len(set(depth for _, depth in leaves)), 1)
+    for (leaf, _), (following, _) in zip(leaves, leaves[1:]):
+        testcase.assertIs(leaf.next, following)
+        testcase.assertIs(following.prev, leaf)
+
+
+class BPlusTreeTestCase(unittest.TestCase):
+
+    def test_insert_splits(self):
+        tree = BPlusTree(4)
+        for x in [10, 20, 30, 40, 50]:
+            tree.insert(x)
+        self.assertEqual(str(tree), '[30]\n[10 20] [30 40 50]')
+        tree.insert(30)
+        self.assertEqual(len(tree), 5)
+        self.assertEqual(tree.find(40), 40)
+        self.assertRaises(KeyError, tree.find, 35)
+        self.assertRaises(ValueError, BPlusTree, 3)
+
+    def test_random_changes(self):
+        rng = random.Random(11)
+        for fanout in (4, 5, 16):
+            tree = BPlusTree(fanout)
+            values = set()
+            for _ in range(5000):
+                x = rng.randrange(1000)
+                if rng.random() < 0.6:
+                    tree.insert(x)
+                    values.add(x)
+                elif x in values:
+                    tree.delete(x)
+                    values.discard(x)
+                else:
+                    self.assertRaises(KeyError, tree.delete, x)
+
+            check_tree(self, tree)
+            self.assertEqual(list(tree), sorted(values))
+            self.assertEqual(list(reversed(tree)), sorted(values, reverse=True))
+            self.assertEqual(len(tree), len(values))
+            for x in range(1000):
+                self.assertEqual(x in tree, x in values)
+
+            for x in sorted(values):
+                tree.delete(x)
+            self.assertEqual((list(tree), tree.height()), ([], 1))
+
+    def test_irange(self):
+        tree = BPlusTree.from_sorted(range(0, 100, 2), fanout=4)
+        self.assertEqual(list(tree.irange(10, 20)), [10, 12, 14, 16, 18, 20])
+        self.assertEqual(list(tree.irange(10, 20, inclusive=(False, False))), [12, 14, 16, 18])
+        self.assertEqual(list(tree.irange(11, 19)), [12, 14, 16, 18])
+        self.assertEqual(list(tree.range(90)), [90, 92, 94, 96, 98])
+        self.assertEqual(list(tree.irange(hi=4)), [0, 2, 4])
+        self.assertEqual(list(tree.items_from(99)), [])
+        self.assertEqual(list(BPlusTree().irange(1, 2)), [])
+
+    def test_from_sorted(self):
+        for n in (0, 1, 16, 17, 1000):
+            tree = BPlusTree.from_sorted(range(n), fanout=16)
+            check_tree(self, tree)
+            self.assertEqual(list(tree), list(range(n)))
+            self.assertEqual(len(tree), n)
+        self.assertEqual(BPlusTree.from_sorted(range(10 ** 5)).height(), 3)
+        self.assertRaises(ValueError, BPlusTree.from_sorted, [1, 1, 2])
@@ -0,0 +1,134 @@
+import random
+import unittest
+
+from ..compact import BLACK, RED, CompactRedBlackTree
+from ..redblacktree import RedBlackTree
+
+
+def black_height(testcase, tree, i):
+    """
+    Checks red-black properties, parent links and sizes under node i, returning
+    its black height.
+    """
+    if not i:
+        return 1
+
+    left, right = tree.left[i], tree.right[i]
+    for child in (left, right):
+        if child:
+            testcase.assertEqual(tree.parent[child], i)
+        if tree.color[i] == RED:
+            testcase.assertEqual(tree.color[child], BLACK)
+    testcase.assertEqual(tree.size[i], 1 + tree.size[left] + tree.size[right])
+
+    height = black_height(testcase, tree, left)
+    testcase.assertEqual(height, black_height(testcase, tree, right))
+    return height + (tree.color[i] == BLACK)
+
+
+class CompactRedBlackTreeTestCase(unittest.TestCase):
+
+    def testInsertBaseCase(self):
+        tree = CompactRedBlackTree()
+        tree.insert(10)
+        self.assertEqual(str(tree), 'black:10')
+        self.assertEqual(str(CompactRedBlackTree()), '[]')
+
+    def testSameShapeAsObjectTree(self):
+        rnd = random.Random(0)
+        compact = CompactRedBlackTree()
+        objects = RedBlackTree()
+        values = []
+
+        for _ in range(1000):
+            x = rnd.randint(0, 200)
+            if x not in values:
+                compact.insert(x)
+                objects.insert(x)
+                values.append(x)
+            elif rnd.random() < 0.5:
+                compact.delete(x)
+                objects.delete(x)
+                values.remove(x)
+
+            self.assertEqual(str(compact), str(objects))
+            black_height(self, compact, compact.root)
+
+        self.assertEqual(list(compact), sorted(values))
+        self.assertEqual(len(compact), len(values))
+
+    def testDeleteRecyclesSlots(self):
+        tree = CompactRedBlackTree('q')
+        for x in range(100):
+            tree.insert(x)
+        for x in range(0, 100, 2):
+            tree.delete(x)
+        for x in range(100, 150):
+            tree.insert(x)
+
+        # NIL plus 100 slots, the deleted ones reused
+        self.assertEqual(len(tree.color), 101)
+        self.assertEqual(list(tree), list(range(1, 100, 2)) + list(range(100, 150)))
+        self.assertRaises(KeyError, tree.delete, 0)
+
+    def testOrderStatistics(self):
+        tree = CompactRedBlackTree()
+        for x in range(0, 100, 5):
+            tree.insert(x)
+
+        self.assertEqual(tree.rank(50), 10)
+        self.assertEqual(tree.rank(51), 11)
+        self.assertEqual(tree.select(3), 15)
+        self.assertEqual(tree.select(-1), 95)
+        self.assertEqual(tree.count_range(10, 30), 4)
+        self.assertEqual(list(tree.range(12, 31)), [15, 20, 25, 30])
+        self.assertRaises(IndexError, tree.select, 20)
+
+    def testFromSorted(self):
+        objects = RedBlackTree.from_sorted(range(50))
+        for typecode in (None, 'q'):
+            tree = CompactRedBlackTree.from_sorted(range(50), typecode)
+            self.assertEqual(str(tree), str(objects))
+            black_height(self, tree, tree.root)
+            tree.insert(25)
+            tree.delete(0)
+            black_height(self, tree, tree.root)
+        self.assertRaises(ValueError, CompactRedBlackTree.from_sorted, [1, 0])
+
+    def testRangeBounds(self):
+        rnd = random.Random(1)
+        tree = CompactRedBlackTree()
+        values = []
+        for _ in range(600):
+            x = rnd.randint(0, 300)
+            tree.insert(x)
+            values.append(x)
+        for x in values[::3]:
+            tree.delete(x)
+            values.remove(x)
+        values.sort()
+
+        self.assertEqual(list(tree.range()), values)
+        for _ in range(200):
+            lo, hi = rnd.randint(-10, 310), rnd.randint(-10, 310)
+            self.assertEqual(list(tree.range(lo, hi)), [x for x in values if lo <= x < hi])
+            self.assertEqual(list(tree.range(lo)), [x for x in values if lo <= x])
+            self.assertEqual(list(tree.range(hi=hi)), [x for x in values if x < hi])
+        self.assertEqual(list(CompactRedBlackTree().range(0, 10)), [])
+
+    def testStrOfDeepTree(self):
+        # a right spine far deeper than the recursion limit, wired by hand
+        n = 5000
+        tree = CompactRedBlackTree.from_sorted([])
+        tree.keys.extend(range(n))
+        tree.left.extend([0] * n)
+        tree.right.extend(list(range(2, n + 1)) + [0])
+        tree.parent.extend(range(n))
+        tree.size.extend(range(n, 0, -1))
+        tree.color.extend(bytes(n))
+        tree.root = 1
+
+        text = str(tree)
+        self.assertTrue(text.startswith('black:0 -> [None | black:1 -> [None | '))
+        self.assertTrue(text.endswith('black:%d' % (n - 1) + ']' * (n - 1)))
+        self.assertEqual(list(tree), list(range(n)))
@@ -0,0 +1,109 @@
+import random
+import unittest
+
+from ..immutable import ImmutableRedBlackTree
+from ..redblacktree import BLACK, RED
+
+
+def black_height(node):
+    """
+    Black nodes on every path down to a leaf, checking red nodes have black
+    children and that all paths agree.
+    """
+    if node is None:
+        return 1
+    if node.color == RED:
+        assert node.left is None or node.left.color == BLACK
+        assert node.right is None or node.right.color == BLACK
+    left = black_height(node.left)
+    assert left == black_height(node.right)
+    return left + (node.color == BLACK)
+
+
+class ImmutableInsertTestCase(unittest.TestCase):
+
+    def testInsertBaseCase(self):
+        tree = ImmutableRedBlackTree().insert(10)
+        self.assertEqual(str(tree), 'black:10')
+
+    def testInsertRebalances(self):
+        tree = ImmutableRedBlackTree([10, 5, 1])
+        self.assertEqual(str(tree), 'black:5 -> [black:1 | black:10]')
+
+    def testInsertKeepsOldVersion(self):
+        old = ImmutableRedBlackTree([10, 5, 15])
+        new = old.insert(20)
+
+        self.assertEqual(list(old), [5, 10, 15])
+        self.assertEqual(list(new), [5, 10, 15, 20])
+        self.assertEqual((len(old), len(new)), (3, 4))
+        # the untouched left subtree is shared
+        self.assertIs(old.root.left, new.root.left)
+
+    def testInsertDuplicate(self):
+        tree = ImmutableRedBlackTree([10, 5])
+        self.assertIs(tree.insert(5), tree)
+
+
+class ImmutableDeleteTestCase(unittest.TestCase):
+
+    def testDelete(self):
+        old = ImmutableRedBlackTree(range(10))
+        new = old.delete(3)
+
+        self.assertEqual(list(old), list(range(10)))
+        self.assertEqual(list(new), [0, 1, 2, 4, 5, 6, 7, 8, 9])
+        self.assertNotIn(3, new)
+        self.assertIn(3, old)
+
+    def testDeleteMissing(self):
+        tree = ImmutableRedBlackTree([1, 2])
+        with self.assertRaises(KeyError):
+            tree.delete(3)
+
+    def testDeleteAll(self):
+        tree = ImmutableRedBlackTree(range(20))
+        for x in range(20):
+            tree = tree.delete(x)
+        self.assertEqual(str(tree), '[]')
+        self.assertEqual(len(tree), 0)
+
+
+class ImmutableBalanceTestCase(unittest.TestCase):
+
+    def testRandomVersions(self):
+        rnd = random.Random(0)
+        tree = ImmutableRedBlackTree()
+        values = set()
+        versions = []
+
+        for _ in range(2000):
+            x = rnd.randint(0, 300)
+            versions.append((tree, sorted(values)))
+            if rnd.random() < 0.6:
+                tree = tree.insert(x)
+                values.add(x)
+            elif x in values:
+                tree = tree.delete(x)
+                values.remove(x)
+
+            self.assertEqual(len(tree), len(values))
+            if tree.root is not None:
+                self.assertEqual(tree.root.color, BLACK)
+            black_height(tree.root)
+
+        for version, expected in versions:
+            self.assertEqual(list(version), expected)
+
+    def testFromSorted(self):
+        for n in range(50):
+            tree = ImmutableRedBlackTree.from_sorted(list(range(n)))
+            black_height(tree.root)
+            self.assertEqual(list(tree), list(range(n)))
+            self.assertEqual(len(tree), n)
+
+    def testRange(self):
+        tree = ImmutableRedBlackTree(range(0, 20, 2))
+        self.assertEqual(list(tree.range(3, 9)), [4, 6, 8])
+        self.assertEqual(list(tree.range(None, 3)), [0, 2])
+        self.assertEqual(list(tree.range(15)), [16, 18])
@@ -1,3 +1,9 @@
+import random
+import unittest
+
+from ..redblacktree import RedBlackNode, RedBlackTree
+
+
 class RedBlackInsertTestCase(unittest.TestCase):
 
     def testInsertBaseCase(self):
@@ -20,15 +26,15 @@ class RedBlackInsertTestCase(unittest.TestCase):
         tree.insert(5)
         tree.insert(2)
 
-        self.assertEqual(str(tree), 'red:10 -> [black:5 -> [red:2 | None] | black:15]')
+        self.assertEqual(str(tree), 'black:10 -> [black:5 -> [red:2 | None] | black:15]')
 
         # setting up a two generation verification
         tree.insert(6)
-        self.assertEqual(str(tree), 'red:10 -> [black:5 -> [red:2 | red:6] | black:15]')
+        self.assertEqual(str(tree), 'black:10 -> [black:5 -> [red:2 | red:6] | black:15]')
 
         # # this inserting will have to execute case 1 twice
         tree.insert(1)
-        self.assertEqual(str(tree), 'red:10 -> [red:5 -> [black:2 -> [red:1 | None] | black:6] | black:15]')
+        self.assertEqual(str(tree), 'black:10 -> [red:5 -> [black:2 -> [red:1 | None] | black:6] | black:15]')
 
 
 
@@ -43,16 +49,16 @@ class RedBlackInsertTestCase(unittest.TestCase):
          x   y
 
         """
-        node_A = RedBlackTree('A')
+        node_A = RedBlackNode('A')
 
-        node_B = RedBlackTree('B')
-        leaf_x = RedBlackTree('x')
+        node_B = RedBlackNode('B')
+        leaf_x = RedBlackNode('x')
         node_B.set_left(leaf_x) 
-        leaf_y = RedBlackTree('y')
+        leaf_y = RedBlackNode('y')
         node_B.set_right(leaf_y)
 
         node_A.left = node_B
-        leaf_z = RedBlackTree('z')
+        leaf_z = RedBlackNode('z')
         node_A.set_right(leaf_z)
 
         self.assertEqual(str(node_A), 'black:A -> [black:B -> [black:x | black:y] | black:z]')
@@ -71,19 +77,187 @@ class RedBlackInsertTestCase(unittest.TestCase):
              y   z
 
         """
-        node_B = RedBlackTree('B')
+        node_B = RedBlackNode('B')
 
-        leaf_x = RedBlackTree('x')
+        leaf_x = RedBlackNode('x')
         node_B.set_left(leaf_x)
         
-        node_A = RedBlackTree('A')
-        leaf_y = RedBlackTree('y')
+        node_A = RedBlackNode('A')
+        leaf_y = RedBlackNode('y')
         node_A.set_left(leaf_y)
-        leaf_z = RedBlackTree('z')
+        leaf_z = RedBlackNode('z')
         node_A.set_right(leaf_z)
 
         node_B.set_right(node_A)
         self.assertEqual(str(node_B), 'black:B -> [black:x | black:A -> [black:y | black:z]]')
 
         rotated_tree = node_B.rotate(rotate_right=False)
-        self.assertEqual(str(rotated_tree), 'black:A -> [black:B -> [black:x | black:y] | black:z]')
\ No newline at end of file
+        self.assertEqual(str(rotated_tree), 'black:A -> [black:B -> [black:x | black:y] | black:z]')
+
+def black_height(testcase, node):
+    """
+    Checks red-black properties under node, returning its black height.
+    """
+    if not node:
+        # None or the NIL sentinel
+        return 1
+
+    if node.color == 'red':
+        for child in (node.left, node.right):
+            testcase.assertEqual(child.color, 'black')
+    for child in (node.left, node.right):
+        if child:
+            testcase.assertIs(child.parent, node)
+    testcase.assertEqual(node.size, 1 + node.left.size + node.right.size)
+
+    left = black_height(testcase, node.left)
+    right = black_height(testcase, node.right)
+    testcase.assertEqual(left, right)
+    return left + (1 if node.color == 'black' else 0)
+
+
+class RedBlackBalanceTestCase(unittest.TestCase):
+
+    def testInsertInnerGrandchild(self):
+        tree = RedBlackTree(10)
+        tree.insert(5)
+        tree.insert(7)
+        self.assertEqual(str(tree), 'black:7 -> [red:5 | red:10]')
+
+    def testInsertOuterGrandchild(self):
+        tree = RedBlackTree(10)
+        tree.insert(15)
+        tree.insert(20)
+        self.assertEqual(str(tree), 'black:15 -> [red:10 | red:20]')
+
+    def testSortedInsertsStayBalanced(self):
+        tree = RedBlackTree()
+        for x in range(1000):
+            tree.insert(x)
+
+        self.assertIsNone(tree.root.parent)
+        self.assertEqual(tree.root.color, 'black')
+        # black height bounds the depth: at most 2 * log2(n + 1)
+        self.assertLessEqual(black_height(self, tree.root), 11)
+        for x in (0, 500, 999):
+            self.assertIn(x, tree)
+        self.assertNotIn(1000, tree)
+
+    def testDeleteKeepsBalance(self):
+        rnd = random.Random(0)
+        values = list(range(500))
+        rnd.shuffle(values)
+        tree = RedBlackTree()
+        for x in values:
+            tree.insert(x)
+
+        for i, x in enumerate(values):
+            tree.delete(x)
+            self.assertNotIn(x, tree)
+            self.assertEqual(len(tree), len(values) - i - 1)
+            if tree.root:
+                self.assertEqual(tree.root.color, 'black')
+                self.assertIsNone(tree.root.parent)
+            black_height(self, tree.root)
+
+        self.assertEqual(str(tree), '[]')
+
+    def testDeleteCases(self):
+        tree = RedBlackTree(10)
+        for x in [5, 15, 2, 7, 12, 20, 1]:
+            tree.insert(x)
+        self.assertEqual(str(tree), 'black:10 -> [red:5 -> [black:2 -> [red:1 | None] | black:7] | black:15 -> [red:12 | red:20]]')
+
+        # red leaf
+        tree.delete(1)
+        self.assertEqual(str(tree), 'black:10 -> [red:5 -> [black:2 | black:7] | black:15 -> [red:12 | red:20]]')
+
+        # two children: the predecessor takes its place
+        tree.delete(15)
+        self.assertEqual(str(tree), 'black:10 -> [red:5 -> [black:2 | black:7] | black:12 -> [None | red:20]]')
+
+        # black leaf with a black sibling and black nephews: recolor, then fix up
+        tree.delete(2)
+        self.assertEqual(str(tree), 'black:10 -> [black:5 -> [None | red:7] | black:12 -> [None | red:20]]')
+
+        self.assertRaises(KeyError, tree.delete, 2)
+
+    def testSizesFollowRotations(self):
+        tree = RedBlackTree()
+        for x in range(100):
+            tree.insert(x)
+
+        self.assertEqual(len(tree), 100)
+        self.assertEqual(tree.root.size, 100)
+        self.assertEqual([tree.select(i) for i in range(100)], list(range(100)))
+        self.assertEqual(tree.rank(42), 42)
+        self.assertEqual(tree.count_range(10, 20), 10)
+
+
+class RedBlackBulkTestCase(unittest.TestCase):
+
+    def testFromSorted(self):
+        tree = RedBlackTree.from_sorted(range(10))
+        self.assertEqual(
+            str(tree),
+            'black:5 -> [black:2 -> [black:1 -> [red:0 | None] | black:4 -> [red:3 | None]] '
+            '| black:8 -> [black:7 -> [red:6 | None] | black:9]]')
+        for n in range(40):
+            black_height(self, RedBlackTree.from_sorted(range(n)).root)
+        self.assertRaises(ValueError, RedBlackTree.from_sorted, [2, 1])
+
+    def testSplitAndJoin(self):
+        rnd = random.Random(1)
+        values = sorted(rnd.sample(range(10000), 2000))
+        tree = RedBlackTree.from_sorted(values)
+
+        for key in (-1, 0, values[700], 5000, values[-1], 10001):
+            left, right = tree.split(key)
+            for part in (left, right):
+                if part.root:
+                    self.assertEqual(part.root.color, 'black')
+                black_height(self, part.root)
+            self.assertEqual(len(left), len([x for x in values if x < key]))
+            self.assertEqual(len(tree), 0)
+            if len(right):
+                self.assertGreaterEqual(right.select(0), key)
+
+            tree = RedBlackTree.join(left, right)
+            black_height(self, tree.root)
+            self.assertEqual([tree.select(i) for i in range(0, 2000, 97)], values[::97])
+
+    def testJoinUnevenTrees(self):
+        small = RedBlackTree.from_sorted([-3, -2, -1])
+        big = RedBlackTree()
+        for x in range(1000):
+            big.insert(x)
+
+        tree = RedBlackTree.join(small, big)
+        black_height(self, tree.root)
+        self.assertEqual(len(tree), 1003)
+        self.assertEqual(tree.select(0), -3)
+        self.assertEqual(tree.rank(0), 3)
+        tree.delete(500)
+        tree.insert(2000)
+        black_height(self, tree.root)
+
+
+
+class RedBlackIterationTestCase(unittest.TestCase):
+
+    def testIterAfterChanges(self):
+        rng = random.Random(7)
+        values = rng.sample(range(10000), 2000)
+        tree = RedBlackTree()
+        for x in values:
+            tree.insert(x)
+        for x in values[::3]:
+            tree.delete(x)
+
+        remaining = sorted(set(values) - set(values[::3]))
+        self.assertEqual(list(tree), remaining)
+        self.assertEqual(list(reversed(tree)), remaining[::-1])
+        self.assertEqual(list(tree.irange(2000, 3000, inclusive=(True, False))),
+                         [x for x in remaining if 2000 <= x < 3000])
+        self.assertEqual(list(tree.items_from(remaining[-3])), remaining[-3:])
+        self.assertEqual(list(RedBlackTree()), [])
@@ -0,0 +1,48 @@
+import random
+import unittest
+
+from ..splaytree import SplayTree
+
+
+class SplayTreeTestCase(unittest.TestCase):
+
+    def test_access_splays(self):
+        tree = SplayTree()
+        for x in [5, 3, 8, 1, 4]:
+            tree.insert(x)
+        self.assertEqual(tree.root.value, 4)
+
+        tree.find(8)
+        self.assertEqual(tree.root.value, 8)
+        self.assertIn(1, tree)
+        self.assertEqual(tree.root.value, 1)
+
+        # a miss splays the last node on the way
+        self.assertRaises(KeyError, tree.find, 2)
+        self.assertIn(tree.root.value, (1, 3))
+        self.assertEqual(list(tree), [1, 3, 4, 5, 8])
+
+    def test_sorted_inserts(self):
+        tree = SplayTree()
+        for x in range(10000):
+            tree.insert(x)
+        # each insert lands at the root: no deep walk on sorted input
+        self.assertEqual(tree.root.value, 9999)
+        self.assertIn(0, tree)
+        self.assertEqual(tree.root.value, 0)
+        self.assertEqual(len(tree), 10000)
+
+    def test_delete(self):
+        rng = random.Random(3)
+        values = rng.sample(range(5000), 1000)
+        tree = SplayTree()
+        for x in values:
+            tree.insert(x)
+        for x in values[::2]:
+            tree.delete(x)
+
+        remaining = sorted(values[1::2])
+        self.assertEqual(list(tree), remaining)
+        self.assertEqual(len(tree), len(remaining))
+        self.assertEqual([tree.select(i) for i in range(0, 500, 50)], remaining[::50])
+        self.assertRaises(KeyError, tree.delete, values[0])
@@ -0,0 +1,90 @@
+import random
+import unittest
+
+from ..treap import Treap
+
+
+def check_heap(testcase, node):
+    """
+    Heap order on priorities, parent links and subtree sizes.
+    """
+    nodes = [node] if node else []
+    while nodes:
+        node = nodes.pop()
+        size = 1
+        for child in (node.left, node.right):
+            if child:
+                testcase.assertIs(child.parent, node)
+                testcase.assertGreaterEqual(child.priority, node.priority)
+                size += child.size
+                nodes.append(child)
+        testcase.assertEqual(node.size, size)
+
+
+class TreapTestCase(unittest.TestCase):
+
+    def test_insert_delete(self):
+        rng = random.Random(5)
+        values = rng.sample(range(5000), 1000)
+        tree = Treap(seed=1)
+        for x in values:
+            tree.insert(x)
+        check_heap(self, tree.root)
+
+        for x in values[::2]:
+            tree.delete(x)
+        check_heap(self, tree.root)
+        remaining = sorted(values[1::2])
+        self.assertEqual(list(tree), remaining)
+        self.assertEqual(tree.rank(remaining[100]), 100)
+
+    def test_sorted_inserts(self):
+        tree = Treap(seed=2)
+        for x in range(10000):
+            tree.insert(x)
+
+        depth, node = 0, tree.root
+        while node.left:
+            depth, node = depth + 1, node.left
+        self.assertLess(depth, 100)
+        self.assertEqual(len(tree), 10000)
+
+    def test_from_sorted_split_join(self):
+        tree = Treap.from_sorted(range(1000))
+        check_heap(self, tree.root)
+        tree.insert(2000)
+        check_heap(self, tree.root)
+
+        left, right = tree.split(300)
+        check_heap(self, left.root)
+        check_heap(self, right.root)
+        self.assertEqual(list(left), list(range(300)))
+
+        tree = Treap.join(left, right)
+        check_heap(self, tree.root)
+        self.assertEqual(list(tree), list(range(1000)) + [2000])
+        self.assertEqual(len(Treap.join(tree, Treap())), 1001)
+
+    def test_seed_is_reproducible(self):
+        def build(seed):
+            tree = Treap.from_sorted(range(500), seed=seed)
+            for x in range(500, 600):
+                tree.insert(x)
+            left, right = tree.split(250)
+            left.insert(-1)
+            right.delete(300)
+            right.insert(1000)
+            tree = Treap.join(left, right)
+            tree.insert(2000)
+            check_heap(self, tree.root)
+
+            priorities, nodes = [], [tree.root]
+            while nodes:
+                node = nodes.pop()
+                if node:
+                    priorities.append((node.value, node.priority))
+                    nodes.extend((node.right, node.left))
+            return str(tree.root), priorities
+
+        self.assertEqual(build(7), build(7))
+        self.assertNotEqual(build(7), build(8))
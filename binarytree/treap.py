@@ -0,0 +1,150 @@
+import random
+from collections import deque
+
+from .binarytree import Node, BinarySearchTree
+
+
+class TreapNode(Node):
+    __slots__ = ('priority',)
+
+    def __init__(self, value):
+        super(TreapNode, self).__init__(value)
+        # set by the tree; smaller is nearer the root
+        self.priority = 0.0
+
+
+class Treap(BinarySearchTree):
+    """
+    Randomized search tree (Seidel and Aragon): a BST on the values and a
+    min-heap on random priorities at once. The shape is the one of inserting
+    the values in random order, whatever order they actually come in: expected
+    O(logn) depth, no rebalancing rules, at most two rotations on average per
+    insert or delete.
+
+    Rank, select, iteration, ranges and split are the BinarySearchTree ones
+    (split keeps the heap order); join merges by priority. seed makes the
+    priorities, hence the shape, reproducible: the trees split and join make
+    carry on drawing from the same generator.
+    """
+
+    node_class = TreapNode
+
+    def __init__(self, value=None, seed=None):
+        self._random = random.Random(seed).random
+        self.root = None
+        if value is not None:
+            self.insert(value)
+
+    @classmethod
+    def from_sorted(cls, iterable, seed=None):
+        """
+        The balanced BinarySearchTree build, then sorted random priorities
+        handed out level by level, so every level's are bigger than the last's.
+        Run time: O(nlogn) for the priorities
+        """
+        tree = super(Treap, cls).from_sorted(iterable)
+        tree._random = random.Random(seed).random
+        priorities = sorted(tree._random() for _ in range(len(tree)))
+
+        level = deque([tree.root] if tree.root else [])
+        for priority in priorities:
+            node = level.popleft()
+            node.priority = priority
+            if node.left:
+                level.append(node.left)
+            if node.right:
+                level.append(node.right)
+
+        return tree
+
+    def split(self, key):
+        """
+        BinarySearchTree.split; both halves draw their priorities from this
+        tree's generator.
+        """
+        left, right = super(Treap, self).split(key)
+        left._random = right._random = self._random
+        return left, right
+
+    @classmethod
+    def join(cls, left, right):
+        """
+        A treap with the values of left then right, all of left's being <=
+        right's: zips left's right spine with right's left spine in priority
+        order. left and right are left empty; the result draws its priorities
+        from left's generator.
+        Run time: O(logn) expected
+        """
+        tree = cls()
+        tree._random = left._random
+        path = []
+        parent, on_left = None, False
+        a, b = left.root, right.root
+        while a and b:
+            if a.priority < b.priority:
+                node, a = a, a.right
+                next_on_left = False
+            else:
+                node, b = b, b.left
+                next_on_left = True
+
+            if parent is None:
+                tree.root = node
+                node.parent = None
+            elif on_left:
+                parent.set_left(node)
+            else:
+                parent.set_right(node)
+            path.append(node)
+            parent, on_left = node, next_on_left
+
+        rest = a or b
+        if parent is None:
+            tree.root = rest
+        elif rest:
+            if on_left:
+                parent.set_left(rest)
+            else:
+                parent.set_right(rest)
+        elif on_left:
+            parent.left = None
+        else:
+            parent.right = None
+
+        for node in reversed(path):
+            node.update_size()
+
+        left.root = right.root = None
+        return tree
+
+    def insert(self, value, unique=False):
+        """
+        Hangs a leaf with a fresh random priority, then rotates it up until its
+        parent's priority is smaller. unique as in BinarySearchTree.insert.
+        Run time: O(logn) expected
+        """
+        node = self.node_class(value)
+        node.priority = self._random()
+        if self._insert_node(node, unique) is None:
+            return None
+        while node.parent is not None and node.priority < node.parent.priority:
+            self._rotate_up(node)
+
+        return node
+
+    def delete(self, value):
+        """
+        Rotates the target down, under its child of smaller priority, until it
+        has at most one child, then substitutes it by that child.
+        Run time: O(logn) expected
+        """
+        target = self.find(value)
+        while target.left and target.right:
+            if target.left.priority < target.right.priority:
+                self._rotate_up(target.left)
+            else:
+                self._rotate_up(target.right)
+
+        changed = target.parent
+        self._transplant(target, target.left or target.right)
+        self._update_sizes(changed)
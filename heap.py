@@ -1,70 +1,225 @@
 """
 An alternate heap implementation in Python.
 
-TODO:
-- benchmark against heapq (time and memory)
+Run this module to benchmark it against heapq (time and memory):
+
+    python heap.py --sizes 1000 100000 --output results.json
 """
+import heapq
 import random
-import math
-from collections import deque
+
+class HeapStats(object):
+    """
+    Tracer that aggregates what every heap operation cost, by operation name:
+
+        stats = HeapStats()
+        heap = Heap(tracer=stats)
+        ...
+        stats.swaps['insert'], stats.comparisons['extract_min'], stats.max_depth['insert']
+
+    Any callable with the same signature as __call__ can be used as a tracer.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.swaps = {}
+        self.comparisons = {}
+        self.max_depth = {}
+
+    def __call__(self, operation, swaps, comparisons, depth):
+        self.calls[operation] = self.calls.get(operation, 0) + 1
+        self.swaps[operation] = self.swaps.get(operation, 0) + swaps
+        self.comparisons[operation] = self.comparisons.get(operation, 0) + comparisons
+        self.max_depth[operation] = max(self.max_depth.get(operation, 0), depth)
+
+    def __repr__(self):
+        return 'HeapStats(calls=%s, swaps=%s, comparisons=%s, max_depth=%s)' % (
+            self.calls, self.swaps, self.comparisons, self.max_depth)
+
 
 class Heap(object):
     """
     Invariant: P(N) <= N, P(N): parent of N
+
+    The array is a d-ary tree (arity=2 is the classic binary heap): children of i 
+    are d*i + 1 ... d*i + d. Bigger arities make the tree shallower, so inserts
+    bubble up fewer levels, at the cost of d - 1 comparisons per level going down.
+
+    With key=f, f(item) is computed once on the way in and kept in self.keys, 
+    a list parallel to self.array; comparisons only look at self.keys. Without 
+    a key, self.keys is self.array.
+
+    Operations are silent. To profile them, pass a tracer: a callable invoked once 
+    per operation as tracer(operation, swaps, comparisons, depth), where depth is 
+    the longest sift (in levels) the operation did. See HeapStats.
+    Untraced heaps run the plain sift loops, with no counting at all.
     """
     
-    def __init__(self):
+    def __init__(self, arity=2, key=None, tracer=None):
+        if arity < 2:
+            raise ValueError('arity must be at least 2, got %r' % (arity,))
+
+        self.arity = arity
+        self.key = key
         self.array = []
+        self.keys = self.array if key is None else []
+        self.tracer = tracer
+        if tracer is not None:
+            self._bubble_down = self._traced_bubble_down
+            self._bubble_up = self._traced_bubble_up
+            self._counters = [0, 0, 0]
 
     def _parent_of(self, i):
-        return math.ceil(i/2) - 1
-
-    def _left_of(self, i):
-        return (i + 1) * 2 - 1
+        return (i - 1) // self.arity
 
-    def _right_of(self, i):
-        return (i + 1) * 2  
+    def _first_child_of(self, i):
+        return self.arity * i + 1
 
     def _swap(self, i, j):
-        self.array[i], self.array[j] = self.array[j], self.array[i]
+        array = self.array
+        array[i], array[j] = array[j], array[i]
+        keys = self.keys
+        if keys is not array:
+            keys[i], keys[j] = keys[j], keys[i]
 
-    def extract_min(self):
+    def _bubble_down(self, i):
         """
-        Move the tail to the top and bubble-down. Run time: O(logn)
+        Sift the item at i down until all children are bigger. Run time: O(d*log_d(n))
         """
-        minimum = self.array[0]
-        self._swap(0, len(self) - 1)
-        self.array.pop()
-
-        next = 0        
-        while next is not None:
-            left = self._left_of(next)
-            right = self._right_of(next)
-            print(next, ', ', left, ', ', right)
-
-            if left >= len(self):
-                # leaf
-                next = None
-
-            elif right >= len(self): 
-                # single child to the left
-                if self.array[next] < self.array[left]:
-                    next = None
-                else:
-                    self._swap(next, left)
-                    next = left
+        keys = self.keys
+        n = len(keys)
+        d = self.arity
+        while True:
+            first = d * i + 1
+            if first >= n:
+                return
 
+            smallest = first
+            for child in range(first + 1, min(first + d, n)):
+                if keys[child] < keys[smallest]:
+                    smallest = child
+
+            if keys[smallest] < keys[i]:
+                self._swap(i, smallest)
+                i = smallest
             else:
-                # two children
-                if self.array[next] < self.array[left] and self.array[next] < self.array[right]:
-                    next = None
-                else:
-                    if self.array[left] < self.array[right]:
-                        self._swap(next, left)
-                        next = left
-                    else:
-                        self._swap(next, right)
-                        next = right 
+                return
+
+    def _bubble_up(self, i):
+        """
+        Sift the item at i up while it is smaller than its parent. Run time: O(log_d(n))
+        """
+        keys = self.keys
+        d = self.arity
+        while i:
+            parent = (i - 1) // d
+            if keys[i] < keys[parent]:
+                self._swap(i, parent)
+                i = parent
+            else:
+                return
+
+    def _traced_bubble_down(self, i):
+        """
+        Same as _bubble_down, counting into self._counters.
+        """
+        counters = self._counters
+        keys = self.keys
+        n = len(keys)
+        d = self.arity
+        depth = 0
+        while True:
+            first = d * i + 1
+            if first >= n:
+                break
+
+            smallest = first
+            for child in range(first + 1, min(first + d, n)):
+                counters[1] += 1
+                if keys[child] < keys[smallest]:
+                    smallest = child
+
+            counters[1] += 1
+            if keys[smallest] < keys[i]:
+                self._swap(i, smallest)
+                counters[0] += 1
+                depth += 1
+                i = smallest
+            else:
+                break
+
+        counters[2] = max(counters[2], depth)
+
+    def _traced_bubble_up(self, i):
+        """
+        Same as _bubble_up, counting into self._counters.
+        """
+        counters = self._counters
+        keys = self.keys
+        d = self.arity
+        depth = 0
+        while i:
+            parent = (i - 1) // d
+            counters[1] += 1
+            if keys[i] < keys[parent]:
+                self._swap(i, parent)
+                counters[0] += 1
+                depth += 1
+                i = parent
+            else:
+                break
+
+        counters[2] = max(counters[2], depth)
+
+    def _trace(self, operation):
+        """
+        Reports the counters of the operation that just finished and resets them.
+        """
+        swaps, comparisons, depth = self._counters
+        self._counters = [0, 0, 0]
+        self.tracer(operation, swaps, comparisons, depth)
+
+    @classmethod
+    def from_iterable(cls, iterable, arity=2, key=None, tracer=None):
+        """
+        Builds a heap bottom-up (Floyd's method). Run time: O(n)
+        """
+        heap = cls(arity=arity, key=key, tracer=tracer)
+        heap.array.extend(iterable)
+        if key is not None:
+            heap.keys.extend(map(key, heap.array))
+        heap.heapify()
+        return heap
+
+    def heapify(self):
+        """
+        Restores the invariant over the whole array, bubbling down every internal 
+        node from the last one to the root. Run time: O(n)
+        """
+        for i in range(self._parent_of(len(self.array) - 1), -1, -1):
+            self._bubble_down(i)
+
+        if self.tracer is not None:
+            self._trace('heapify')
+
+    def extract_min(self):
+        """
+        Move the tail to the top and bubble-down. Run time: O(d*log_d(n))
+        """
+        array = self.array
+        keys = self.keys
+        minimum = array[0]
+        last = array.pop()
+        if array:
+            array[0] = last
+            if keys is not array:
+                keys[0] = keys.pop()
+            self._bubble_down(0)
+        elif keys is not array:
+            keys.pop()
+
+        if self.tracer is not None:
+            self._trace('extract_min')
 
         return minimum
 
@@ -74,6 +229,25 @@ class Heap(object):
         """
         return self.array[0]
 
+    def replace_min(self, item):
+        """
+        Pops the minimum and inserts item with a single bubble-down. 
+        Run time: O(d*log_d(n))
+        """
+        minimum = self.array[0]
+        self._replace_root(item, item if self.key is None else self.key(item))
+
+        if self.tracer is not None:
+            self._trace('replace_min')
+
+        return minimum
+
+    def _replace_root(self, item, key):
+        self.array[0] = item
+        if self.keys is not self.array:
+            self.keys[0] = key
+        self._bubble_down(0)
+
     def __len__(self):
         return len(self.array)
 
@@ -84,67 +258,871 @@ class Heap(object):
         return self
 
     def __next__(self):
-        if self.heap:
+        if self.array:
             return self.extract_min()
         else:
             raise StopIteration
 
     def insert(self, item):
         """
-        Insert at the tail and bubble-up. Run time: O(logn)
+        Insert at the tail and bubble-up. Run time: O(log_d(n))
         """
         self.array.append(item)
-        current = len(self.array) - 1
-        while current:
-            parent = self._parent_of(current)
-            if self.array[current] < self.array[parent]:
-                self._swap(current, parent)
-            current = parent 
-        print(self)
+        if self.key is not None:
+            self.keys.append(self.key(item))
+        self._bubble_up(len(self.array) - 1)
+
+        if self.tracer is not None:
+            self._trace('insert')
+
+    def insert_many(self, items):
+        """
+        Appends the whole batch at the tail and re-sifts only the ancestors of the 
+        new slots, one level at a time, from the bottom up.
+
+        Ancestors of a contiguous range of slots are again a contiguous range, so 
+        each level is a single slice of the array. Run time: O(k + log(n)^2) for a 
+        batch of k items.
+        """
+        items = list(items)
+        if not items:
+            return
+
+        lo = len(self.array)
+        hi = lo + len(items) - 1
+        self.array.extend(items)
+        if self.key is not None:
+            self.keys.extend(map(self.key, items))
+
+        while hi > 0:
+            lo = max(self._parent_of(lo), 0)
+            hi = self._parent_of(hi)
+            for i in range(hi, lo - 1, -1):
+                self._bubble_down(i)
+            if lo == 0:
+                break
+
+        if self.tracer is not None:
+            self._trace('insert_many')
 
     def delete(self, item):
         """
-        Not implemented, but can be done in O(logn).
+        Removes one occurrence of item, ValueError if there is none. Finding it
+        is a linear scan, O(n), then the re-sift is O(d*log_d(n)); IndexedHeap 
+        finds its items in O(1).
         """
-        pass
+        self._remove_at(self.array.index(item))
+
+        if self.tracer is not None:
+            self._trace('delete')
+
+    def _remove_at(self, i):
+        """
+        Move the tail into slot i and re-sift it in whichever direction it belongs.
+        """
+        last = len(self.array) - 1
+        if i != last:
+            self._swap(i, last)
+
+        item = self.array.pop()
+        if self.keys is not self.array:
+            self.keys.pop()
+
+        if i < last:
+            self._bubble_down(i)
+            self._bubble_up(i)
+
+        return item
 
     def merge(self, other_heap):
-        pass
+        """
+        Moves every item of other_heap into this one, leaving other_heap empty.
+        An array can't be spliced, so this is a batched insert: O(m + log(n)^2) 
+        for m items. See PairingHeap for O(1) merges.
+        """
+        if other_heap is self:
+            raise ValueError('cannot merge a heap into itself')
 
+        self.insert_many(other_heap.array)
+        other_heap.array.clear()
+        other_heap.keys.clear()
+
+
+class _Entry(object):
+    """
+    Slot of an IndexedHeap: only the priority takes part in comparisons.
+    """
+    __slots__ = ('priority', 'item')
+
+    def __init__(self, priority, item):
+        self.priority = priority
+        self.item = item
+
+    def __lt__(self, other):
+        return self.priority < other.priority
+
+    def __repr__(self):
+        return '%s:%s' % (self.priority, self.item)
 
-if __name__ == "__main__":
-    import random
-    import time
-    import heapq
 
-    print("Benchmarking against heapq:")
+class IndexedHeap(Heap):
+    """
+    Addressable min-heap of (item, priority) pairs.
+
+    Besides the array, keeps a position index item -> slot, updated on every swap, 
+    so any item can be reached in O(1) and re-sifted from where it is.
+    Items must be hashable and are unique inside the heap.
+
+    Usage (e.g. Dijkstra):
+
+        queue = IndexedHeap()
+        queue.insert('a', 10)
+        queue.decrease_key('a', 3)
+        queue.extract_min()  # 'a'
+    """
 
-    N = 100000
-    sample = []
-    for i in range(N):
-        sample.append(random.randint(1, 1000))
+    def __init__(self, arity=2, tracer=None):
+        super(IndexedHeap, self).__init__(arity=arity, tracer=tracer)
+        self.position = {}
 
-    print('Sample has %s elements.', N)
+    def _swap(self, i, j):
+        array = self.array
+        array[i], array[j] = array[j], array[i]
+        self.position[array[i].item] = i
+        self.position[array[j].item] = j
 
-    # print('Randomly distributing operations...')
+    @classmethod
+    def from_iterable(cls, pairs, arity=2, tracer=None):
+        """
+        Builds the heap from (item, priority) pairs. Run time: O(n)
+        """
+        heap = cls(arity=arity, tracer=tracer)
+        for item, priority in pairs:
+            if item in heap.position:
+                raise ValueError('%r is already in the heap' % (item,))
+            heap.position[item] = len(heap.array)
+            heap.array.append(_Entry(priority, item))
+        heap.heapify()
+        return heap
+
+    def insert(self, item, priority):
+        """
+        Run time: O(logn)
+        """
+        if item in self.position:
+            raise ValueError('%r is already in the heap' % (item,))
+
+        self.position[item] = len(self.array)
+        self.array.append(_Entry(priority, item))
+        self._bubble_up(len(self.array) - 1)
+
+        if self.tracer is not None:
+            self._trace('insert')
+
+    def insert_many(self, pairs):
+        """
+        Batched insert of (item, priority) pairs, see Heap.insert_many.
+        """
+        entries = [_Entry(priority, item) for item, priority in pairs]
+
+        # the whole batch is checked before the heap changes at all
+        seen = set()
+        for entry in entries:
+            if entry.item in self.position or entry.item in seen:
+                raise ValueError('%r is already in the heap' % (entry.item,))
+            seen.add(entry.item)
+
+        for i, entry in enumerate(entries, len(self.array)):
+            self.position[entry.item] = i
+
+        super(IndexedHeap, self).insert_many(entries)
+
+    def find_min(self):
+        """
+        O(1)
+        """
+        return self.array[0].item
+
+    def replace_min(self, item, priority):
+        """
+        Pops the minimum item and inserts item with a single bubble-down. 
+        Run time: O(logn)
+        """
+        if item in self.position:
+            raise ValueError('%r is already in the heap' % (item,))
+
+        minimum = self.array[0]
+        del self.position[minimum.item]
+        self.position[item] = 0
+        self.array[0] = _Entry(priority, item)
+        self._bubble_down(0)
 
-    print('Running test for heapq:')
+        if self.tracer is not None:
+            self._trace('replace_min')
+
+        return minimum.item
+
+    def extract_min(self):
+        """
+        Run time: O(logn)
+        """
+        entry = self._remove_at(0)
+
+        if self.tracer is not None:
+            self._trace('extract_min')
+
+        return entry.item
+
+    def priority_of(self, item):
+        """
+        O(1). Raises KeyError if item is not in the heap.
+        """
+        return self.array[self.position[item]].priority
+
+    def decrease_key(self, item, priority):
+        """
+        Lowers the priority of item and bubbles it up. Run time: O(logn)
+        """
+        i = self.position[item]
+        entry = self.array[i]
+        if entry.priority < priority:
+            raise ValueError('new priority %r is bigger than %r' % (priority, entry.priority))
+
+        entry.priority = priority
+        self._bubble_up(i)
+
+        if self.tracer is not None:
+            self._trace('decrease_key')
+
+    def increase_key(self, item, priority):
+        """
+        Raises the priority of item and bubbles it down. Run time: O(logn)
+        """
+        i = self.position[item]
+        entry = self.array[i]
+        if priority < entry.priority:
+            raise ValueError('new priority %r is smaller than %r' % (priority, entry.priority))
+
+        entry.priority = priority
+        self._bubble_down(i)
+
+        if self.tracer is not None:
+            self._trace('increase_key')
+
+    def update(self, item, priority):
+        """
+        Inserts item, or moves it to the new priority in whatever direction. 
+        Run time: O(logn)
+        """
+        if item not in self.position:
+            self.insert(item, priority)
+        elif priority < self.priority_of(item):
+            self.decrease_key(item, priority)
+        else:
+            self.increase_key(item, priority)
+
+    def delete(self, item):
+        """
+        Raises KeyError if item is not in the heap. Run time: O(logn)
+        """
+        self._remove_at(self.position[item])
+
+        if self.tracer is not None:
+            self._trace('delete')
+
+    def _remove_at(self, i):
+        entry = super(IndexedHeap, self)._remove_at(i)
+        del self.position[entry.item]
+        return entry
+
+    def __contains__(self, item):
+        """
+        O(1)
+        """
+        return item in self.position
+
+    def merge(self, other_heap):
+        """
+        Moves every item of other_heap into this one, leaving other_heap empty.
+        Run time: O(m + log(n)^2) for m items.
+        """
+        if other_heap is self:
+            raise ValueError('cannot merge a heap into itself')
 
-    expected = sorted(sample)
+        self.insert_many((entry.item, entry.priority) for entry in other_heap.array)
+        other_heap.array.clear()
+        other_heap.position.clear()
 
-    now = time.time()
 
+class _Owner(object):
+    """
+    The heap a PairingHeap's nodes belong to. A merge forwards the emptied
+    heap's owner to the other heap's, in O(1) instead of repointing every
+    node; lookups follow the chain and halve it (as in union-find).
+    """
+    __slots__ = ('heap',)
+
+    def __init__(self, heap):
+        # a PairingHeap, or the _Owner it was merged into
+        self.heap = heap
+
+    def resolve(self):
+        owner = self
+        while isinstance(owner.heap, _Owner):
+            forward = owner.heap
+            owner.heap = forward.heap
+            owner = forward
+        return owner
+
+
+class _PairingNode(object):
+    __slots__ = ('item', 'key', 'child', 'sibling', 'prev', 'owner')
+
+    def __init__(self, item, key, owner):
+        self.item = item
+        self.key = key
+        self.child = None
+        self.sibling = None
+        # parent for a first child, left sibling otherwise
+        self.prev = None
+        # None once removed
+        self.owner = owner
+
+    def __repr__(self):
+        return '<%r>' % (self.item,)
+
+
+class PairingHeap(object):
+    """
+    Heap-ordered multiway tree, kept as child/sibling links, with the same API as Heap.
+
+    - insert and merge just link two roots: O(1)
+    - extract_min pairs up the root's children left to right, then folds the 
+      pairs right to left (two-pass pairing): O(logn) amortized
+    - insert returns the node, which is the handle for delete and decrease_key;
+      a handle of another heap, or of a removed node, raises ValueError
+
+    key works as in Heap: computed once per item, stored in its node.
+    """
+
+    def __init__(self, key=None):
+        self.key = key
+        self.root = None
+        self.size = 0
+        self._owner = _Owner(self)
+
+    @classmethod
+    def from_iterable(cls, iterable, key=None):
+        """
+        O(n)
+        """
+        heap = cls(key=key)
+        heap.insert_many(iterable)
+        return heap
+
+    def _link(self, a, b):
+        """
+        Links two roots, the bigger one becomes the first child of the smaller.
+        """
+        if b.key < a.key:
+            a, b = b, a
+
+        b.prev = a
+        b.sibling = a.child
+        if a.child is not None:
+            a.child.prev = b
+        a.child = b
+        return a
+
+    def _merge_pairs(self, first):
+        """
+        Two-pass pairing of a sibling list, returns the new root (or None).
+        """
+        pairs = []
+        while first is not None:
+            a = first
+            b = a.sibling
+            a.prev = a.sibling = None
+            if b is None:
+                pairs.append(a)
+                break
+
+            first = b.sibling
+            b.prev = b.sibling = None
+            pairs.append(self._link(a, b))
+
+        root = pairs.pop() if pairs else None
+        while pairs:
+            root = self._link(pairs.pop(), root)
+        return root
+
+    def _cut(self, node):
+        """
+        Detaches node (and its subtree) from its parent or left sibling.
+        """
+        prev = node.prev
+        if prev.child is node:
+            prev.child = node.sibling
+        else:
+            prev.sibling = node.sibling
+        if node.sibling is not None:
+            node.sibling.prev = prev
+        node.prev = node.sibling = None
+
+    def insert(self, item):
+        """
+        O(1). Returns the node holding item.
+        """
+        node = _PairingNode(item, item if self.key is None else self.key(item), self._owner)
+        self.root = node if self.root is None else self._link(self.root, node)
+        self.size += 1
+        return node
+
+    def insert_many(self, items):
+        for item in items:
+            self.insert(item)
+
+    def _check_node(self, node):
+        if node.owner is not None:
+            node.owner = node.owner.resolve()
+        if node.owner is None or node.owner.heap is not self:
+            raise ValueError('%r is not in the heap' % (node,))
+
+    def find_min(self):
+        """
+        O(1)
+        """
+        if self.root is None:
+            raise IndexError('find_min from an empty heap')
+        return self.root.item
+
+    def extract_min(self):
+        """
+        O(logn) amortized
+        """
+        root = self.root
+        if root is None:
+            raise IndexError('extract_min from an empty heap')
+        self.root = self._merge_pairs(root.child)
+        root.child = None
+        root.owner = None
+        self.size -= 1
+        return root.item
+
+    def delete(self, node):
+        """
+        Removes the node returned by insert; ValueError if it was already
+        removed. O(logn) amortized
+        """
+        self._check_node(node)
+        if node is self.root:
+            self.extract_min()
+            return
+
+        self._cut(node)
+        subtree = self._merge_pairs(node.child)
+        node.child = None
+        node.owner = None
+        if subtree is not None:
+            self.root = self._link(self.root, subtree)
+        self.size -= 1
+
+    def decrease_key(self, node, item):
+        """
+        Replaces node's item by a smaller one. O(1), O(logn) amortized 
+        """
+        self._check_node(node)
+        key = item if self.key is None else self.key(item)
+        if node.key < key:
+            raise ValueError('new item %r is bigger than %r' % (item, node.item))
+
+        node.item = item
+        node.key = key
+        if node is not self.root:
+            self._cut(node)
+            self.root = self._link(self.root, node)
+
+    def merge(self, other_heap):
+        """
+        Takes over every node of other_heap, leaving it empty: handles of its
+        nodes now belong to this heap. O(1)
+        """
+        if other_heap is self:
+            raise ValueError('cannot merge a heap into itself')
+        if other_heap.root is None:
+            return
+
+        if self.root is None:
+            self.root = other_heap.root
+        else:
+            self.root = self._link(self.root, other_heap.root)
+        self.size += other_heap.size
+        other_heap._owner.heap = self._owner
+        other_heap._owner = _Owner(other_heap)
+        other_heap.root = None
+        other_heap.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return 'PairingHeap(size=%s, min=%r)' % (self.size, self.root)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.root is not None:
+            return self.extract_min()
+        else:
+            raise StopIteration
+
+
+class _Reversed(object):
+    """
+    Flips the order of a key, so a min-heap keeps the biggest on top.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+class TopK(object):
+    """
+    Keeps the k largest items seen in a stream (the k smallest with smallest=True) 
+    in O(k) memory.
+
+    Backed by a Heap of size k whose root is the worst item kept: once full, an 
+    incoming item is rejected with a single comparison against the root, or 
+    replaces it with a single bubble-down. Run time: O(n log k) worst case, 
+    close to O(n) when most items are rejected.
+
+        top = TopK(3)
+        top.push_many([5, 1, 9, 7, 3])
+        top.items()  # [9, 7, 5]
+    """
+
+    def __init__(self, k, key=None, smallest=False):
+        if k < 1:
+            raise ValueError('k must be at least 1, got %r' % (k,))
+
+        self.k = k
+        self.key = key
+        self.smallest = smallest
+
+        order = key
+        if smallest:
+            if key is None:
+                order = _Reversed
+            else:
+                order = lambda item: _Reversed(key(item))
+        self.heap = Heap(key=order)
+
+    def push(self, item):
+        """
+        Returns whether item was kept.
+        """
+        heap = self.heap
+        if len(heap.array) < self.k:
+            heap.insert(item)
+            return True
+
+        key = item if heap.key is None else heap.key(item)
+        if not heap.keys[0] < key:
+            return False
+
+        heap._replace_root(item, key)
+        return True
+
+    def push_many(self, items):
+        push = self.push
+        for item in items:
+            push(item)
+
+    @property
+    def threshold(self):
+        """
+        The worst item kept: anything not better than it is rejected once full.
+        """
+        return self.heap.find_min() if self.heap.array else None
+
+    def items(self):
+        """
+        Kept items, best first. O(k log k)
+        """
+        return sorted(self.heap.array, key=self.key, reverse=not self.smallest)
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __repr__(self):
+        return 'TopK(k=%s, %r)' % (self.k, self.items())
+
+
+def merge_sorted(*iterables, key=None):
+    """
+    Lazily merges already sorted iterables into one sorted stream.
+
+    Only the head of each input is held, in a Heap of size len(iterables); the 
+    next item of an input is pulled only after its previous one was yielded.
+    Stable: on equal keys, earlier iterables come first. O(n log k) for n items 
+    over k inputs.
+    """
     heap = Heap()
-    for n in sample:
-        heap.insert(n)
+    for order, iterable in enumerate(iterables):
+        iterator = iter(iterable)
+        for value in iterator:
+            # [key, order, value, iterator]: order breaks ties, values are never compared
+            heap.array.append([value if key is None else key(value), order, value, iterator])
+            break
+    heap.heapify()
+
+    while len(heap.array) > 1:
+        entry = heap.find_min()
+        yield entry[2]
+        for value in entry[3]:
+            entry[0] = value if key is None else key(value)
+            entry[2] = value
+            heap.replace_min(entry)
+            break
+        else:
+            heap.extract_min()
+
+    if heap.array:
+        entry = heap.find_min()
+        yield entry[2]
+        yield from entry[3]
+
+
+##########################
+# Benchmark against heapq
+#
+# Every workload builds its input outside the timed section and returns a 
+# closure with the operations to measure. Time and peak memory come from two
+# separate runs, since tracemalloc slows allocations down considerably.
+#
+# Implementations are 'heapq', 'heap' (binary Heap), 'heapD' for a Heap of 
+# arity D, e.g. 'heap4', or 'pairing' for PairingHeap.
+
+def _new_heap(impl, items=()):
+    if impl == 'pairing':
+        return PairingHeap.from_iterable(items)
 
-    result = []
-    while heap:
-        heap.extract_min()
+    arity = int(impl[4:] or 2)
+    return Heap.from_iterable(items, arity=arity)
 
-    # print('Expected: ', expected)
-    # print('Result', result)
 
+def _workload_insert(impl, sample, rolls):
+    if impl == 'heapq':
+        def run():
+            heap = []
+            for x in sample:
+                heapq.heappush(heap, x)
+    else:
+        def run():
+            heap = _new_heap(impl)
+            for x in sample:
+                heap.insert(x)
+    return run
+
+
+def _workload_extract(impl, sample, rolls):
+    if impl == 'heapq':
+        heap = list(sample)
+        heapq.heapify(heap)
+        def run():
+            while heap:
+                heapq.heappop(heap)
+    else:
+        heap = _new_heap(impl, sample)
+        def run():
+            while heap:
+                heap.extract_min()
+    return run
+
+
+def _mixed(push_ratio):
+    def workload(impl, sample, rolls):
+        """
+        Starts half full, then each op is a push with probability push_ratio, 
+        a pop otherwise.
+        """
+        half = len(sample) // 2
+        incoming = sample[half:]
+        if impl == 'heapq':
+            heap = sample[:half]
+            heapq.heapify(heap)
+            def run():
+                for roll, x in zip(rolls, incoming):
+                    if roll < push_ratio or not heap:
+                        heapq.heappush(heap, x)
+                    else:
+                        heapq.heappop(heap)
+        else:
+            heap = _new_heap(impl, sample[:half])
+            def run():
+                for roll, x in zip(rolls, incoming):
+                    if roll < push_ratio or not heap:
+                        heap.insert(x)
+                    else:
+                        heap.extract_min()
+        return run
+
+    return workload
+
+
+def _workload_heapify(impl, sample, rolls):
+    if impl == 'heapq':
+        def run():
+            heapq.heapify(list(sample))
+    else:
+        def run():
+            _new_heap(impl, sample)
+    return run
+
+
+def _workload_sort(impl, sample, rolls):
+    if impl == 'heapq':
+        def run():
+            heap = []
+            for x in sample:
+                heapq.heappush(heap, x)
+            return [heapq.heappop(heap) for _ in range(len(heap))]
+    else:
+        def run():
+            heap = _new_heap(impl)
+            for x in sample:
+                heap.insert(x)
+            return [heap.extract_min() for _ in range(len(heap))]
+    return run
+
+
+def _workload_merge(impl, sample, rolls):
+    """
+    Rebalancing: the sample is sharded into 256 heaps that are merged pairwise, 
+    tournament style, popping the minimum after each merge.
+    """
+    shards = min(256, len(sample))
+    chunks = [sample[i::shards] for i in range(shards)]
+    if impl == 'heapq':
+        heaps = [list(chunk) for chunk in chunks]
+        for heap in heaps:
+            heapq.heapify(heap)
+        def run():
+            while len(heaps) > 1:
+                merged = heaps.pop() + heaps.pop()
+                heapq.heapify(merged)
+                heapq.heappop(merged)
+                heaps.insert(0, merged)
+    else:
+        heaps = [_new_heap(impl, chunk) for chunk in chunks]
+        def run():
+            while len(heaps) > 1:
+                merged = heaps.pop()
+                merged.merge(heaps.pop())
+                merged.extract_min()
+                heaps.insert(0, merged)
+    return run
+
+
+WORKLOADS = {
+    'insert': _workload_insert,
+    'extract': _workload_extract,
+    'mixed': _mixed(0.5),
+    'push_heavy': _mixed(0.9),
+    'pop_heavy': _mixed(0.1),
+    'heapify': _workload_heapify,
+    'sort': _workload_sort,
+    'merge': _workload_merge,
+}
+
+IMPLEMENTATIONS = ('heap', 'heapq')
+
+
+def benchmark(sizes, workloads=None, implementations=IMPLEMENTATIONS, repeat=3, seed=0):
+    """
+    Runs every workload for every size and implementation. 
+
+    Returns a list of dicts with the best wall time of `repeat` runs, the ops/sec 
+    derived from it (one op per element) and the tracemalloc peak of one extra run.
+    """
+    import time
+    import tracemalloc
+
+    results = []
+    for size in sizes:
+        rnd = random.Random(seed)
+        sample = [rnd.random() for _ in range(size)]
+        rolls = [rnd.random() for _ in range(size)]
+
+        for name in (workloads or sorted(WORKLOADS)):
+            workload = WORKLOADS[name]
+            for impl in implementations:
+                best = None
+                for _ in range(repeat):
+                    run = workload(impl, sample, rolls)
+                    start = time.perf_counter()
+                    run()
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+
+                run = workload(impl, sample, rolls)
+                tracemalloc.start()
+                run()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                results.append({
+                    'workload': name,
+                    'implementation': impl,
+                    'size': size,
+                    'seconds': best,
+                    'ops_per_sec': size / best if best else None,
+                    'peak_bytes': peak,
+                })
+
+    return results
+
+
+def _print_results(results):
+    print('%-10s %-6s %10s %12s %14s %14s' % (
+        'workload', 'impl', 'size', 'seconds', 'ops/sec', 'peak bytes'))
+    for r in results:
+        print('%-10s %-6s %10d %12.4f %14.0f %14d' % (
+            r['workload'], r['implementation'], r['size'], r['seconds'], 
+            r['ops_per_sec'] or 0, r['peak_bytes']))
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import platform
+    import time
 
+    parser = argparse.ArgumentParser(description='Benchmark Heap against heapq.')
+    parser.add_argument('--sizes', type=int, nargs='+', 
+                        default=[10 ** e for e in range(3, 8)])
+    parser.add_argument('--workloads', nargs='+', choices=sorted(WORKLOADS))
+    parser.add_argument('--implementations', nargs='+', default=list(IMPLEMENTATIONS),
+                        help="heapq, heap, heapD for arity D (e.g. heap4) or pairing")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write JSON results to this file')
+    args = parser.parse_args()
 
+    results = benchmark(args.sizes, args.workloads, args.implementations, 
+                        repeat=args.repeat, seed=args.seed)
+    _print_results(results)
 
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'implementation': platform.python_implementation(),
+                'timestamp': time.time(),
+                'results': results,
+            }, f, indent=2)
@@ -0,0 +1,327 @@
+"""
+Priority queues for producers and consumers running concurrently, wrapping heap.Heap.
+
+- HeapQueue: thread-safe and blocking, in the spirit of queue.PriorityQueue.
+- AsyncHeapQueue: for asyncio tasks of a single event loop, in the spirit of
+  asyncio.PriorityQueue. Threads can feed it with
+  loop.call_soon_threadsafe(queue.put_nowait, item).
+
+Both take the same arity and key arguments as Heap, and have put_many/get_many
+to move a whole batch under a single lock acquisition (or wake-up). Items of
+equal priority come out in the order they were put (FIFO).
+
+Run this module for a contention benchmark with N producers and M consumers:
+
+    python heapqueue.py --producers 4 --consumers 4 --batch 1 64
+"""
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+from queue import Empty, Full
+
+from heap import Heap
+
+
+def _make_entry(key):
+    """
+    Wraps items as (priority, sequence number, item) heap entries: the sequence
+    number breaks ties in insertion order, so items are never compared.
+    """
+    counter = itertools.count()
+    if key is None:
+        return lambda item: (item, next(counter), item)
+    return lambda item: (key(item), next(counter), item)
+
+
+class HeapQueue(object):
+    """
+    Blocking, thread-safe min-priority queue. maxsize <= 0 means unbounded.
+
+    One lock guards the heap; only the heap operation itself runs while holding
+    it. get/put raise queue.Empty/queue.Full when non blocking or on timeout.
+    """
+
+    def __init__(self, maxsize=0, arity=2, key=None):
+        self.maxsize = maxsize
+        self.heap = Heap(arity=arity)
+        self._entry = _make_entry(key)
+        self.mutex = threading.Lock()
+        self.not_empty = threading.Condition(self.mutex)
+        self.not_full = threading.Condition(self.mutex)
+
+    def _room(self):
+        if self.maxsize <= 0:
+            return None
+        return self.maxsize - len(self.heap)
+
+    def _wait(self, condition, ready, block, timeout, error):
+        """
+        Waits on condition, already holding the lock, until ready() is true.
+        """
+        if ready():
+            return
+        if not block:
+            raise error
+        if timeout is None:
+            while not ready():
+                condition.wait()
+        else:
+            if timeout < 0:
+                raise ValueError("'timeout' must be a non-negative number")
+            deadline = time.monotonic() + timeout
+            while not ready():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise error
+                condition.wait(remaining)
+
+    def put(self, item, block=True, timeout=None):
+        with self.not_full:
+            self._wait(self.not_full, lambda: self._room() != 0, block, timeout, Full)
+            self.heap.insert(self._entry(item))
+            self.not_empty.notify()
+
+    def put_many(self, items, block=True, timeout=None):
+        """
+        Inserts the batch with Heap.insert_many. On a bounded queue, the batch goes
+        in as many chunks as needed to fit, and Full can leave part of it inserted.
+        """
+        items = [self._entry(item) for item in items]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while items:
+            with self.not_full:
+                remaining = None if deadline is None else max(0, deadline - time.monotonic())
+                self._wait(self.not_full, lambda: self._room() != 0, block, remaining, Full)
+                room = self._room()
+                if room is None or room >= len(items):
+                    chunk, items = items, []
+                else:
+                    chunk, items = items[:room], items[room:]
+                self.heap.insert_many(chunk)
+                self.not_empty.notify(len(chunk))
+
+    def get(self, block=True, timeout=None):
+        with self.not_empty:
+            self._wait(self.not_empty, lambda: self.heap.array, block, timeout, Empty)
+            item = self.heap.extract_min()[2]
+            self.not_full.notify()
+            return item
+
+    def get_many(self, n, block=True, timeout=None):
+        """
+        Waits for at least one item, then pops up to n of them, smallest first.
+        n <= 0 returns [] at once.
+        """
+        if n <= 0:
+            return []
+        with self.not_empty:
+            self._wait(self.not_empty, lambda: self.heap.array, block, timeout, Empty)
+            heap = self.heap
+            items = [heap.extract_min()[2] for _ in range(min(n, len(heap)))]
+            self.not_full.notify(len(items))
+            return items
+
+    def put_nowait(self, item):
+        self.put(item, block=False)
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def qsize(self):
+        with self.mutex:
+            return len(self.heap)
+
+    def empty(self):
+        with self.mutex:
+            return not self.heap.array
+
+    def full(self):
+        with self.mutex:
+            return self._room() == 0
+
+
+class AsyncHeapQueue(object):
+    """
+    Min-priority queue for asyncio tasks. maxsize <= 0 means unbounded.
+
+    Not thread-safe, like everything tied to an event loop. get/put can be
+    bounded with asyncio.wait_for; the nowait versions raise asyncio.QueueEmpty
+    and asyncio.QueueFull.
+    """
+
+    def __init__(self, maxsize=0, arity=2, key=None):
+        self.maxsize = maxsize
+        self.heap = Heap(arity=arity)
+        self._entry = _make_entry(key)
+        self._getters = deque()
+        self._putters = deque()
+
+    def _wakeup_next(self, waiters):
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+    async def _wait(self, waiters, blocked):
+        loop = asyncio.get_running_loop()
+        while blocked():
+            waiter = loop.create_future()
+            waiters.append(waiter)
+            try:
+                await waiter
+            except BaseException:
+                waiter.cancel()
+                try:
+                    waiters.remove(waiter)
+                except ValueError:
+                    pass
+                if not blocked() and not waiter.cancelled():
+                    # we were woken up but won't consume it, pass it on
+                    self._wakeup_next(waiters)
+                raise
+
+    def qsize(self):
+        return len(self.heap)
+
+    def empty(self):
+        return not self.heap.array
+
+    def full(self):
+        return 0 < self.maxsize <= len(self.heap)
+
+    async def put(self, item):
+        await self._wait(self._putters, self.full)
+        self.put_nowait(item)
+
+    def put_nowait(self, item):
+        if self.full():
+            raise asyncio.QueueFull
+        self.heap.insert(self._entry(item))
+        self._wakeup_next(self._getters)
+
+    async def put_many(self, items):
+        """
+        Inserts the batch with Heap.insert_many, in chunks if the queue is bounded.
+        """
+        items = [self._entry(item) for item in items]
+        while items:
+            await self._wait(self._putters, self.full)
+            room = len(items) if self.maxsize <= 0 else self.maxsize - len(self.heap)
+            chunk, items = items[:room], items[room:]
+            self.heap.insert_many(chunk)
+            for _ in chunk:
+                self._wakeup_next(self._getters)
+
+    async def get(self):
+        await self._wait(self._getters, self.empty)
+        return self.get_nowait()
+
+    def get_nowait(self):
+        if self.empty():
+            raise asyncio.QueueEmpty
+        item = self.heap.extract_min()[2]
+        self._wakeup_next(self._putters)
+        return item
+
+    async def get_many(self, n):
+        """
+        Waits for at least one item, then pops up to n of them, smallest first.
+        n <= 0 returns [] at once.
+        """
+        if n <= 0:
+            return []
+        await self._wait(self._getters, self.empty)
+        heap = self.heap
+        items = [heap.extract_min()[2] for _ in range(min(n, len(heap)))]
+        for _ in items:
+            self._wakeup_next(self._putters)
+        return items
+
+
+##########################
+# Contention benchmark
+#
+# N producer threads push `items` random priorities in total, in batches of
+# `batch` (put for batch 1, put_many otherwise), while M consumer threads drain
+# the queue. Reports end-to-end throughput.
+
+def _run_threads(queue, producers, consumers, items, batch):
+    import random
+
+    per_producer = items // producers
+    total = per_producer * producers
+    consumed = [0] * consumers
+    # consumers stop after a sentinel bigger than any priority
+    done = float('inf')
+
+    def produce(seed):
+        rnd = random.Random(seed)
+        values = [rnd.random() for _ in range(per_producer)]
+        if batch == 1:
+            for value in values:
+                queue.put(value)
+        else:
+            for i in range(0, per_producer, batch):
+                queue.put_many(values[i:i + batch])
+
+    def consume(index):
+        count = 0
+        while True:
+            if batch == 1:
+                values = [queue.get()]
+            else:
+                values = queue.get_many(batch)
+            for value in values:
+                if value == done:
+                    # get_many may have taken other consumers' sentinels too
+                    for _ in range(values.count(done) - 1):
+                        queue.put(done)
+                    consumed[index] = count
+                    return
+                count += 1
+
+    threads = [threading.Thread(target=produce, args=(i,)) for i in range(producers)]
+    threads += [threading.Thread(target=consume, args=(i,)) for i in range(consumers)]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads[:producers]:
+        thread.join()
+    for _ in range(consumers):
+        queue.put(done)
+    for thread in threads[producers:]:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    assert sum(consumed) == total, (sum(consumed), total)
+    return elapsed, total
+
+
+if __name__ == "__main__":
+    import argparse
+    import queue as stdlib_queue
+
+    parser = argparse.ArgumentParser(description='HeapQueue contention benchmark.')
+    parser.add_argument('--producers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--consumers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--items', type=int, default=200000)
+    parser.add_argument('--batch', type=int, nargs='+', default=[1, 64])
+    parser.add_argument('--maxsize', type=int, default=0)
+    args = parser.parse_args()
+
+    print('%-14s %9s %9s %6s %10s %14s' % (
+        'queue', 'producers', 'consumers', 'batch', 'seconds', 'items/sec'))
+    for producers in args.producers:
+        for consumers in args.consumers:
+            for batch in args.batch:
+                candidates = [('HeapQueue', HeapQueue(maxsize=args.maxsize))]
+                if batch == 1:
+                    candidates.append(('PriorityQueue', stdlib_queue.PriorityQueue(args.maxsize)))
+                for name, queue in candidates:
+                    elapsed, total = _run_threads(queue, producers, consumers, args.items, batch)
+                    print('%-14s %9d %9d %6d %10.4f %14.0f' % (
+                        name, producers, consumers, batch, elapsed, total / elapsed))
@@ -8,202 +8,1429 @@ Think about the NYC subway: express lines!
 All lists are ordered, but only the bottom one has all elements.
 The other ones are shortcuts (see below for insertion).
 
-0: [-INF] ---------------------------------------> [70]
+2: [-INF] ---------------------------------------> [70]
      |                                              |
 1: [-INF] ---------------> [10] -----------------> [70]
      |                      |                       |       
-2: [-INF] -> [2] -> [5] -> [10] -> [13] -> [20] -> [70]
+0: [-INF] -> [2] -> [5] -> [10] -> [13] -> [20] -> [70]
+
+Each element is stored once: a node holds the element and its tower, an array 
+of forward links, one per level it takes part of (10 above is a node with a 
+tower of height 2). The head is a node of max_height levels with no element.
 
 Searching for 20 goes like this:
-level 0: -INFINTY -> down
-level 1: -INFINITY -> 10 -> down
-level 2: 10 -> 13 -> 20
+level 2: -INFINTY -> (70 is too far) down
+level 1: -INFINITY -> 10 -> (70 is too far) down
+level 0: 10 -> 13 -> 20
 
 Adding 43 goes like this:
-- find position in the bottom list, stacking your way through. 
-  For 43 we have the following stack: 
-  [20, level 2], [10, level 1], [-INF, level 0]
-- Insert to the left of the stack top
-- Do a coin flip! Depending on the result, the new node may propagate to an upper level above or not.
-- Propagations may create new lists on top. On average, about log(n) lists should be expected.
+- find position in the bottom list, remembering the last node visited at each level. 
+  For 43 we have: [20, level 0], [10, level 1], [-INF, level 2]
+- Flip a biased coin (heads with probability p) until tails or max_height: the 
+  number of flips is the height of the new tower.
+- Splice the tower after the remembered node of each of its levels.
+  On average, about log_{1/p}(n) levels should be expected.
 
 One possible result after adding 43:
-0: [-INF] -----------------------------------------------> [70]
+2: [-INF] -----------------------------------------------> [70]
     |                                                       |
 1: [-INF] ---------------> [10] -----------------> [43] -> [70]  ==> coin flips got 43 up to this level.
     |                        |                       |       |
-2: [-INF] -> [2] -> [5] -> [10] -> [13] -> [20] -> [43] -> [70] 
+0: [-INF] -> [2] -> [5] -> [10] -> [13] -> [20] -> [43] -> [70] 
 
 """
+import math
 import random
 import sys
-from collections import deque
+import threading
+import time
+from collections import namedtuple
 
 import unittest
 from unittest.mock import MagicMock
 
 MIN_INT = -sys.maxsize
 
-class Node(object):
-        def __init__(self, value=MIN_INT):
-            self.value = value
-            self.next = None
-            self.down = None
-
-        @property
-        def next_value(self):
-            if self.next is None:
-                return None
+SkipListStats = namedtuple('SkipListStats', [
+    'size', 'levels', 'nodes_per_level', 'expected_nodes_per_level',
+    'average_path_length', 'average_comparisons', 'expected_path_length'])
+
+
+class LevelGenerator(object):
+    """
+    Draws tower heights: P(height > k) = p^k, capped at max_height.
+
+    The whole height comes from a single call to the random generator instead of
+    one coin flip per level:
+    - if p = 1/2^b, from getrandbits: every b bits that are all zero, counting 
+      from the lowest, promote one more level;
+    - otherwise by inverting the distribution of one rng.random() draw.
+
+    rng is any random.Random-like object (getrandbits and random); by default a 
+    new random.Random(seed), so a seed makes a skip list's shape reproducible.
+    """
+
+    def __init__(self, max_height=32, p=0.5, seed=None, rng=None):
+        if max_height < 1:
+            raise ValueError('max_height must be at least 1, got %r' % (max_height,))
+        if not 0 < p < 1:
+            raise ValueError('p must be in (0, 1), got %r' % (p,))
+
+        self.max_height = max_height
+        self.p = p
+        self.rng = random.Random(seed) if rng is None else rng
+        self.draw = self._make_draw()
+
+    def _make_draw(self):
+        """
+        Builds the drawing function as a closure over locals: it runs once per 
+        insert, attribute lookups would cost as much as the draw itself.
+        """
+        max_height = self.max_height
+        if max_height == 1:
+            return lambda: 1
+
+        bits = -math.log2(self.p)
+        if bits == int(bits):
+            bits = int(bits)
+            getrandbits = self.rng.getrandbits
+            width = bits * (max_height - 1)
+            if bits == 1:
+                def draw():
+                    r = getrandbits(width)
+                    if r == 0:
+                        return max_height
+                    # trailing zero bits
+                    return (r & -r).bit_length()
             else:
-                return self.next.value
+                def draw():
+                    r = getrandbits(width)
+                    if r == 0:
+                        return max_height
+                    # trailing zero bits, in groups of `bits`
+                    return 1 + ((r & -r).bit_length() - 1) // bits
+            return draw
+
+        rnd = self.rng.random
+        log = math.log
+        log_p = math.log(self.p)
+        def draw():
+            return min(1 + int(log(1.0 - rnd()) / log_p), max_height)
+        return draw
+
+    def __call__(self):
+        return self.draw()
+
+
+class Node(object):
+    """
+    An element (value), the data mapped to it, and its tower: forward[level] is
+    the next node in that level's list and width[level] how many bottom-level
+    steps that link skips (a link to the end counts up to a virtual node after 
+    the last one).
+    """
+    __slots__ = ('value', 'data', 'forward', 'width')
 
-        def insert_after(self, x):
-            new_node = Node(x)
-            if self.next:
-                new_node.next = self.next
+    def __init__(self, value=MIN_INT, height=1, data=None):
+        self.value = value
+        self.data = data
+        self.forward = [None] * height
+        self.width = [1] * height
 
-            self.next = new_node
-            return new_node
+    @property
+    def height(self):
+        return len(self.forward)
+
+    @property
+    def next(self):
+        return self.forward[0]
+
+    @property
+    def next_value(self):
+        if self.forward[0] is None:
+            return None
+        else:
+            return self.forward[0].value
 
 
 class SkipList(object):
+    """
+    Ordered set of comparable elements, that can also map each one to some data
+    (s[x] = data), like a sorted dict.
+
+    max_height caps the towers (and so the number of levels); p is the 
+    probability of promoting an element one level up. With p = 1/2 a tower has 
+    2 links on average, with p = 1/4 only 1.33, at the cost of slightly longer 
+    searches: ~ log_{1/p}(n) / p comparisons.
+
+    Links also store their width, so positions are found like elements are: 
+    rank(x) and select(i) run in O(logn) on average.
+
+    Iteration and range scans are generators walking the bottom list, nothing is 
+    copied.
+    """
 
-    def __init__(self, max_height=32):
-        self.lists = deque()
-        self.lists.append(Node())
+    def __init__(self, max_height=32, p=0.5, seed=None, rng=None):
+        self.levels = LevelGenerator(max_height, p, seed, rng)
+        self._random_height = self.levels.draw
+        self.max_height = max_height
+        self.p = p
+        self.head = Node(MIN_INT, max_height)
+        # number of levels in use
+        self.height = 1
+        self.size = 0
+        # bumped on every structural change, so fingers know when to start over
+        self.version = 0
 
     def find_position(self, x):
         """
-        Returns a stack of nodes through which x should be positioned.
-        If x is in the skip list, x will be returned in the top of the stack.
-        Otherwise, the top of the stack will have the previous node of where x should be.
+        Returns, for every level in use (bottom first), the last node before x.
+        If x is in the skip list, it is the successor of the bottom one.
         """
-        stack = deque()
-        
-        found = False
-        current = self.lists[0]
+        update = [None] * self.height
+        node = self.head
+        for level in range(self.height - 1, -1, -1):
+            next_node = node.forward[level]
+            while next_node is not None and next_node.value < x:
+                node = next_node
+                next_node = node.forward[level]
+            update[level] = node
 
-        while current is not None:
-            stack.appendleft(current)
+        return update
 
-            if x == current.value:
-                found = True
-                break
-            else:
-                if current.next_value:
-                    if x < current.next_value:
-                        current = current.down
-                    else:
-                        stack.popleft()
-                        current = current.next
-                else:
-                    current = current.down
+    def _last_before(self, x, or_equal=False):
+        """
+        Last node < x (<= x if or_equal), possibly the head.
+        """
+        node = self.head
+        for level in range(self.height - 1, -1, -1):
+            next_node = node.forward[level]
+            while next_node is not None and (next_node.value < x 
+                                             or or_equal and next_node.value == x):
+                node = next_node
+                next_node = node.forward[level]
 
-        return stack
+        return node
 
-    def _randomize(self):
-        return random.randint(0, 1) == 1
+    def _find_node(self, x):
+        node = self._last_before(x).forward[0]
+        if node is not None and node.value == x:
+            return node
+        return None
 
-    def insert(self, x):
+    def _locate(self, x):
+        """
+        Like find_position, also returning the position of each predecessor
+        (the head is 0, the first element 1).
+        """
+        update = [None] * self.height
+        positions = [0] * self.height
+        node = self.head
+        position = 0
+        for level in range(self.height - 1, -1, -1):
+            next_node = node.forward[level]
+            while next_node is not None and next_node.value < x:
+                position += node.width[level]
+                node = next_node
+                next_node = node.forward[level]
+            update[level] = node
+            positions[level] = position
+
+        return update, positions
+
+    def insert(self, x, data=None):
         """
-        - Search for x position in bottom list.
+        - Search for x position in bottom list, keeping the predecessors per level
+          and their positions.
         - Insert x in bottom list, maintaining invariance.
+        - Splice its tower into the upper lists it was promoted to, splitting the
+          width of each link it lands on.
+
+        If x is already there, only its data is replaced.
         """            
-        stack = self.find_position(x)
+        update, positions = self._locate(x)
+        self._insert_at(x, data, update, positions)
 
-        assert stack, "Method find_position should return at least one element."
-        
-        position_found = stack.popleft()
-        if position_found.value == x:
+    def _insert_at(self, x, data, update, positions):
+        """
+        Inserts x after the predecessors found for it. If the list grows taller, 
+        update and positions are extended in place with the head.
+        """
+        successor = update[0].forward[0]
+        if successor is not None and successor.value == x:
             # Element already exists
+            successor.data = data
             return
 
-        created_node = position_found.insert_after(x)
+        height = self._random_height()
+        if height > self.height:
+            # new lists on top start at the head, with a link to the end
+            for level in range(self.height, height):
+                self.head.width[level] = self.size + 1
+                update.append(self.head)
+                positions.append(0)
+            self.height = height
+
+        new_node = Node(x, height, data)
+        for level in range(height):
+            predecessor = update[level]
+            skipped = positions[0] - positions[level]
+            new_node.forward[level] = predecessor.forward[level]
+            new_node.width[level] = predecessor.width[level] - skipped
+            predecessor.forward[level] = new_node
+            predecessor.width[level] = skipped + 1
+
+        for level in range(height, self.height):
+            update[level].width[level] += 1
 
-        # if lucky, keep adding element in an upper list
-        while(self._randomize()):
-            predecessor_upper_list = stack.popleft() if stack else None
-            if predecessor_upper_list is not None:
-                new_node = predecessor_upper_list.insert_after(x)
+        self.size += 1
+        self.version += 1
+
+    def delete(self, x):
+        """
+        Unlinks x from every level, merging the widths around it. 
+        Raises KeyError if x is not in the skip list.
+        """
+        self._delete_at(x, self.find_position(x))
+
+    def _delete_at(self, x, update):
+        target = update[0].forward[0]
+        if target is None or target.value != x:
+            raise KeyError(x)
+
+        for level in range(self.height):
+            predecessor = update[level]
+            if predecessor.forward[level] is target:
+                predecessor.forward[level] = target.forward[level]
+                predecessor.width[level] += target.width[level] - 1
             else:
-                # create a new list on top
-                self.lists.appendleft(Node())
-                self.lists[0].down = self.lists[1]
-                new_node = self.lists[0].insert_after(x)
+                predecessor.width[level] -= 1
+
+        while self.height > 1 and self.head.forward[self.height - 1] is None:
+            self.height -= 1
+        self.size -= 1
+        self.version += 1
+
+    @classmethod
+    def from_sorted(cls, iterable, max_height=32, p=0.5, deterministic=False, seed=None, rng=None):
+        """
+        Builds a skip list from sorted elements in one pass, appending every tower
+        to the tail of its levels: O(n), no searches. Duplicates are skipped.
+
+        With deterministic=True, every k-th element (k = round(1/p)) goes up one
+        level, every k^2-th two levels and so on: a perfectly balanced skip list.
+        Raises ValueError if the input is not sorted.
+        """
+        s = cls(max_height, p, seed, rng)
+        k = max(2, int(round(1 / p)))
+        tails = [s.head] * max_height
+        tail_positions = [0] * max_height
+        position = 0
+        previous = None
+
+        for x in iterable:
+            if position:
+                if x < previous:
+                    raise ValueError('input is not sorted: %r after %r' % (x, previous))
+                if x == previous:
+                    continue
+
+            position += 1
+            if deterministic:
+                height = 1
+                rest = position
+                while height < max_height and rest % k == 0:
+                    rest //= k
+                    height += 1
+            else:
+                height = s._random_height()
+
+            node = Node(x, height)
+            for level in range(height):
+                tail = tails[level]
+                tail.forward[level] = node
+                tail.width[level] = position - tail_positions[level]
+                tails[level] = node
+                tail_positions[level] = position
+
+            s.height = max(s.height, height)
+            previous = x
+
+        for level in range(max_height):
+            tails[level].width[level] = position + 1 - tail_positions[level]
+        s.size = position
+        return s
+
+    def finger(self):
+        """
+        A Finger (cursor) on this skip list, see Finger.
+        """
+        return Finger(self)
+
+    ##########################
+    # Instrumentation
+
+    def search_cost(self, x):
+        """
+        Replays a lookup for x, returning (path_length, comparisons): the links 
+        followed, forward or down, and the element comparisons made.
+        """
+        path_length = 0
+        comparisons = 0
+        node = self.head
+        for level in range(self.height - 1, -1, -1):
+            next_node = node.forward[level]
+            while next_node is not None:
+                comparisons += 1
+                if not next_node.value < x:
+                    break
+                path_length += 1
+                node = next_node
+                next_node = node.forward[level]
+            if level:
+                path_length += 1
+
+        next_node = node.forward[0]
+        if next_node is not None:
+            comparisons += 1
+        return path_length, comparisons
+
+    def stats(self, sample=1000):
+        """
+        Shape and search cost of the skip list, to compare against theory:
+        nodes at level k should be about n * p^k and a lookup should follow 
+        about log_{1/p}(n) / p links.
+
+        Averages are over lookups of (at most) sample elements, evenly spread 
+        across the list. O(n) plus the sampled lookups.
+        """
+        nodes_per_level = [0] * self.height
+        step = max(1, self.size // sample) if sample else 0
+        path_lengths = []
+        comparisons = []
+
+        node = self.head.forward[0]
+        index = 0
+        while node is not None:
+            for level in range(node.height):
+                nodes_per_level[level] += 1
+            if step and index % step == 0 and len(path_lengths) < sample:
+                path_length, compared = self.search_cost(node.value)
+                path_lengths.append(path_length)
+                comparisons.append(compared)
+            node = node.forward[0]
+            index += 1
+
+        n = self.size
+        expected = 0.0
+        if n > 1:
+            expected = math.log(n) / math.log(1 / self.p) / self.p
 
-            new_node.down = created_node
-            created_node = new_node 
+        return SkipListStats(
+            size=n,
+            levels=self.height,
+            nodes_per_level=nodes_per_level,
+            expected_nodes_per_level=[n * self.p ** level for level in range(self.height)],
+            average_path_length=sum(path_lengths) / len(path_lengths) if path_lengths else 0.0,
+            average_comparisons=sum(comparisons) / len(comparisons) if comparisons else 0.0,
+            expected_path_length=expected,
+        )
 
-    def __contains__(x):
-        stack = self.find_position(x)
-        return stack and stack.popleft() == x
+    def discard(self, x):
+        try:
+            self.delete(x)
+        except KeyError:
+            pass
+
+    def __contains__(self, x):
+        return self._find_node(x) is not None
+
+    def __len__(self):
+        return self.size
+
+    ##########################
+    # Mapping
+
+    def __getitem__(self, x):
+        node = self._find_node(x)
+        if node is None:
+            raise KeyError(x)
+        return node.data
+
+    def __setitem__(self, x, data):
+        self.insert(x, data)
+
+    def __delitem__(self, x):
+        self.delete(x)
+
+    def get(self, x, default=None):
+        node = self._find_node(x)
+        return default if node is None else node.data
+
+    ##########################
+    # Order
+
+    def floor(self, x):
+        """
+        Biggest element <= x. Raises KeyError if there is none.
+        """
+        node = self._last_before(x, or_equal=True)
+        if node is self.head:
+            raise KeyError(x)
+        return node.value
+
+    def ceiling(self, x):
+        """
+        Smallest element >= x. Raises KeyError if there is none.
+        """
+        node = self._last_before(x).forward[0]
+        if node is None:
+            raise KeyError(x)
+        return node.value
+
+    def predecessor(self, x):
+        """
+        Biggest element < x. Raises KeyError if there is none.
+        """
+        node = self._last_before(x)
+        if node is self.head:
+            raise KeyError(x)
+        return node.value
+
+    def successor(self, x):
+        """
+        Smallest element > x. Raises KeyError if there is none.
+        """
+        node = self._last_before(x, or_equal=True).forward[0]
+        if node is None:
+            raise KeyError(x)
+        return node.value
+
+    def rank(self, x):
+        """
+        Number of elements < x, i.e. the index x has (or would have). O(logn)
+        """
+        node = self.head
+        position = 0
+        for level in range(self.height - 1, -1, -1):
+            next_node = node.forward[level]
+            while next_node is not None and next_node.value < x:
+                position += node.width[level]
+                node = next_node
+                next_node = node.forward[level]
+
+        return position
+
+    def select(self, i):
+        """
+        The element at index i (negative counts from the end). O(logn)
+        """
+        if i < 0:
+            i += self.size
+        if not 0 <= i < self.size:
+            raise IndexError('skip list index out of range')
+
+        target = i + 1
+        node = self.head
+        position = 0
+        for level in range(self.height - 1, -1, -1):
+            while node.forward[level] is not None and position + node.width[level] <= target:
+                position += node.width[level]
+                node = node.forward[level]
+
+        return node.value
+
+    ##########################
+    # Iteration
+
+    def _nodes_from(self, lo):
+        if lo is None:
+            return self.head.forward[0]
+        return self._last_before(lo).forward[0]
+
+    def __iter__(self):
+        node = self.head.forward[0]
+        while node is not None:
+            yield node.value
+            node = node.forward[0]
+
+    def range(self, lo=None, hi=None):
+        """
+        Yields the elements x with lo <= x < hi, lazily. None means unbounded.
+        """
+        node = self._nodes_from(lo)
+        while node is not None and (hi is None or node.value < hi):
+            yield node.value
+            node = node.forward[0]
+
+    def items(self, lo=None, hi=None):
+        """
+        Like range, yielding (element, data) pairs.
+        """
+        node = self._nodes_from(lo)
+        while node is not None and (hi is None or node.value < hi):
+            yield node.value, node.data
+            node = node.forward[0]
 
     def __str__(self):
         txt = []
-        current_line_head = self.lists[0]
-        while current_line_head:
-            current = current_line_head
+        for level in range(self.height - 1, -1, -1):
+            txt.append('[-INF] -> ')
+            current = self.head.forward[level]
             while current:
-                txt.append('[%s] -> ' % (current.value if current.value != MIN_INT else '-INF'))
-                current = current.next
-            current_line_head = current_line_head.down
-            if current_line_head:
+                txt.append('[%s] -> ' % current.value)
+                current = current.forward[level]
+            if level:
                 txt.append('\n')
 
         return ''.join(txt)
 
 
+class Finger(object):
+    """
+    Cursor that remembers the predecessors of the last element it visited, so the
+    next search starts from there instead of from the top of the head.
+
+    A search for x climbs from the bottom level only while the remembered path 
+    is behind x by more than the next level skips, then goes down as usual: for 
+    x at distance d from the last element, that is O(log d) on average instead 
+    of O(logn). Runs of nearby or increasing elements are the sweet spot:
+
+        finger = s.finger()
+        for x in sorted_batch:
+            finger.insert(x)
+
+    Changes made through the finger keep it valid; any other change to the skip
+    list is noticed (by its version) and the next search starts from the head.
+    """
+
+    def __init__(self, skiplist):
+        self.skiplist = skiplist
+        self.update = None
+        self.positions = None
+        self.version = None
+
+    def _seek(self, x):
+        s = self.skiplist
+        if self.version != s.version or len(self.update) != s.height:
+            self.update, self.positions = s._locate(x)
+            self.version = s.version
+            return
+
+        update = self.update
+        positions = self.positions
+        head = s.head
+        top = s.height - 1
+
+        # climb until the remembered node is before x and the level above 
+        # wouldn't take us past x anyway
+        level = 0
+        while level < top:
+            node = update[level]
+            if node is not head and not node.value < x:
+                level += 1
+                continue
+            next_node = update[level + 1].forward[level + 1]
+            if next_node is not None and next_node.value < x:
+                level += 1
+                continue
+            break
+
+        node = update[level]
+        position = positions[level]
+        if node is not head and not node.value < x:
+            # x is before the whole remembered path
+            node = head
+            position = 0
+        while level >= 0:
+            next_node = node.forward[level]
+            while next_node is not None and next_node.value < x:
+                position += node.width[level]
+                node = next_node
+                next_node = node.forward[level]
+            update[level] = node
+            positions[level] = position
+            level -= 1
+
+    def _node(self, x):
+        self._seek(x)
+        node = self.update[0].forward[0]
+        if node is not None and node.value == x:
+            return node
+        return None
+
+    def __contains__(self, x):
+        return self._node(x) is not None
+
+    def get(self, x, default=None):
+        node = self._node(x)
+        return default if node is None else node.data
+
+    def ceiling(self, x):
+        """
+        Smallest element >= x. Raises KeyError if there is none.
+        """
+        self._seek(x)
+        node = self.update[0].forward[0]
+        if node is None:
+            raise KeyError(x)
+        return node.value
+
+    def rank(self, x):
+        """
+        Number of elements < x.
+        """
+        self._seek(x)
+        return self.positions[0]
+
+    def insert(self, x, data=None):
+        self._seek(x)
+        self.skiplist._insert_at(x, data, self.update, self.positions)
+        self.version = self.skiplist.version
+
+    def delete(self, x):
+        """
+        Raises KeyError if x is not in the skip list.
+        """
+        self._seek(x)
+        s = self.skiplist
+        s._delete_at(x, self.update)
+        del self.update[s.height:]
+        del self.positions[s.height:]
+        self.version = s.version
+
+
+class ConcurrentNode(object):
+    """
+    Node of a ConcurrentSkipList. Besides its tower, it has its own lock and two 
+    flags: fully_linked is set once it is linked at every level of its tower, 
+    marked once it is logically deleted (before being unlinked).
+    """
+    __slots__ = ('value', 'forward', 'lock', 'marked', 'fully_linked')
+
+    def __init__(self, value=MIN_INT, height=1):
+        self.value = value
+        self.forward = [None] * height
+        self.lock = threading.Lock()
+        self.marked = False
+        self.fully_linked = False
+
+    @property
+    def height(self):
+        return len(self.forward)
+
+
+class ConcurrentSkipList(object):
+    """
+    Thread-safe skip list set, after Herlihy et al.'s "lazy" skip list.
+
+    - Readers (__contains__, iteration, range) never lock: links are only ever 
+      swapped by single reference assignments, and an element counts as present 
+      iff its node is fully linked and not marked.
+    - insert locks only the predecessors it splices the new tower after, from the
+      bottom level up, then checks nothing changed between them and their 
+      successors; if something did, it searches again.
+    - delete first marks the node (logical delete), then locks its predecessors 
+      the same way and unlinks it. A node being unlinked keeps its forward links, 
+      so a reader standing on it goes on as if nothing happened.
+
+    Locking predecessors bottom-up means locks are always taken from bigger to 
+    smaller elements, which rules out deadlocks.
+    """
+
+    def __init__(self, max_height=32, p=0.5, seed=None, rng=None):
+        self.levels = LevelGenerator(max_height, p, seed, rng)
+        self._random_height = self.levels.draw
+        self.max_height = max_height
+        self.p = p
+        self.head = ConcurrentNode(MIN_INT, max_height)
+        self.head.fully_linked = True
+        # levels in use: only grows, lookups and scans start there
+        self.height = 1
+        self.size = 0
+        self._meta_lock = threading.Lock()
+
+    def _find(self, x, preds, succs):
+        """
+        Fills preds/succs for every level, lock free. Returns the highest level 
+        at which a node with x was found, -1 if none.
+        """
+        found = -1
+        # every level, not just the first self.height: an insert links its tower
+        # before raising height, and an empty level only costs one read
+        pred = self.head
+        for level in range(self.max_height - 1, -1, -1):
+            curr = pred.forward[level]
+            while curr is not None and curr.value < x:
+                pred = curr
+                curr = pred.forward[level]
+            if found == -1 and curr is not None and curr.value == x:
+                found = level
+            preds[level] = pred
+            succs[level] = curr
+
+        return found
+
+    def _lock_preds(self, preds, height, valid):
+        """
+        Locks the distinct predecessors of the levels below height, bottom up, 
+        checking valid(level) on each level. Returns the locked nodes and whether
+        every level was valid; the caller releases them.
+        """
+        locked = []
+        previous = None
+        for level in range(height):
+            pred = preds[level]
+            if pred is not previous:
+                pred.lock.acquire()
+                locked.append(pred)
+                previous = pred
+            if not valid(level):
+                return locked, False
+        return locked, True
+
+    def insert(self, x):
+        """
+        Returns False if x was already there.
+        """
+        height = self._random_height()
+        preds = [None] * self.max_height
+        succs = [None] * self.max_height
+
+        while True:
+            found = self._find(x, preds, succs)
+            if found != -1:
+                node = succs[found]
+                if not node.marked:
+                    # someone else is inserting it: wait until it is visible
+                    while not node.fully_linked:
+                        time.sleep(0)
+                    return False
+                # being deleted: try again once it is gone
+                continue
+
+            def valid(level):
+                pred, succ = preds[level], succs[level]
+                return (not pred.marked and (succ is None or not succ.marked) 
+                        and pred.forward[level] is succ)
+
+            locked, is_valid = self._lock_preds(preds, height, valid)
+            try:
+                if not is_valid:
+                    continue
+
+                new_node = ConcurrentNode(x, height)
+                for level in range(height):
+                    new_node.forward[level] = succs[level]
+                for level in range(height):
+                    preds[level].forward[level] = new_node
+                new_node.fully_linked = True
+            finally:
+                for node in locked:
+                    node.lock.release()
+
+            with self._meta_lock:
+                self.size += 1
+                if height > self.height:
+                    self.height = height
+            return True
+
+    def delete(self, x):
+        """
+        Raises KeyError if x is not there (or another thread deleted it first).
+        """
+        preds = [None] * self.max_height
+        succs = [None] * self.max_height
+        victim = None
+
+        while True:
+            found = self._find(x, preds, succs)
+            if victim is None:
+                if found == -1:
+                    raise KeyError(x)
+                candidate = succs[found]
+                if not (candidate.fully_linked and not candidate.marked 
+                        and candidate.height - 1 == found):
+                    # still being inserted, already deleted, or found through a 
+                    # level that is not its top yet
+                    if candidate.marked:
+                        raise KeyError(x)
+                    time.sleep(0)
+                    continue
+
+                with candidate.lock:
+                    if candidate.marked:
+                        raise KeyError(x)
+                    candidate.marked = True
+                victim = candidate
+
+            height = victim.height
+
+            def valid(level):
+                pred = preds[level]
+                return not pred.marked and pred.forward[level] is victim
+
+            locked, is_valid = self._lock_preds(preds, height, valid)
+            try:
+                if not is_valid:
+                    continue
+
+                for level in range(height - 1, -1, -1):
+                    preds[level].forward[level] = victim.forward[level]
+            finally:
+                for node in locked:
+                    node.lock.release()
+
+            with self._meta_lock:
+                self.size -= 1
+            return
+
+    def discard(self, x):
+        try:
+            self.delete(x)
+        except KeyError:
+            pass
+
+    def __contains__(self, x):
+        pred = self.head
+        curr = None
+        for level in range(self.height - 1, -1, -1):
+            curr = pred.forward[level]
+            while curr is not None and curr.value < x:
+                pred = curr
+                curr = pred.forward[level]
+            if curr is not None and curr.value == x:
+                return curr.fully_linked and not curr.marked
+
+        return False
+
+    def __len__(self):
+        return self.size
+
+    def range(self, lo=None, hi=None):
+        """
+        Yields the elements x with lo <= x < hi present while the scan passes them.
+        """
+        node = self.head
+        if lo is not None:
+            for level in range(self.height - 1, -1, -1):
+                next_node = node.forward[level]
+                while next_node is not None and next_node.value < lo:
+                    node = next_node
+                    next_node = node.forward[level]
+
+        node = node.forward[0]
+        while node is not None and (hi is None or node.value < hi):
+            if node.fully_linked and not node.marked:
+                yield node.value
+            node = node.forward[0]
+
+    def __iter__(self):
+        return self.range()
+
+
+class LockedSkipList(object):
+    """
+    SkipList behind one global lock: the baseline ConcurrentSkipList is measured 
+    against.
+    """
+
+    def __init__(self, max_height=32, p=0.5, seed=None, rng=None):
+        self.skiplist = SkipList(max_height, p, seed, rng)
+        self.lock = threading.Lock()
+
+    def insert(self, x):
+        with self.lock:
+            self.skiplist.insert(x)
+
+    def delete(self, x):
+        with self.lock:
+            self.skiplist.delete(x)
+
+    def __contains__(self, x):
+        with self.lock:
+            return x in self.skiplist
+
+    def __len__(self):
+        return len(self.skiplist)
+
+
+def benchmark_concurrent(threads=(1, 2, 4, 8), size=100000, ops=200000, read_ratio=0.95, seed=0):
+    """
+    Read-heavy throughput of ConcurrentSkipList against LockedSkipList: each of the
+    threads runs ops/threads operations over a list preloaded with size elements, 
+    a lookup with probability read_ratio, an insert or delete otherwise.
+    Returns a list of (class name, threads, seconds, ops/sec).
+    """
+    results = []
+    for cls in (LockedSkipList, ConcurrentSkipList):
+        for n_threads in threads:
+            s = cls()
+            for x in range(0, 2 * size, 2):
+                s.insert(x)
+
+            per_thread = ops // n_threads
+
+            def work(thread_seed):
+                rnd = random.Random(thread_seed)
+                for _ in range(per_thread):
+                    x = rnd.randrange(2 * size)
+                    roll = rnd.random()
+                    if roll < read_ratio:
+                        x in s
+                    elif roll < (1 + read_ratio) / 2:
+                        s.insert(x)
+                    else:
+                        try:
+                            s.delete(x)
+                        except KeyError:
+                            pass
+
+            workers = [threading.Thread(target=work, args=(seed + i,)) for i in range(n_threads)]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - start
+            results.append((cls.__name__, n_threads, elapsed, per_thread * n_threads / elapsed))
+
+    return results
+
+
 class InsertTestCase(unittest.TestCase):
 
     def testInsertOnEmptyNotCreatingUpperList(self):      
-        return_values = [False]
-        def side_effect(*args, **kwargs):
-            return return_values.pop()
-
         s = SkipList()
-        s._randomize = MagicMock(side_effect=side_effect)
+        s._random_height = MagicMock(side_effect=[1])
         s.insert(1)
 
-        self.assertEqual(len(s.lists), 1)
-        self.assertEqual(s.lists[0].next_value, 1)
-        self.assertIsNone(s.lists[0].down)
-        self.assertIsNone(s.lists[0].next.down)
+        self.assertEqual(s.height, 1)
+        self.assertEqual(s.head.next_value, 1)
+        self.assertEqual(s.head.next.height, 1)
+        self.assertIsNone(s.head.next.next)
+        self.assertIsNone(s.head.forward[1])
 
     def testInsertOnEmptyCreatingUpperLists(self):      
-        return_values = [False, True, True] # will end with 3 layers
-        def side_effect(*args, **kwargs):
-            return return_values.pop()
+        s = SkipList()
+        s._random_height = MagicMock(side_effect=[3]) # will end with 3 layers
+        s.insert(1)
 
+        self.assertEqual(s.height, 3)
+        node = s.head.next
+        self.assertEqual(node.value, 1)
+        self.assertEqual(node.height, 3)
+        for level in range(3):
+            self.assertIs(s.head.forward[level], node)
+            self.assertIsNone(node.forward[level])
+        self.assertIsNone(s.head.forward[3])
+
+    def testInsertInMiddle(self):
+        s = SkipList()
+        s._random_height = MagicMock(side_effect=[2, 1, 2])
+        for x in [10, 30, 20]:
+            s.insert(x)
+
+        self.assertEqual(str(s), '[-INF] -> [10] -> [20] -> \n[-INF] -> [10] -> [20] -> [30] -> ')
+        self.assertIn(20, s)
+        self.assertNotIn(15, s)
+
+    def testMaxHeight(self):
+        # all bits zero: every coin flip says promote
+        rng = MagicMock()
+        rng.getrandbits.return_value = 0
+        s = SkipList(max_height=4, rng=rng)
+        for x in range(10):
+            s.insert(x)
+
+        self.assertEqual(s.height, 4)
+        self.assertEqual(s.head.next.height, 4)
+        self.assertEqual(rng.getrandbits.call_count, 10)
+
+    def testInsertDuplicate(self):
         s = SkipList()
-        s._randomize = MagicMock(side_effect=side_effect)
         s.insert(1)
+        s.insert(1)
+        self.assertEqual(s.head.next_value, 1)
+        self.assertIsNone(s.head.next.next)
 
-        self.assertEqual(len(s.lists), 3)
-        layer_0 = s.lists[0]
-        self.assertEqual(layer_0.next_value, 1)
-        self.assertIsNone(layer_0.next.next)
+    def testRandomOrder(self):
+        values = list(range(200))
+        random.shuffle(values)
+        s = SkipList(p=0.25)
+        for x in values:
+            s.insert(x)
 
-        layer_1 = s.lists[1]
-        self.assertEqual(layer_1.next_value, 1)
-        self.assertIsNone(layer_1.next.next)
-        self.assertEqual(layer_0.down, layer_1)
-        self.assertEqual(layer_0.next.down, layer_1.next)
+        for x in range(200):
+            self.assertIn(x, s)
+        self.assertNotIn(200, s)
+        self.assertNotIn(-1, s)
 
-        layer_2 = s.lists[2]
-        self.assertEqual(layer_2.next_value, 1)
-        self.assertIsNone(layer_2.next.next)
-        self.assertEqual(layer_1.down, layer_2)
-        self.assertEqual(layer_1.next.down, layer_2.next)
 
-    def testInsertInMiddle(self):
-        pass
+def _check_widths(testcase, s):
+    """
+    Every link width must match the positions of the nodes it connects.
+    """
+    positions = {id(s.head): 0}
+    node, position = s.head.forward[0], 1
+    while node is not None:
+        positions[id(node)] = position
+        node, position = node.forward[0], position + 1
 
-    def InsertOnTail(self):
-        pass
+    for node in [s.head] + list(_iter_nodes(s)):
+        for level in range(min(node.height, s.height)):
+            next_node = node.forward[level]
+            end = s.size + 1 if next_node is None else positions[id(next_node)]
+            testcase.assertEqual(node.width[level], end - positions[id(node)])
 
 
-if __name__ == "__main__":
-    unittest.main()
+def _iter_nodes(s):
+    node = s.head.forward[0]
+    while node is not None:
+        yield node
+        node = node.forward[0]
+
+
+class DeleteTestCase(unittest.TestCase):
+
+    def testDeleteNotFound(self):
+        s = SkipList()
+        s.insert(1)
+        self.assertRaises(KeyError, s.delete, 2)
+        s.discard(2)
+        self.assertEqual(len(s), 1)
+
+    def testDeleteShrinksLevels(self):
+        s = SkipList()
+        s._random_height = MagicMock(side_effect=[3, 1])
+        s.insert(1)
+        s.insert(2)
+        self.assertEqual(s.height, 3)
+
+        s.delete(1)
+        self.assertEqual(s.height, 1)
+        self.assertEqual(str(s), '[-INF] -> [2] -> ')
+        self.assertNotIn(1, s)
+
+    def testRandomInsertsAndDeletes(self):
+        rnd = random.Random(42)
+        s = SkipList(p=0.3)
+        expected = set()
+        for _ in range(2000):
+            x = rnd.randint(0, 300)
+            if x in expected and rnd.random() < 0.6:
+                s.delete(x)
+                expected.remove(x)
+            else:
+                s.insert(x)
+                expected.add(x)
+
+        self.assertEqual(list(s), sorted(expected))
+        self.assertEqual(len(s), len(expected))
+        _check_widths(self, s)
+
+
+class OrderedMapTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.s = SkipList()
+        for x in [50, 10, 40, 20, 30]:
+            self.s[x] = str(x)
+
+    def testMapping(self):
+        self.assertEqual(self.s[20], '20')
+        self.s[20] = 'twenty'
+        self.assertEqual(self.s[20], 'twenty')
+        self.assertEqual(len(self.s), 5)
+        self.assertRaises(KeyError, lambda: self.s[25])
+        self.assertIsNone(self.s.get(25))
+        del self.s[20]
+        self.assertNotIn(20, self.s)
+
+    def testRange(self):
+        self.assertEqual(list(self.s.range(20, 50)), [20, 30, 40])
+        self.assertEqual(list(self.s.range(15, 35)), [20, 30])
+        self.assertEqual(list(self.s.range(hi=20)), [10])
+        self.assertEqual(list(self.s.range(lo=45)), [50])
+        self.assertEqual(list(self.s.items(30, 41)), [(30, '30'), (40, '40')])
+        self.assertEqual(list(self.s.range(60)), [])
+
+    def testFloorAndCeiling(self):
+        self.assertEqual(self.s.floor(35), 30)
+        self.assertEqual(self.s.floor(30), 30)
+        self.assertRaises(KeyError, self.s.floor, 5)
+        self.assertEqual(self.s.ceiling(35), 40)
+        self.assertEqual(self.s.ceiling(40), 40)
+        self.assertRaises(KeyError, self.s.ceiling, 55)
+
+    def testSuccessorAndPredecessor(self):
+        self.assertEqual(self.s.successor(30), 40)
+        self.assertEqual(self.s.successor(35), 40)
+        self.assertRaises(KeyError, self.s.successor, 50)
+        self.assertEqual(self.s.predecessor(30), 20)
+        self.assertEqual(self.s.predecessor(35), 30)
+        self.assertRaises(KeyError, self.s.predecessor, 10)
+
+    def testRankAndSelect(self):
+        self.assertEqual([self.s.rank(x) for x in [5, 10, 25, 50, 55]], [0, 0, 2, 4, 5])
+        self.assertEqual([self.s.select(i) for i in range(5)], [10, 20, 30, 40, 50])
+        self.assertEqual(self.s.select(-1), 50)
+        self.assertRaises(IndexError, self.s.select, 5)
+
+    def testRankAndSelectRandom(self):
+        rnd = random.Random(7)
+        s = SkipList(p=0.25)
+        values = rnd.sample(range(10000), 1000)
+        for x in values:
+            s.insert(x)
+        for x in values[:300]:
+            s.delete(x)
+
+        expected = sorted(values[300:])
+        _check_widths(self, s)
+        for i, x in enumerate(expected):
+            self.assertEqual(s.rank(x), i)
+            self.assertEqual(s.select(i), x)
+
+
+class FromSortedTestCase(unittest.TestCase):
+
+    def testDeterministic(self):
+        s = SkipList.from_sorted(range(1, 10), deterministic=True)
+        self.assertEqual(str(s), '\n'.join([
+            '[-INF] -> [8] -> ',
+            '[-INF] -> [4] -> [8] -> ',
+            '[-INF] -> [2] -> [4] -> [6] -> [8] -> ',
+            '[-INF] -> [1] -> [2] -> [3] -> [4] -> [5] -> [6] -> [7] -> [8] -> [9] -> ']))
+        _check_widths(self, s)
+
+    def testRandomizedKeepsWorking(self):
+        s = SkipList.from_sorted([1, 2, 2, 3, 5, 8, 13], p=0.25)
+        self.assertEqual(list(s), [1, 2, 3, 5, 8, 13])
+        self.assertEqual(len(s), 6)
+        _check_widths(self, s)
+
+        s.insert(4)
+        s.delete(8)
+        self.assertEqual(list(s), [1, 2, 3, 4, 5, 13])
+        self.assertEqual(s.select(3), 4)
+        _check_widths(self, s)
+
+    def testUnsorted(self):
+        self.assertRaises(ValueError, SkipList.from_sorted, [1, 3, 2])
+
+    def testEmpty(self):
+        s = SkipList.from_sorted([])
+        self.assertEqual(len(s), 0)
+        s.insert(1)
+        self.assertEqual(list(s), [1])
+
 
+class FingerTestCase(unittest.TestCase):
 
+    def testIncreasingInserts(self):
+        s = SkipList(p=0.3)
+        finger = s.finger()
+        for x in range(0, 500, 2):
+            finger.insert(x)
+        for x in range(499, 0, -2):
+            finger.insert(x)
 
+        self.assertEqual(list(s), list(range(500)))
+        _check_widths(self, s)
+        for x in range(0, 500, 7):
+            self.assertIn(x, finger)
+            self.assertEqual(finger.rank(x), x)
+
+    def testMixedWithDirectChanges(self):
+        rnd = random.Random(3)
+        s = SkipList.from_sorted(range(0, 1000, 3))
+        expected = set(range(0, 1000, 3))
+        finger = s.finger()
+        for _ in range(2000):
+            x = rnd.randrange(1000)
+            roll = rnd.random()
+            target = finger if rnd.random() < 0.8 else s
+            if roll < 0.4:
+                target.insert(x)
+                expected.add(x)
+            elif roll < 0.7 and x in expected:
+                target.delete(x)
+                expected.remove(x)
+            else:
+                self.assertEqual(x in target, x in expected)
+
+        self.assertEqual(list(s), sorted(expected))
+        _check_widths(self, s)
+        self.assertRaises(KeyError, finger.delete, 1000)
+
+
+class RandomnessTestCase(unittest.TestCase):
+
+    def testSeedIsReproducible(self):
+        first = SkipList(seed=11)
+        second = SkipList(seed=11)
+        for x in range(300):
+            first.insert(x)
+            second.insert(x)
+
+        self.assertEqual(str(first), str(second))
+
+    def testLevelDistribution(self):
+        for p in (0.5, 0.25, 0.3):
+            levels = LevelGenerator(16, p, seed=5)
+            heights = [levels() for _ in range(20000)]
+            for k in (1, 2, 3):
+                observed = sum(1 for h in heights if h > k) / len(heights)
+                self.assertAlmostEqual(observed, p ** k, delta=0.02)
+            self.assertLessEqual(max(heights), 16)
+
+    def testStats(self):
+        s = SkipList.from_sorted(range(1, 10), deterministic=True)
+        stats = s.stats()
+        self.assertEqual(stats.size, 9)
+        self.assertEqual(stats.levels, 4)
+        self.assertEqual(stats.nodes_per_level, [9, 4, 2, 1])
+        self.assertEqual(s.search_cost(8), (6, 8))
+        self.assertEqual(s.search_cost(9), (4, 3))
+
+        s = SkipList(seed=2)
+        for x in range(5000):
+            s.insert(x)
+        stats = s.stats(sample=500)
+        self.assertLess(stats.average_path_length, 2 * stats.expected_path_length)
+        self.assertGreater(stats.average_comparisons, stats.average_path_length)
+
+
+class ConcurrentSkipListTestCase(unittest.TestCase):
+
+    def testSingleThread(self):
+        s = ConcurrentSkipList(p=0.3)
+        values = random.Random(1).sample(range(1000), 300)
+        for x in values:
+            self.assertTrue(s.insert(x))
+        self.assertFalse(s.insert(values[0]))
+
+        for x in values[:100]:
+            s.delete(x)
+        self.assertRaises(KeyError, s.delete, values[0])
+
+        expected = sorted(values[100:])
+        self.assertEqual(list(s), expected)
+        self.assertEqual(len(s), 200)
+        self.assertEqual(list(s.range(100, 500)), [x for x in expected if 100 <= x < 500])
+        for x in values[:100]:
+            self.assertNotIn(x, s)
+        for x in values[100:]:
+            self.assertIn(x, s)
+
+    def check_levels(self, s):
+        for level in range(s.max_height):
+            values = []
+            node = s.head.forward[level]
+            while node is not None:
+                values.append(node.value)
+                node = node.forward[level]
+            self.assertEqual(values, sorted(set(values)), 'level %d' % level)
+
+    def testInsertBeforeHeightIsRaised(self):
+        # the state another insert sees between linking a tall tower and
+        # raising height
+        s = ConcurrentSkipList(max_height=8)
+        s._random_height = lambda: 5
+        s.insert(10)
+        s.height = 1
+        s.insert(20)
+        self.check_levels(s)
+        s.delete(10)
+        s.delete(20)
+        self.assertEqual(list(s), [])
+
+    def testConcurrentTallInserts(self):
+        s = ConcurrentSkipList(max_height=12, p=0.8)
+
+        def insert(index):
+            for x in random.Random(index).sample(range(2000), 400):
+                s.insert(x)
+
+        threads = [threading.Thread(target=insert, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.check_levels(s)
+        values = list(s)
+        for x in values[::2]:
+            s.delete(x)
+        self.check_levels(s)
+        self.assertEqual(list(s), values[1::2])
+
+    def testStress(self):
+        """
+        Writers fight over the same keys while readers scan: every key must end 
+        up present iff its successful inserts outnumber its successful deletes, 
+        and keys nobody touches must never look absent.
+        """
+        s = ConcurrentSkipList(max_height=8)
+        stable = list(range(1, 400, 4))
+        for x in stable:
+            s.insert(x)
+
+        contended = [x for x in range(400) if x % 4 != 1]
+        balances = [dict.fromkeys(contended, 0) for _ in range(4)]
+        errors = []
+        stop = threading.Event()
+
+        def writer(index):
+            rnd = random.Random(index)
+            balance = balances[index]
+            for _ in range(3000):
+                x = rnd.choice(contended)
+                if rnd.random() < 0.5:
+                    if s.insert(x):
+                        balance[x] += 1
+                else:
+                    try:
+                        s.delete(x)
+                        balance[x] -= 1
+                    except KeyError:
+                        pass
+
+        def reader():
+            while not stop.is_set():
+                scanned = list(s)
+                if scanned != sorted(set(scanned)):
+                    errors.append('unsorted scan')
+                for x in stable[::7]:
+                    if x not in s:
+                        errors.append('%s missing' % x)
+
+        readers = [threading.Thread(target=reader) for _ in range(2)]
+        writers = [threading.Thread(target=writer, args=(i,)) for i in range(4)]
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        stop.set()
+        for thread in readers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        expected = set(stable)
+        for x in contended:
+            total = sum(balance[x] for balance in balances)
+            self.assertIn(total, (0, 1))
+            if total:
+                expected.add(x)
+        self.assertEqual(list(s), sorted(expected))
+        self.assertEqual(len(s), len(expected))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ['--benchmark']:
+        print('%-20s %8s %10s %12s' % ('skip list', 'threads', 'seconds', 'ops/sec'))
+        for name, threads, seconds, throughput in benchmark_concurrent():
+            print('%-20s %8d %10.4f %12.0f' % (name, threads, seconds, throughput))
+    else:
+        unittest.main()
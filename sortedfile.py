@@ -0,0 +1,356 @@
+"""
+On-disk format for the sorted structures of this repo (SortedSet, the
+binarytree trees, SkipList keys): written in one sequential pass, then opened
+with mmap and searched in place, without reading it in.
+
+    write_sorted('keys.idx', sorted_set)
+    keys = SortedFile('keys.idx')       # O(1): reads the 32 byte footer only
+    42 in keys, keys.rank(42), list(keys.range(10, 20))
+
+Opening doesn't depend on the number of keys, and the pages a search touches
+come from the OS page cache: worker processes mapping the same file share one
+copy. To get a mutable structure back, bulk load it in O(n), e.g.
+SortedSet.load(path) or RedBlackTree.from_sorted(SortedFile(path)).
+
+Layout, numbers in native byte order:
+
+    keys       numbers: an array of typecode ('q', 'd', ...)
+               str/bytes: the encoded keys back to back, then zero padding to 8
+    offsets    str/bytes only: count + 1 uint64, key i is data[offsets[i]:offsets[i + 1]]
+    footer     MAGIC, kind, byte order, count, position of offsets (32 bytes)
+
+str keys are stored UTF-8 encoded, whose byte order is the code point order:
+lookups encode the key once and compare bytes.
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+from itertools import chain
+
+MAGIC = b'SORTKEYS'
+# magic, kind, byte order, 6 pad bytes, count, position of offsets
+FOOTER = struct.Struct('<8s1s1s6xQQ')
+
+BYTES = b'y'
+STR = b'u'
+
+# values read out of a mapped array at once while scanning
+CHUNK = 4096
+
+
+def _kind_of(key, typecode):
+    if typecode is not None:
+        return typecode.encode('ascii')
+    if isinstance(key, str):
+        return STR
+    if isinstance(key, (bytes, bytearray)):
+        return BYTES
+    if isinstance(key, float):
+        return b'd'
+    if isinstance(key, int):
+        return b'q'
+    raise TypeError('cannot store %r keys, only numbers, str and bytes' % type(key).__name__)
+
+
+def _encode_str(key):
+    if not isinstance(key, str):
+        raise TypeError('str keys only, not %r' % type(key).__name__)
+    return key.encode('utf-8')
+
+
+def _encode_bytes(key):
+    if not isinstance(key, (bytes, bytearray, memoryview)):
+        raise TypeError('bytes keys only, not %r' % type(key).__name__)
+    return bytes(key)
+
+
+def write_sorted(path, keys, typecode=None):
+    """
+    Writes keys (strictly increasing: any of the sorted structures, or a sorted
+    list without duplicates) to path, in one pass over them. typecode is the
+    array typecode numbers are stored as; by default 'q' for ints, 'd' for
+    floats, and str and bytes as they are.
+
+    Writes to a temporary file renamed over path at the end, so processes that
+    have the old file mapped keep reading it. Returns the number of keys.
+    Raises ValueError if keys are not strictly increasing.
+    """
+    keys = iter(keys)
+    first = next(keys, None)
+    kind = _kind_of(first, typecode) if first is not None else (typecode or 'q').encode('ascii')
+    encode = _encode_str if kind == STR else _encode_bytes
+
+    tmp = '%s.tmp%d' % (path, os.getpid())
+    count = 0
+    previous = None
+    try:
+        with open(tmp, 'wb') as f:
+            if kind in (STR, BYTES):
+                offsets = array('Q', [0])
+                end = 0
+                for key in (chain([first], keys) if first is not None else ()):
+                    if count and not previous < key:
+                        raise ValueError('keys are not sorted and unique: %r after %r' % (key, previous))
+                    data = encode(key)
+                    f.write(data)
+                    end += len(data)
+                    offsets.append(end)
+                    previous = key
+                    count += 1
+
+                f.write(bytes(-end % 8))
+                index = end + (-end % 8)
+                f.write(offsets.tobytes())
+            else:
+                chunk = array(kind.decode('ascii'))
+                for key in (chain([first], keys) if first is not None else ()):
+                    if count and not previous < key:
+                        raise ValueError('keys are not sorted and unique: %r after %r' % (key, previous))
+                    chunk.append(key)
+                    previous = key
+                    count += 1
+                    if len(chunk) == CHUNK:
+                        f.write(chunk.tobytes())
+                        del chunk[:]
+                f.write(chunk.tobytes())
+                index = 0
+
+            order = b'<' if sys.byteorder == 'little' else b'>'
+            f.write(FOOTER.pack(MAGIC, kind, order, count, index))
+
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    return count
+
+
+class _EncodedKeys(object):
+    """
+    The str/bytes keys of a mapped file as a sequence of bytes, for bisect.
+    """
+
+    __slots__ = ('data', 'offsets')
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]]
+
+
+class SortedFile(Sequence):
+    """
+    Read-only sorted set of keys mapped from a file written by write_sorted.
+    Lookups are binary searches on the mapped pages: O(logn) page touches, no
+    parsing. Indexable by rank like a sorted list.
+
+    close() (or a with block) unmaps the file; the OS keeps the pages cached
+    for the next process opening it.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        buffer = self._mmap
+        if len(buffer) < FOOTER.size:
+            self._mmap.close()
+            raise ValueError('%s is not a sorted keys file' % path)
+        magic, kind, order, count, index = FOOTER.unpack_from(buffer, len(buffer) - FOOTER.size)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError('%s is not a sorted keys file' % path)
+        if order != (b'<' if sys.byteorder == 'little' else b'>'):
+            self._mmap.close()
+            raise ValueError('%s was written on a machine of the other byte order' % path)
+
+        self.path = path
+        self.kind = kind
+        self._views = []
+        if kind in (STR, BYTES):
+            offsets = self._view(index, 8 * (count + 1)).cast('Q')
+            self._views.append(offsets)
+            self._keys = _EncodedKeys(self._mmap, offsets)
+            if kind == STR:
+                self._encode = _encode_str
+                self._decode = lambda data: data.decode('utf-8')
+            else:
+                self._encode = _encode_bytes
+                self._decode = None
+        else:
+            typecode = kind.decode('ascii')
+            keys = self._view(0, array(typecode).itemsize * count).cast(typecode)
+            self._views.append(keys)
+            self._keys = keys
+            self._encode = self._decode = None
+
+    def _view(self, start, length):
+        view = memoryview(self._mmap)
+        self._views.append(view)
+        part = view[start:start + length]
+        self._views.append(part)
+        return part
+
+    def close(self):
+        # the mmap can't close while views of it are alive
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _key(self, i):
+        key = self._keys[i]
+        return self._decode(key) if self._decode else key
+
+    def __getitem__(self, i):
+        """
+        The key of rank i, or a list of them for a slice.
+        """
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step == 1:
+                return list(self._scan(start, max(start, stop)))
+            return [self._key(j) for j in range(start, stop, step)]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('sorted file index out of range')
+        return self._key(i)
+
+    def _scan(self, start, stop):
+        """
+        Yields the keys of rank start to stop, a chunk of numbers at a time.
+        """
+        keys = self._keys
+        if self._decode is None and isinstance(keys, memoryview):
+            for i in range(start, stop, CHUNK):
+                yield from keys[i:min(i + CHUNK, stop)].tolist()
+        elif self._decode is None:
+            for i in range(start, stop):
+                yield keys[i]
+        else:
+            decode = self._decode
+            for i in range(start, stop):
+                yield decode(keys[i])
+
+    def _search(self, key):
+        return self._encode(key) if self._encode else key
+
+    def __contains__(self, key):
+        keys = self._keys
+        try:
+            probe = self._search(key)
+            i = bisect_left(keys, probe)
+        except TypeError:
+            # not comparable with the keys of the file
+            return False
+        return i < len(keys) and keys[i] == probe
+
+    def rank(self, key):
+        """
+        Number of keys < key.
+        Run time: O(logn)
+        """
+        return bisect_left(self._keys, self._search(key))
+
+    def index(self, key):
+        i = self.rank(key)
+        if i < len(self) and self._keys[i] == self._search(key):
+            return i
+        raise ValueError('%r is not in the file' % (key,))
+
+    def count(self, key):
+        return 1 if key in self else 0
+
+    def __iter__(self):
+        return self._scan(0, len(self))
+
+    def __reversed__(self):
+        for i in range(len(self) - 1, -1, -1):
+            yield self._key(i)
+
+    def irange(self, lo=None, hi=None, inclusive=(True, True)):
+        """
+        Yields the keys between lo and hi, in order. None means unbounded;
+        inclusive tells whether lo and hi themselves are in the range.
+        Run time: O(logn) to start, then O(1) per key
+        """
+        keys = self._keys
+        start = 0 if lo is None else (bisect_left if inclusive[0] else bisect_right)(keys, self._search(lo))
+        stop = len(keys) if hi is None else (bisect_right if inclusive[1] else bisect_left)(keys, self._search(hi))
+        return self._scan(start, max(start, stop))
+
+    def items_from(self, key):
+        """
+        Yields the keys >= key, in order: a scan resumed where it left off.
+        """
+        return self.irange(key)
+
+    def range(self, lo=None, hi=None):
+        """
+        Yields the keys x with lo <= x < hi, in order. None means unbounded.
+        """
+        return self.irange(lo, hi, inclusive=(True, False))
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import tempfile
+    import time
+
+    from sortedset import SortedSet
+
+    parser = argparse.ArgumentParser(description='Cold start: rebuilding a SortedSet vs mapping a file.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print('%-10s %12s %12s %12s %12s %14s' % (
+        'size', 'inserts', 'load', 'write', 'open', 'lookups/sec'))
+    for n in args.sizes:
+        rng = random.Random(args.seed)
+        keys = rng.sample(range(n * 10), n)
+        probes = [rng.randrange(n * 10) for _ in range(100000)]
+        path = os.path.join(tempfile.mkdtemp(), 'keys.idx')
+
+        start = time.perf_counter()
+        s = SortedSet()
+        for key in keys:
+            s.add(key)
+        inserted = time.perf_counter()
+        write_sorted(path, s)
+        written = time.perf_counter()
+        SortedSet.load(path)
+        loaded = time.perf_counter()
+        mapped = SortedFile(path)
+        opened = time.perf_counter()
+        for key in probes:
+            key in mapped
+        looked_up = time.perf_counter()
+        mapped.close()
+        os.remove(path)
+
+        print('%-10d %11.3fs %11.3fs %11.3fs %11.6fs %14.0f' % (
+            n, inserted - start, loaded - written, written - inserted, opened - loaded,
+            len(probes) / (looked_up - opened)))
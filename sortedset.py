@@ -1,28 +1,974 @@
 """
-Sorted Set implementation using binary search trees.
+Sorted Set implementation on top of the ordered structures of this repo.
 
-Just for fun I want to do a benchmark between random binary searches and balanced ones 
-(implemented as red-black trees).
+Just for fun I want to do a benchmark between random binary searches and balanced ones
+(implemented as red-black trees), skip lists and a plain sorted array: run this module.
 
+    python sortedset.py --sizes 1000 10000 --output results.json
+
+A backend is anything with insert(x) (no-op if present), delete(x) (KeyError if
+absent), __contains__, __len__, sorted __iter__ and range(lo, hi) over lo <= x < hi.
+It can also have load_sorted(values), filling it (empty) from sorted values
+without duplicates in O(n): set algebra and bulk updates rebuild through it.
 """
+from array import array
+from bisect import bisect_left
+from collections import deque
+from collections.abc import MutableSet, Set, Sized
+from itertools import chain
+
+from binarytree import (
+    BinarySearchTree, BPlusTree, CompactRedBlackTree, ImmutableRedBlackTree,
+    RedBlackTree, SplayTree, Treap)
+from skiplist import SkipList
+from sortedfile import SortedFile, write_sorted
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class SortedArray(object):
+    """
+    Python list kept sorted with bisect: O(logn) lookups, O(n) inserts and deletes
+    (a memmove, fast in practice for small and medium sizes).
+    """
+
+    def __init__(self):
+        self.array = []
+
+    def insert(self, value):
+        array = self.array
+        i = bisect_left(array, value)
+        if i == len(array) or array[i] != value:
+            array.insert(i, value)
+
+    def delete(self, value):
+        array = self.array
+        i = bisect_left(array, value)
+        if i == len(array) or array[i] != value:
+            raise KeyError(value)
+        del array[i]
+
+    def __contains__(self, value):
+        array = self.array
+        i = bisect_left(array, value)
+        return i < len(array) and array[i] == value
+
+    def load_sorted(self, values):
+        self.array = list(values)
+
+    def __len__(self):
+        return len(self.array)
+
+    def __iter__(self):
+        return iter(self.array)
+
+    def range(self, lo=None, hi=None):
+        array = self.array
+        start = 0 if lo is None else bisect_left(array, lo)
+        stop = len(array) if hi is None else bisect_left(array, hi)
+        for i in range(start, stop):
+            yield array[i]
+
+
+class BlockList(object):
+    """
+    Sorted list of sorted blocks: each block is a small Python list (or a typed
+    array.array, with typecode, for numbers) of at most 2 * load values, and
+    maxes[i] is the biggest value of blocks[i].
+
+    A lookup bisects maxes to pick the block, then bisects the block: two C-level
+    binary searches over contiguous memory, no pointer chasing. Inserts and
+    deletes shift at most 2 * load values; a block splits in half when it
+    overflows and is merged into a neighbour when it drops below load / 2.
+
+    No node objects: per value it costs one list slot (8 bytes) plus the value
+    itself, or just the item size of a typed array.
+    """
+
+    def __init__(self, load=1000, typecode=None):
+        self.load = load
+        self.typecode = typecode
+        self.blocks = []
+        self.maxes = []
+        self.size = 0
+
+    def _new_block(self, values):
+        if self.typecode is None:
+            return list(values)
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            block = array(self.typecode)
+            block.frombytes(values.astype(self.typecode).tobytes())
+            return block
+        return array(self.typecode, values)
+
+    def load_sorted(self, values):
+        """
+        Cuts values (a sequence, or a NumPy array) into blocks of load values.
+        """
+        load = self.load
+        self.blocks = [self._new_block(values[i:i + load])
+                       for i in range(0, len(values), load)]
+        self.maxes = [block[-1] for block in self.blocks]
+        self.size = len(values)
+
+    def _locate(self, value):
+        """
+        Returns (block index, index in block) where value is or would be.
+        """
+        i = bisect_left(self.maxes, value)
+        if i == len(self.maxes):
+            i -= 1
+            return i, len(self.blocks[i])
+        return i, bisect_left(self.blocks[i], value)
+
+    def _split(self, i):
+        """
+        Moves the upper half of blocks[i] into a new block after it.
+        """
+        block = self.blocks[i]
+        half = self._new_block(block[self.load:])
+        del block[self.load:]
+        self.blocks.insert(i + 1, half)
+        self.maxes[i] = block[-1]
+        self.maxes.insert(i + 1, half[-1])
+
+    def insert(self, value):
+        if not self.blocks:
+            self.blocks.append(self._new_block([value]))
+            self.maxes.append(value)
+            self.size = 1
+            return
+
+        i, j = self._locate(value)
+        block = self.blocks[i]
+        if j < len(block) and block[j] == value:
+            return
+
+        block.insert(j, value)
+        self.maxes[i] = block[-1]
+        self.size += 1
+
+        if len(block) > 2 * self.load:
+            self._split(i)
+
+    def delete(self, value):
+        if not self.blocks:
+            raise KeyError(value)
+
+        i, j = self._locate(value)
+        block = self.blocks[i]
+        if j == len(block) or block[j] != value:
+            raise KeyError(value)
+
+        del block[j]
+        self.size -= 1
+
+        if not block:
+            del self.blocks[i]
+            del self.maxes[i]
+            return
+
+        self.maxes[i] = block[-1]
+        if len(block) < self.load // 2 and len(self.blocks) > 1:
+            # merge into the previous block (the first block takes the next one)
+            if i == 0:
+                i = 1
+            previous = self.blocks[i - 1]
+            previous.extend(self.blocks[i])
+            self.maxes[i - 1] = self.maxes[i]
+            del self.blocks[i]
+            del self.maxes[i]
+            if len(previous) > 2 * self.load:
+                self._split(i - 1)
+
+    def __contains__(self, value):
+        maxes = self.maxes
+        i = bisect_left(maxes, value)
+        if i == len(maxes):
+            return False
+        block = self.blocks[i]
+        j = bisect_left(block, value)
+        return j < len(block) and block[j] == value
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return chain.from_iterable(self.blocks)
+
+    def range(self, lo=None, hi=None):
+        if not self.blocks:
+            return
+
+        i, j = (0, 0) if lo is None else self._locate(lo)
+        blocks = self.blocks
+        for k in range(i, len(blocks)):
+            block = blocks[k]
+            if hi is not None and not block[-1] < hi:
+                yield from block[j:bisect_left(block, hi)]
+                return
+            yield from block[j:]
+            j = 0
+
+
+class TreeBackend(object):
+    """
+    Adapts the binarytree trees (BinarySearchTree, RedBlackTree,
+    CompactRedBlackTree, SplayTree, Treap, BPlusTree) to the backend
+    interface: keeps duplicates out, walks the values in order.
+    """
+
+    def __init__(self, tree_class):
+        self.tree = tree_class()
+        # BPlusTree keys are unique anyway; the binary trees skip a duplicate
+        # in the descent of the insert itself
+        self._bplus = isinstance(self.tree, BPlusTree)
+
+    def insert(self, value):
+        if self._bplus:
+            self.tree.insert(value)
+        else:
+            self.tree.insert(value, unique=True)
+
+    def delete(self, value):
+        self.tree.delete(value)
+
+    def load_sorted(self, values):
+        self.tree = type(self.tree).from_sorted(values)
+
+    def __contains__(self, value):
+        return value in self.tree
+
+    def __len__(self):
+        return len(self.tree)
+
+    def __iter__(self):
+        return iter(self.tree)
+
+    def range(self, lo=None, hi=None):
+        if hasattr(self.tree, 'range'):
+            return self.tree.range(lo, hi)
+        return self.tree.irange(lo, hi, inclusive=(True, False))
+
+
+class PersistentBackend(object):
+    """
+    Mutable front of an ImmutableRedBlackTree: every change swaps in the new
+    version of the tree, copying O(logn) nodes. snapshot() is O(1): it shares
+    the current version, and neither side can change the other's.
+    """
+
+    def __init__(self, tree=None):
+        self.tree = ImmutableRedBlackTree() if tree is None else tree
+
+    def insert(self, value):
+        self.tree = self.tree.insert(value)
+
+    def delete(self, value):
+        self.tree = self.tree.delete(value)
+
+    def load_sorted(self, values):
+        self.tree = ImmutableRedBlackTree.from_sorted(values)
+
+    def snapshot(self):
+        return PersistentBackend(self.tree)
+
+    def __contains__(self, value):
+        return value in self.tree
+
+    def __len__(self):
+        return len(self.tree)
+
+    def __iter__(self):
+        return iter(self.tree)
+
+    def range(self, lo=None, hi=None):
+        return self.tree.range(lo, hi)
+
+
+BACKENDS = {
+    'bst': lambda: TreeBackend(BinarySearchTree),
+    'redblack': lambda: TreeBackend(RedBlackTree),
+    'compact': lambda: TreeBackend(CompactRedBlackTree),
+    'splay': lambda: TreeBackend(SplayTree),
+    'treap': lambda: TreeBackend(Treap),
+    'bplus': lambda: TreeBackend(BPlusTree),
+    'skiplist': SkipList,
+    'array': SortedArray,
+    'blocks': BlockList,
+    # 64-bit integers only, stored unboxed (and merged in NumPy, when installed)
+    'blocks_int64': lambda: BlockList(typecode='q'),
+    'persistent': PersistentBackend,
+}
+
+
+##########################
+# Linear merges
+#
+# They take sorted iterables without duplicates and return a sorted list without
+# duplicates, in a single pass over both, comparing with < only.
+
+_missing = object()
+
+
+def _sorted_unique(iterable):
+    """
+    The values of iterable, sorted (once) and without duplicates. A SortedSet
+    already is, and is returned as it is.
+    """
+    if isinstance(iterable, SortedSet):
+        return iterable
+    values = sorted(iterable)
+    return values[:1] + [y for x, y in zip(values, values[1:]) if x < y]
+
+
+def _union(a, b):
+    out = []
+    append = out.append
+    b = iter(b)
+    y = next(b, _missing)
+    for x in a:
+        while y is not _missing and y < x:
+            append(y)
+            y = next(b, _missing)
+        if y is not _missing and not x < y:
+            y = next(b, _missing)
+        append(x)
+    if y is not _missing:
+        append(y)
+        out.extend(b)
+    return out
+
+
+def _intersection(a, b):
+    out = []
+    append = out.append
+    b = iter(b)
+    y = next(b, _missing)
+    if y is _missing:
+        return out
+    for x in a:
+        while y < x:
+            y = next(b, _missing)
+            if y is _missing:
+                return out
+        if not x < y:
+            append(x)
+    return out
+
+
+def _difference(a, b):
+    out = []
+    append = out.append
+    b = iter(b)
+    y = next(b, _missing)
+    for x in a:
+        while y is not _missing and y < x:
+            y = next(b, _missing)
+        if y is _missing or x < y:
+            append(x)
+    return out
+
+
+def _symmetric_difference(a, b):
+    out = []
+    append = out.append
+    b = iter(b)
+    y = next(b, _missing)
+    for x in a:
+        while y is not _missing and y < x:
+            append(y)
+            y = next(b, _missing)
+        if y is not _missing and not x < y:
+            y = next(b, _missing)
+        else:
+            append(x)
+    if y is not _missing:
+        append(y)
+        out.extend(b)
+    return out
+
+
+def _numpy_sorted_unique(values):
+    """
+    Sorts a NumPy array and drops duplicates. numpy.unique would do, but recent
+    versions dedupe with a hash table first: slower on already sorted runs than
+    a stable sort (a merge of the runs).
+    """
+    values = numpy.sort(values, kind='stable')
+    if len(values) < 2:
+        return values
+    keep = numpy.empty(len(values), bool)
+    keep[0] = True
+    numpy.not_equal(values[1:], values[:-1], out=keep[1:])
+    return values[keep]
+
+
+# the same merges on sorted NumPy arrays without duplicates
+_NUMPY_MERGES = {
+    _union: lambda a, b: _numpy_sorted_unique(numpy.concatenate((a, b))),
+    _intersection: lambda a, b: numpy.intersect1d(a, b, assume_unique=True),
+    _difference: lambda a, b: numpy.setdiff1d(a, b, assume_unique=True),
+    _symmetric_difference: lambda a, b: numpy.setxor1d(a, b, assume_unique=True),
+}
+
+
+def _middles_first(values):
+    """
+    Yields values in breadth-first order of the balanced tree over them: inserted
+    in this order, a plain BST comes out balanced and a red-black tree never rotates.
+    """
+    ranges = deque([(0, len(values))])
+    while ranges:
+        lo, hi = ranges.popleft()
+        if lo < hi:
+            mid = (lo + hi) // 2
+            yield values[mid]
+            ranges.append((lo, mid))
+            ranges.append((mid + 1, hi))
+
 
-class SortedSet(object):
+class SortedSet(MutableSet):
+    """
+    A set that iterates in order.
 
-    def __init__(self, dumb=False, immutable=False):
-        if dumb:
-            self.tree = BinarySearchTree()
+    backend is the name of one of BACKENDS or a callable returning a new empty
+    backend. Set operators (|, &, -, ^) return a SortedSet on the same backend.
+
+    Set algebra runs as linear merges of the sorted orders, O(n + m), and bulk
+    updates sort their batch once. With NumPy installed, the merges of a set on a
+    typed BlockList backend (e.g. lambda: BlockList(typecode='q')) with numeric
+    operands run in NumPy.
+
+    immutable=True stores the values in Okasaki's immutable (persistent)
+    red-black tree, backend='persistent': the set still changes, but
+    snapshot() is O(1).
+    """
+
+    def __init__(self, iterable=(), backend=None, immutable=False):
+        if immutable:
+            if backend not in (None, 'persistent'):
+                raise ValueError('immutable sets use the persistent backend, not %r' % (backend,))
+            backend = 'persistent'
+        elif backend is None:
+            backend = 'redblack'
+
+        self.backend = backend
+        self._factory = BACKENDS[backend] if isinstance(backend, str) else backend
+        self.tree = self._factory()
+        self.update(iterable)
+
+    def _from_iterable(self, iterable):
+        return type(self)(iterable, backend=self.backend)
+
+    def _from_sorted(self, ordered):
+        s = type(self)(backend=self.backend)
+        s.tree = s._new_tree(ordered)
+        return s
+
+    def snapshot(self):
+        """
+        A point-in-time copy of the set, on the same backend: later changes to
+        either one don't show in the other. O(1) with backends that can share
+        their state (the persistent one), an O(n) copy with the others.
+        """
+        snapshot = getattr(self.tree, 'snapshot', None)
+        if snapshot is None:
+            return self._from_sorted(list(self.tree))
+
+        s = type(self)(backend=self.backend)
+        s.tree = snapshot()
+        return s
+
+    def save(self, path, typecode=None):
+        """
+        Writes the values to path in the sortedfile format, for SortedFile to
+        map in O(1) or load to read back. Returns the number of values.
+        """
+        return write_sorted(path, self.tree, typecode)
+
+    @classmethod
+    def load(cls, path, backend=None):
+        """
+        A set of the values of a file written by save (or write_sorted): read
+        off the mapped file and bulk loaded, O(n) instead of n inserts on
+        backends that bulk load.
+        """
+        with SortedFile(path) as keys:
+            s = cls(backend=backend)
+            s.tree = s._new_tree(keys[:])
+        return s
+
+    def _new_tree(self, ordered):
+        """
+        A new backend holding ordered (sorted, no duplicates), in O(n) when the
+        backend can bulk load.
+        """
+        tree = self._factory()
+        if hasattr(tree, 'load_sorted'):
+            tree.load_sorted(ordered)
+        elif isinstance(tree, SkipList):
+            tree = SkipList.from_sorted(ordered, tree.max_height, tree.p, rng=tree.levels.rng)
+        else:
+            for value in _middles_first(ordered):
+                tree.insert(value)
+        return tree
+
+    def _rebuild_pays_off(self, changes):
+        """
+        Rebuilding from a merge costs O(n + k), applying k changes one by one
+        O(k logn): rebuild when k logn > n and the backend bulk loads in O(n),
+        or when the set is empty.
+        """
+        n = len(self.tree)
+        if n == 0:
+            return True
+        bulk = hasattr(self.tree, 'load_sorted') or isinstance(self.tree, SkipList)
+        return bulk and changes * n.bit_length() > n
+
+    ##########################
+    # NumPy path
+
+    def _numeric(self):
+        """
+        The NumPy dtype the values are stored as, if NumPy is installed and the
+        backend is a typed BlockList, else None.
+        """
+        typecode = getattr(self.tree, 'typecode', None)
+        if numpy is None or typecode is None:
+            return None
+        return numpy.dtype(typecode)
+
+    def _to_numpy(self, dtype):
+        blocks = self.tree.blocks
+        if not blocks:
+            return numpy.empty(0, dtype)
+        return numpy.concatenate([numpy.frombuffer(block, dtype) for block in blocks])
+
+    def _numpy_operand(self, other, dtype):
+        """
+        other as a sorted NumPy array of dtype without duplicates, or None if its
+        values don't safely cast to dtype.
+        """
+        if isinstance(other, SortedSet) and other._numeric() == dtype:
+            return other._to_numpy(dtype)
+        if not isinstance(other, numpy.ndarray):
+            other = numpy.array(list(other))
+        if other.ndim != 1 or not numpy.can_cast(other.dtype, dtype, 'safe'):
+            return None
+        return _numpy_sorted_unique(other.astype(dtype))
+
+    def _combine(self, merge, others):
+        """
+        Sorted values, without duplicates, of self merged in turn with each of
+        others: a list, or a NumPy array on the NumPy path.
+        """
+        # iterators are read once
+        others = [other if isinstance(other, Sized) else list(other) for other in others]
+        values = self.tree
+        dtype = self._numeric()
+        if dtype is not None:
+            values = self._to_numpy(dtype)
+            while others:
+                operand = self._numpy_operand(others[0], dtype)
+                if operand is None:
+                    values = values.tolist()
+                    break
+                values = _NUMPY_MERGES[merge](values, operand)
+                others.pop(0)
+
+        for other in others:
+            values = merge(values, _sorted_unique(other))
+        if values is self.tree:
+            values = list(values)
+        return values
+
+    ##########################
+    # Bulk updates
+
+    def _merge_in_place(self, merge, other, apply):
+        """
+        self = merge(self, other): rebuilds from the merge when that pays off,
+        else calls apply with other sorted, to make the changes one by one.
+        """
+        if other is self or not isinstance(other, Sized):
+            other = list(other)
+        if self._rebuild_pays_off(len(other)):
+            self.tree = self._new_tree(self._combine(merge, [other]))
         else:
-            if immutable:
-                # use Okasaki's version
+            apply(_sorted_unique(other))
+
+    def _insert_sorted(self, values):
+        insert = self.tree.insert
+        for value in values:
+            insert(value)
+
+    def _discard_sorted(self, values):
+        delete = self.tree.delete
+        for value in values:
+            try:
+                delete(value)
+            except KeyError:
                 pass
+
+    def _toggle_sorted(self, values):
+        tree = self.tree
+        for value in values:
+            if value in tree:
+                tree.delete(value)
             else:
-                self.tree = RedBlackTree()
+                tree.insert(value)
+
+    def update(self, *others):
+        """
+        Adds the values of each iterable in others: sorted once, then merged in
+        (or inserted one by one, when few compared to the set).
+        """
+        for other in others:
+            self._merge_in_place(_union, other, self._insert_sorted)
+
+    def discard_many(self, iterable):
+        """
+        Removes the values of iterable that are in the set, like update adds them.
+        """
+        self._merge_in_place(_difference, iterable, self._discard_sorted)
+
+    def difference_update(self, *others):
+        for other in others:
+            self.discard_many(other)
+
+    def intersection_update(self, *others):
+        kept = self._combine(_intersection, others)
+        dropped = len(self.tree) - len(kept)
+        if self._rebuild_pays_off(dropped) or len(kept) < dropped:
+            self.tree = self._new_tree(kept)
+        else:
+            self._discard_sorted(_difference(self.tree, kept))
+
+    def symmetric_difference_update(self, other):
+        self._merge_in_place(_symmetric_difference, other, self._toggle_sorted)
+
+    def clear(self):
+        self.tree = self._factory()
+
+    ##########################
+    # Set algebra, returning new sets
+
+    def union(self, *others):
+        return self._from_sorted(self._combine(_union, others))
+
+    def intersection(self, *others):
+        return self._from_sorted(self._combine(_intersection, others))
+
+    def difference(self, *others):
+        return self._from_sorted(self._combine(_difference, others))
+
+    def symmetric_difference(self, other):
+        return self._from_sorted(self._combine(_symmetric_difference, [other]))
+
+    def __or__(self, other):
+        if not isinstance(other, Set):
+            return NotImplemented
+        return self.union(other)
+
+    def __and__(self, other):
+        if not isinstance(other, Set):
+            return NotImplemented
+        return self.intersection(other)
+
+    def __sub__(self, other):
+        if not isinstance(other, Set):
+            return NotImplemented
+        return self.difference(other)
+
+    def __xor__(self, other):
+        if not isinstance(other, Set):
+            return NotImplemented
+        return self.symmetric_difference(other)
+
+    __ror__ = __or__
+    __rand__ = __and__
+    __rxor__ = __xor__
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __iand__(self, other):
+        self.intersection_update(other)
+        return self
+
+    def __isub__(self, other):
+        self.difference_update(other)
+        return self
+
+    def __ixor__(self, other):
+        self.symmetric_difference_update(other)
+        return self
+
+    ##########################
+    # Single values
+
+    def add(self, value):
+        self.tree.insert(value)
 
     def insert(self, value):
         self.tree.insert(value)
 
+    def discard(self, value):
+        try:
+            self.tree.delete(value)
+        except KeyError:
+            pass
+
+    def delete(self, value):
+        """
+        Raises KeyError if value is not in the set.
+        """
+        self.tree.delete(value)
+
     def __contains__(self, value):
         return value in self.tree
 
-    def delete(self, value):
-        self.tree.delete(value)
\ No newline at end of file
+    def __len__(self):
+        return len(self.tree)
+
+    def __iter__(self):
+        return iter(self.tree)
+
+    def range(self, lo=None, hi=None):
+        """
+        Yields the values x with lo <= x < hi, in order. None means unbounded.
+        """
+        return self.tree.range(lo, hi)
+
+    def __repr__(self):
+        return 'SortedSet(%r, backend=%r)' % (list(self), self.backend)
+
+
+##########################
+# Backend benchmark
+#
+# Every workload gets a fresh set per run, built outside the timed section when
+# the workload doesn't measure building it.
+
+def _workload_random_inserts(backend, sample):
+    def run():
+        s = SortedSet(backend=backend)
+        for x in sample:
+            s.add(x)
+    return run
+
+
+def _workload_sorted_inserts(backend, sample):
+    ordered = sorted(sample)
+    def run():
+        s = SortedSet(backend=backend)
+        for x in ordered:
+            s.add(x)
+    return run
+
+
+def _workload_lookups(backend, sample):
+    s = SortedSet(sample, backend=backend)
+    probes = [x + 1 if i % 2 else x for i, x in enumerate(sample)]
+    def run():
+        for x in probes:
+            x in s
+    return run
+
+
+def _workload_deletes(backend, sample):
+    s = SortedSet(sample, backend=backend)
+    def run():
+        for x in sample:
+            s.discard(x)
+    return run
+
+
+def _workload_range_scans(backend, sample):
+    """
+    len(sample) / 100 scans, each over about 100 elements.
+    """
+    s = SortedSet(sample, backend=backend)
+    ordered = sorted(sample)
+    bounds = [(ordered[i], ordered[min(i + 100, len(ordered) - 1)])
+              for i in range(0, len(ordered), 100)]
+    def run():
+        for lo, hi in bounds:
+            for x in s.range(lo, hi):
+                pass
+    return run
+
+
+def _workload_set_algebra(backend, sample):
+    """
+    Union, intersection, difference and symmetric difference of two halves of the
+    sample, overlapping by half: 4 merges of len(sample) elements.
+    """
+    quarter = len(sample) // 4
+    s = SortedSet(sample[:2 * quarter], backend=backend)
+    t = SortedSet(sample[quarter:3 * quarter], backend=backend)
+    def run():
+        s | t
+        s & t
+        s - t
+        s ^ t
+    return run
+
+
+def _workload_bulk_updates(backend, sample):
+    """
+    update with half the sample on a set of the other half, then discard_many of
+    a quarter of it.
+    """
+    half = len(sample) // 2
+    def run():
+        s = SortedSet(sample[:half], backend=backend)
+        s.update(sample[half:])
+        s.discard_many(sample[::4])
+    return run
+
+
+def footprint(backend, sample):
+    """
+    Bytes allocated (tracemalloc) and kept by a set of the sample's values, built
+    value by value. The values exist before tracing starts: only the structure
+    is counted.
+    """
+    import tracemalloc
+
+    tracemalloc.start()
+    s = SortedSet(backend=backend)
+    for x in sample:
+        s.add(x)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return retained
+
+
+def snapshot_footprint(backend, sample, versions):
+    """
+    Bytes kept per version by a writer that snapshots the set before each change
+    (one insert and one delete) and keeps every snapshot: how memory grows with
+    the number of versions.
+    """
+    import tracemalloc
+
+    s = SortedSet(sample, backend=backend)
+    kept = []
+    tracemalloc.start()
+    for i in range(versions):
+        kept.append(s.snapshot())
+        s.add(-1 - i)
+        s.discard(sample[i % len(sample)])
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return retained / versions
+
+
+WORKLOADS = {
+    'random_inserts': _workload_random_inserts,
+    'sorted_inserts': _workload_sorted_inserts,
+    'lookups': _workload_lookups,
+    'deletes': _workload_deletes,
+    'range_scans': _workload_range_scans,
+    'set_algebra': _workload_set_algebra,
+    'bulk_updates': _workload_bulk_updates,
+}
+
+# sorted inserts make a plain BST a linked list: O(n^2)
+BST_SORTED_LIMIT = 20000
+
+
+def benchmark(sizes, backends=None, workloads=None, repeat=3, seed=0):
+    """
+    Runs every workload for every size and backend, returning a list of dicts with
+    the best wall time of `repeat` runs and the ops/sec derived from it (one op
+    per element of the sample, for scans one per element scanned).
+    """
+    import random
+    import time
+
+    results = []
+    for size in sizes:
+        rnd = random.Random(seed)
+        # even numbers, so odd probes miss
+        sample = [2 * x for x in rnd.sample(range(size * 10), size)]
+
+        for name in (workloads or list(WORKLOADS)):
+            for backend in (backends or sorted(BACKENDS)):
+                if name == 'sorted_inserts' and backend == 'bst' and size > BST_SORTED_LIMIT:
+                    continue
+
+                best = None
+                for _ in range(repeat):
+                    run = WORKLOADS[name](backend, sample)
+                    start = time.perf_counter()
+                    run()
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+
+                results.append({
+                    'workload': name,
+                    'backend': backend,
+                    'size': size,
+                    'seconds': best,
+                    'ops_per_sec': size / best if best else None,
+                })
+
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Benchmark SortedSet backends.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--backends', nargs='+', choices=sorted(BACKENDS))
+    parser.add_argument('--workloads', nargs='+', choices=list(WORKLOADS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--versions', type=int, default=100,
+                        help='snapshots kept by the snapshot memory benchmark')
+    parser.add_argument('--snapshot-backends', nargs='+', choices=sorted(BACKENDS),
+                        default=['persistent', 'blocks'])
+    parser.add_argument('--output', help='write JSON results to this file')
+    args = parser.parse_args()
+
+    results = benchmark(args.sizes, args.backends, args.workloads, args.repeat, args.seed)
+
+    print('%-15s %-12s %10s %12s %14s' % ('workload', 'backend', 'size', 'seconds', 'ops/sec'))
+    for r in results:
+        print('%-15s %-12s %10d %12.4f %14.0f' % (
+            r['workload'], r['backend'], r['size'], r['seconds'], r['ops_per_sec'] or 0))
+
+    import random
+    memory = []
+    print()
+    print('%-12s %10s %16s %14s' % ('backend', 'size', 'retained bytes', 'bytes/value'))
+    for size in args.sizes:
+        sample = random.Random(args.seed).sample(range(size * 10), size)
+        for backend in (args.backends or sorted(BACKENDS)):
+            retained = footprint(backend, sample)
+            memory.append({'backend': backend, 'size': size, 'retained_bytes': retained})
+            print('%-12s %10d %16d %14.1f' % (backend, size, retained, retained / size))
+
+    snapshots = []
+    print()
+    print('%-12s %10s %10s %18s' % ('backend', 'size', 'versions', 'bytes/version'))
+    for size in args.sizes:
+        sample = random.Random(args.seed).sample(range(size * 10), size)
+        for backend in args.snapshot_backends:
+            per_version = snapshot_footprint(backend, sample, args.versions)
+            snapshots.append({'backend': backend, 'size': size, 'versions': args.versions,
+                              'bytes_per_version': per_version})
+            print('%-12s %10d %10d %18.0f' % (backend, size, args.versions, per_version))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'timings': results, 'memory': memory, 'snapshots': snapshots}, f, indent=2)
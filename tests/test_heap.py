@@ -0,0 +1,393 @@
+import random
+import unittest
+
+from heap import (
+    WORKLOADS, Heap, HeapStats, IndexedHeap, PairingHeap, TopK, benchmark, merge_sorted)
+
+
+def assert_heap_order(testcase, heap):
+    keys = heap.keys
+    for i in range(1, len(keys)):
+        testcase.assertFalse(keys[i] < keys[heap._parent_of(i)])
+
+
+def assert_indexed(testcase, heap):
+    """
+    Heap order, plus every item's position pointing at its own slot.
+    """
+    assert_heap_order(testcase, heap)
+    testcase.assertEqual(len(heap.position), len(heap.array))
+    for i, entry in enumerate(heap.array):
+        testcase.assertEqual(heap.position[entry.item], i)
+
+
+class HeapBulkTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(1)
+
+    def test_insert_many_on_empty_heap(self):
+        heap = Heap()
+        values = [self.rng.randrange(1000) for _ in range(100)]
+        heap.insert_many(values)
+        assert_heap_order(self, heap)
+        self.assertEqual(len(heap), 100)
+        self.assertEqual(list(heap), sorted(values))
+
+    def test_insert_many_on_small_heap(self):
+        heap = Heap.from_iterable([5, 3])
+        heap.insert_many([4, 1, 2, 0, 6])
+        assert_heap_order(self, heap)
+        self.assertEqual(list(heap), [0, 1, 2, 3, 4, 5, 6])
+
+    def test_insert_many_on_large_heap(self):
+        values = [self.rng.random() for _ in range(5000)]
+        heap = Heap.from_iterable(values)
+        batch = [self.rng.random() - 0.5 for _ in range(300)]
+        heap.insert_many(batch)
+        heap.insert_many([])
+        assert_heap_order(self, heap)
+        self.assertEqual(list(heap), sorted(values + batch))
+
+    def test_heapify(self):
+        values = [self.rng.randrange(100) for _ in range(1000)]
+        for arity in (2, 3, 4):
+            heap = Heap(arity=arity)
+            heap.array.extend(values)
+            heap.heapify()
+            assert_heap_order(self, heap)
+            self.assertEqual(list(heap), sorted(values))
+            self.assertEqual(list(Heap.from_iterable(values, arity=arity)), sorted(values))
+
+    def test_key(self):
+        words = ['pear', 'fig', 'banana', 'kiwi', 'apple']
+        heap = Heap.from_iterable(words, key=len)
+        self.assertEqual(heap.keys, [len(word) for word in heap.array])
+        heap.insert_many(['plum', 'watermelon'])
+        assert_heap_order(self, heap)
+        self.assertEqual([len(word) for word in heap], [3, 4, 4, 4, 5, 6, 10])
+
+    def test_extract_min_after_batch(self):
+        heap = Heap()
+        heap.insert(10)
+        heap.insert_many([7, 12, 3])
+        self.assertEqual(heap.extract_min(), 3)
+        heap.insert(5)
+        self.assertEqual([heap.extract_min() for _ in range(4)], [5, 7, 10, 12])
+        self.assertRaises(IndexError, heap.extract_min)
+
+    def test_delete(self):
+        rng = random.Random(8)
+        for arity, key in ((2, None), (3, None), (4, lambda x: -x)):
+            values = [rng.randrange(100) for _ in range(200)]
+            heap = Heap.from_iterable(values, arity=arity, key=key)
+            for x in values[::3]:
+                heap.delete(x)
+                values.remove(x)
+                assert_heap_order(self, heap)
+            self.assertRaises(ValueError, heap.delete, 1000)
+            self.assertEqual(list(heap), sorted(values, key=key))
+
+        heap = Heap.from_iterable([4])
+        heap.delete(4)
+        self.assertEqual((heap.array, heap.keys), ([], []))
+
+
+class HeapArityTestCase(unittest.TestCase):
+
+    def test_arity(self):
+        rng = random.Random(4)
+        values = [rng.randrange(500) for _ in range(500)]
+        for arity in (3, 4, 8):
+            heap = Heap(arity=arity)
+            for x in values:
+                heap.insert(x)
+            assert_heap_order(self, heap)
+            self.assertEqual(heap._first_child_of(1), arity + 1)
+            self.assertEqual(heap._parent_of(arity + 1), 1)
+
+            extracted = [heap.extract_min() for _ in range(250)]
+            assert_heap_order(self, heap)
+            heap.insert_many(extracted[::2])
+            assert_heap_order(self, heap)
+            self.assertEqual(list(heap), sorted(extracted[::2] + sorted(values)[250:]))
+
+        self.assertRaises(ValueError, Heap, arity=1)
+
+
+class HeapTracerTestCase(unittest.TestCase):
+
+    def test_counts(self):
+        stats = HeapStats()
+        heap = Heap(tracer=stats)
+        # 3: nothing to compare; 2 and 1: one comparison and one swap each
+        for x in [3, 2, 1]:
+            heap.insert(x)
+        self.assertEqual(heap.array, [1, 3, 2])
+        self.assertEqual(stats.calls['insert'], 3)
+        self.assertEqual(stats.comparisons['insert'], 2)
+        self.assertEqual(stats.swaps['insert'], 2)
+        self.assertEqual(stats.max_depth['insert'], 1)
+
+        # [2, 3]: the root is compared with its only child and stays
+        self.assertEqual(heap.extract_min(), 1)
+        self.assertEqual((stats.comparisons['extract_min'], stats.swaps['extract_min']), (1, 0))
+
+        # heapify sifts 4 down one level (2 comparisons, one swap), then 5
+        # down two levels (2 + 2 comparisons, two swaps)
+        stats = HeapStats()
+        Heap.from_iterable([5, 4, 3, 2, 1], tracer=stats)
+        self.assertEqual(stats.calls, {'heapify': 1})
+        self.assertEqual(stats.comparisons['heapify'], 6)
+        self.assertEqual(stats.swaps['heapify'], 3)
+        self.assertEqual(stats.max_depth['heapify'], 2)
+
+    def test_custom_tracer(self):
+        calls = []
+        heap = Heap(tracer=lambda *args: calls.append(args))
+        heap.insert_many([2, 1])
+        heap.replace_min(5)
+        self.assertEqual([call[0] for call in calls], ['insert_many', 'replace_min'])
+
+
+class BenchmarkTestCase(unittest.TestCase):
+
+    def test_every_workload_runs(self):
+        results = benchmark([50], implementations=('heap', 'heap4', 'heapq', 'pairing'), repeat=1)
+        self.assertEqual(len(results), 4 * len(WORKLOADS))
+        for result in results:
+            self.assertGreater(result['seconds'], 0)
+            self.assertGreater(result['peak_bytes'], 0)
+
+
+class IndexedHeapTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.heap = IndexedHeap.from_iterable((chr(97 + i), p) for i, p in enumerate([9, 4, 7, 1, 8, 2, 6]))
+
+    def test_from_iterable(self):
+        assert_indexed(self, self.heap)
+        self.assertEqual(self.heap.find_min(), 'd')
+        self.assertRaises(ValueError, IndexedHeap.from_iterable, [('a', 1), ('a', 2)])
+
+    def test_decrease_key(self):
+        self.heap.decrease_key('a', 0)
+        assert_indexed(self, self.heap)
+        self.assertEqual(self.heap.find_min(), 'a')
+        self.assertEqual(self.heap.priority_of('a'), 0)
+        self.assertRaises(ValueError, self.heap.decrease_key, 'b', 5)
+        self.assertRaises(KeyError, self.heap.decrease_key, 'z', 0)
+
+    def test_increase_key(self):
+        self.heap.increase_key('d', 10)
+        assert_indexed(self, self.heap)
+        self.assertEqual(self.heap.find_min(), 'f')
+        self.assertRaises(ValueError, self.heap.increase_key, 'b', 3)
+
+        self.heap.update('b', 0)
+        self.heap.update('c', 20)
+        self.heap.update('z', 5)
+        assert_indexed(self, self.heap)
+        self.assertEqual(list(self.heap), ['b', 'f', 'z', 'g', 'e', 'a', 'd', 'c'])
+
+    def test_delete_interior(self):
+        # 'g' (6) sits below the root, with children
+        for item in ['g', 'b', 'a']:
+            self.heap.delete(item)
+            assert_indexed(self, self.heap)
+            self.assertNotIn(item, self.heap)
+        self.assertRaises(KeyError, self.heap.delete, 'g')
+        self.assertEqual(list(self.heap), ['d', 'f', 'c', 'e'])
+
+    def test_replace_min(self):
+        self.assertEqual(self.heap.replace_min('x', 5), 'd')
+        assert_indexed(self, self.heap)
+        self.assertNotIn('d', self.heap)
+        self.assertEqual(self.heap.priority_of('x'), 5)
+        self.assertRaises(ValueError, self.heap.replace_min, 'x', 3)
+        self.assertEqual(self.heap.extract_min(), 'f')
+
+    def test_insert_many(self):
+        self.heap.insert_many([('x', 3), ('y', 0)])
+        assert_indexed(self, self.heap)
+        self.assertEqual(self.heap.find_min(), 'y')
+
+    def test_insert_many_rejects_whole_batch(self):
+        heap = IndexedHeap()
+        heap.insert('a', 1)
+        self.assertRaises(ValueError, heap.insert_many, [('b', 2), ('a', 3)])
+        self.assertRaises(ValueError, heap.insert_many, [('c', 2), ('c', 3)])
+        assert_indexed(self, heap)
+        self.assertNotIn('b', heap)
+        self.assertNotIn('c', heap)
+        self.assertEqual(heap.position, {'a': 0})
+
+    def test_random_operations(self):
+        rng = random.Random(2)
+        heap = IndexedHeap(arity=3)
+        priorities = {}
+        for step in range(2000):
+            item = rng.randrange(200)
+            if item in priorities and rng.random() < 0.3:
+                heap.delete(item)
+                del priorities[item]
+            else:
+                priority = rng.random()
+                heap.update(item, priority)
+                priorities[item] = priority
+            if step % 100 == 0:
+                assert_indexed(self, heap)
+
+        assert_indexed(self, heap)
+        expected = sorted(priorities, key=priorities.get)
+        self.assertEqual(list(heap), expected)
+
+
+class MergeTestCase(unittest.TestCase):
+
+    def test_merge(self):
+        heap = Heap.from_iterable([5, 1, 9])
+        other = Heap.from_iterable([4, 0])
+        heap.merge(other)
+        self.assertEqual(len(other), 0)
+        self.assertEqual(list(heap), [0, 1, 4, 5, 9])
+
+        indexed = IndexedHeap.from_iterable([('a', 2), ('b', 1)])
+        indexed.merge(IndexedHeap.from_iterable([('c', 0)]))
+        assert_indexed(self, indexed)
+        self.assertEqual(list(indexed), ['c', 'b', 'a'])
+
+    def test_merge_with_itself(self):
+        for heap in (Heap.from_iterable([2, 1]), IndexedHeap.from_iterable([('a', 1)]),
+                     PairingHeap.from_iterable([2, 1])):
+            self.assertRaises(ValueError, heap.merge, heap)
+            self.assertGreater(len(heap), 0)
+
+
+class PairingHeapTestCase(unittest.TestCase):
+
+    def test_order(self):
+        rng = random.Random(6)
+        values = [rng.randrange(1000) for _ in range(1000)]
+        heap = PairingHeap.from_iterable(values)
+        self.assertEqual(len(heap), 1000)
+        self.assertEqual(list(heap), sorted(values))
+
+        heap = PairingHeap(key=lambda word: -len(word))
+        heap.insert_many(['fig', 'banana', 'kiwi'])
+        self.assertEqual(heap.extract_min(), 'banana')
+
+    def test_empty(self):
+        heap = PairingHeap()
+        self.assertRaises(IndexError, heap.extract_min)
+        self.assertRaises(IndexError, heap.find_min)
+        self.assertEqual(list(heap), [])
+
+    def test_decrease_key(self):
+        heap = PairingHeap()
+        nodes = {x: heap.insert(x) for x in [10, 20, 30, 40]}
+        heap.extract_min()
+        heap.decrease_key(nodes[40], 5)
+        self.assertEqual(heap.find_min(), 5)
+        heap.decrease_key(nodes[40], 1)
+        self.assertEqual(heap.find_min(), 1)
+        self.assertRaises(ValueError, heap.decrease_key, nodes[30], 35)
+        self.assertEqual(list(heap), [1, 20, 30])
+
+    def test_delete(self):
+        heap = PairingHeap()
+        nodes = [heap.insert(x) for x in range(20)]
+        heap.extract_min()
+        for x in (7, 1, 19):
+            heap.delete(nodes[x])
+        self.assertEqual(len(heap), 16)
+
+        for x in (0, 7):
+            self.assertRaises(ValueError, heap.delete, nodes[x])
+            self.assertRaises(ValueError, heap.decrease_key, nodes[x], -1)
+        self.assertEqual(list(heap), [x for x in range(2, 19) if x != 7])
+
+    def test_meld(self):
+        heap = PairingHeap.from_iterable([3, 8])
+        other = PairingHeap.from_iterable([1, 9, 4])
+        node = other.insert(6)
+        heap.merge(other)
+        heap.merge(PairingHeap())
+        self.assertEqual((len(heap), len(other), other.root), (6, 0, None))
+        heap.decrease_key(node, 0)
+        self.assertEqual(list(heap), [0, 1, 3, 4, 8, 9])
+
+    def test_handles_after_merge(self):
+        a = PairingHeap.from_iterable([5, 7])
+        b = PairingHeap.from_iterable([1, 2, 3])
+        old = a.insert(6)
+        b.merge(a)
+
+        # the handle now belongs to b only
+        self.assertRaises(ValueError, a.delete, old)
+        self.assertRaises(ValueError, a.decrease_key, old, 0)
+        self.assertEqual((len(a), len(b)), (0, 6))
+
+        # and follows b into a third heap, through chained merges
+        c = PairingHeap.from_iterable([4])
+        c.merge(b)
+        self.assertRaises(ValueError, b.delete, old)
+        c.delete(old)
+        self.assertRaises(ValueError, c.delete, old)
+        self.assertEqual(list(c), [1, 2, 3, 4, 5, 7])
+
+        # the emptied heap starts over with handles of its own
+        node = a.insert(9)
+        self.assertRaises(ValueError, c.delete, node)
+        a.delete(node)
+        self.assertEqual(len(a), 0)
+
+
+class TopKTestCase(unittest.TestCase):
+
+    def test_largest(self):
+        top = TopK(3)
+        top.push_many([5, 1, 9, 7, 3])
+        self.assertEqual(top.items(), [9, 7, 5])
+        self.assertEqual(top.threshold, 5)
+        self.assertFalse(top.push(4))
+        self.assertTrue(top.push(8))
+        self.assertEqual(top.items(), [9, 8, 7])
+
+    def test_smallest_with_key(self):
+        rng = random.Random(8)
+        words = [''.join(rng.choice('abc') for _ in range(rng.randrange(1, 20))) for _ in range(300)]
+        top = TopK(5, key=len, smallest=True)
+        top.push_many(words)
+        self.assertEqual([len(word) for word in top.items()], sorted(map(len, words))[:5])
+
+        top = TopK(5, key=len)
+        top.push_many(words)
+        self.assertEqual([len(word) for word in top.items()], sorted(map(len, words), reverse=True)[:5])
+        self.assertEqual(len(top), 5)
+        self.assertRaises(ValueError, TopK, 0)
+
+
+class MergeSortedTestCase(unittest.TestCase):
+
+    def test_merge(self):
+        self.assertEqual(list(merge_sorted([1, 4, 9], [2, 3], [], [0, 10])), [0, 1, 2, 3, 4, 9, 10])
+        self.assertEqual(list(merge_sorted()), [])
+
+    def test_stable(self):
+        left = [(1, 'a'), (2, 'a'), (2, 'b')]
+        right = [(1, 'x'), (2, 'x')]
+        merged = list(merge_sorted(left, right, key=lambda pair: pair[0]))
+        self.assertEqual(merged, [(1, 'a'), (1, 'x'), (2, 'a'), (2, 'b'), (2, 'x')])
+
+    def test_lazy(self):
+        pulled = []
+
+        def numbers(values):
+            for value in values:
+                pulled.append(value)
+                yield value
+
+        merged = merge_sorted(numbers([1, 5]), numbers([2, 3]))
+        self.assertEqual(next(merged), 1)
+        self.assertEqual(sorted(pulled), [1, 2])
@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import time
+import unittest
+from queue import Empty, Full
+
+from heapqueue import AsyncHeapQueue, HeapQueue
+
+
+class HeapQueueTestCase(unittest.TestCase):
+
+    def test_priority_order(self):
+        queue = HeapQueue(arity=4)
+        for x in [5, 1, 4, 2, 3]:
+            queue.put(x)
+        self.assertEqual(queue.qsize(), 5)
+        self.assertEqual([queue.get() for _ in range(5)], [1, 2, 3, 4, 5])
+        self.assertTrue(queue.empty())
+
+    def test_fifo_among_equal_priorities(self):
+        queue = HeapQueue(key=lambda task: task[0])
+        tasks = [(1, 'a'), (0, 'b'), (1, 'c'), (0, 'd'), (1, 'e')]
+        for task in tasks[:2]:
+            queue.put(task)
+        queue.put_many(tasks[2:])
+        self.assertEqual(queue.get_many(5), [(0, 'b'), (0, 'd'), (1, 'a'), (1, 'c'), (1, 'e')])
+
+        # items without an order of their own never get compared
+        queue = HeapQueue(key=lambda item: 0)
+        objects = [object() for _ in range(10)]
+        queue.put_many(objects)
+        self.assertEqual(queue.get_many(10), objects)
+
+    def test_timeouts(self):
+        queue = HeapQueue(maxsize=1)
+        self.assertRaises(Empty, queue.get, timeout=0.01)
+        self.assertRaises(Empty, queue.get_nowait)
+        queue.put(1)
+        self.assertTrue(queue.full())
+        start = time.monotonic()
+        self.assertRaises(Full, queue.put, 2, timeout=0.05)
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+        self.assertRaises(Full, queue.put_nowait, 2)
+        self.assertRaises(ValueError, queue.put, 2, timeout=-1)
+
+    def test_batches_without_blocking(self):
+        queue = HeapQueue(maxsize=3)
+        self.assertRaises(Empty, queue.get_many, 2, block=False)
+        queue.put_many([4, 2], block=False)
+        # the part that fits goes in before Full
+        self.assertRaises(Full, queue.put_many, [3, 1, 0], block=False)
+        self.assertEqual(queue.qsize(), 3)
+        self.assertEqual(queue.get_many(10, block=False), [2, 3, 4])
+
+    def test_get_many_of_nothing(self):
+        queue = HeapQueue()
+        self.assertEqual(queue.get_many(0), [])
+        self.assertEqual(queue.get_many(-1, block=False), [])
+        queue.put(1)
+        self.assertEqual(queue.get_many(0), [])
+        self.assertEqual(queue.qsize(), 1)
+
+    def test_blocked_get_wakes_up(self):
+        queue = HeapQueue()
+        results = []
+        consumer = threading.Thread(target=lambda: results.append(queue.get(timeout=5)))
+        consumer.start()
+        time.sleep(0.01)
+        queue.put(7)
+        consumer.join()
+        self.assertEqual(results, [7])
+
+
+class AsyncHeapQueueTestCase(unittest.TestCase):
+
+    def run_async(self, coroutine):
+        return asyncio.run(asyncio.wait_for(coroutine, 5))
+
+    def test_priority_and_fifo_order(self):
+        async def scenario():
+            queue = AsyncHeapQueue(key=lambda task: task[0])
+            for task in [(2, 'a'), (1, 'b'), (2, 'c')]:
+                await queue.put(task)
+            await queue.put_many([(1, 'd'), (0, 'e')])
+            return [await queue.get() for _ in range(5)]
+
+        self.assertEqual(self.run_async(scenario()), [(0, 'e'), (1, 'b'), (1, 'd'), (2, 'a'), (2, 'c')])
+
+    def test_nowait_and_timeouts(self):
+        async def scenario():
+            queue = AsyncHeapQueue(maxsize=2)
+            self.assertRaises(asyncio.QueueEmpty, queue.get_nowait)
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(queue.get(), 0.01)
+
+            queue.put_nowait(3)
+            queue.put_nowait(1)
+            self.assertRaises(asyncio.QueueFull, queue.put_nowait, 2)
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(queue.put(2), 0.01)
+
+            # timed out waiters are gone: the next put only waits for room
+            self.assertEqual(await queue.get_many(5), [1, 3])
+            await queue.put_many([5, 4])
+            return await queue.get_many(5)
+
+        self.assertEqual(self.run_async(scenario()), [4, 5])
+
+    def test_bounded_put_many_waits_for_room(self):
+        async def scenario():
+            queue = AsyncHeapQueue(maxsize=2)
+            producer = asyncio.ensure_future(queue.put_many([3, 1, 2]))
+            await asyncio.sleep(0)
+            self.assertFalse(producer.done())
+            first = await queue.get_many(2)
+            await producer
+            return first, await queue.get_many(2)
+
+        self.assertEqual(self.run_async(scenario()), ([1, 3], [2]))
+
+    def test_get_many_of_nothing(self):
+        async def scenario():
+            queue = AsyncHeapQueue()
+            first = await queue.get_many(0)
+            await queue.put(1)
+            return first, await queue.get_many(-1), queue.qsize()
+
+        self.assertEqual(self.run_async(scenario()), ([], [], 1))
+
+    def test_cancelled_get_passes_wakeup_on(self):
+        async def scenario():
+            queue = AsyncHeapQueue()
+            first = asyncio.ensure_future(queue.get())
+            second = asyncio.ensure_future(queue.get())
+            await asyncio.sleep(0)
+
+            # wakes the first getter up, which is cancelled before it runs
+            queue.put_nowait(42)
+            first.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await first
+            return await second
+
+        self.assertEqual(self.run_async(scenario()), 42)
+
+    def test_cancelled_get_leaves_no_waiter(self):
+        async def scenario():
+            queue = AsyncHeapQueue()
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.sleep(0)
+            getter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await getter
+            self.assertEqual(len(queue._getters), 0)
+
+            queue.put_nowait(1)
+            return await queue.get()
+
+        self.assertEqual(self.run_async(scenario()), 1)
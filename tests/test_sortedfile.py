@@ -0,0 +1,143 @@
+import os
+import tempfile
+import unittest
+
+from sortedfile import SortedFile, write_sorted
+
+
+class SortedFileTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'keys.idx')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def open(self, keys, typecode=None):
+        self.assertEqual(write_sorted(self.path, keys, typecode), len(keys))
+        keys = SortedFile(self.path)
+        self.addCleanup(keys.close)
+        return keys
+
+    def test_round_trips(self):
+        cases = [
+            ([-2 ** 63, -5, 0, 7, 2 ** 63 - 1], None, b'q'),
+            ([-1.5, 0.0, 0.25, 1e300], None, b'd'),
+            ([1, 2, 300], 'i', b'i'),
+            (['', 'a', 'ab', 'b', 'zürich', 'é', '中文', '😀'], None, b'u'),
+            ([b'', b'\x00', b'\x00\x01', b'a', b'\xff'], None, b'y'),
+        ]
+        for values, typecode, kind in cases:
+            with self.subTest(kind=kind):
+                keys = self.open(values, typecode)
+                self.assertEqual(keys.kind, kind)
+                self.assertEqual(len(keys), len(values))
+                self.assertEqual(list(keys), values)
+                self.assertEqual(list(reversed(keys)), values[::-1])
+                self.assertEqual([keys[i] for i in range(len(values))], values)
+                for value in values:
+                    self.assertIn(value, keys)
+
+    def test_empty(self):
+        for values, typecode in (([], None), ([], 'd'), (iter(()), None)):
+            with self.subTest(typecode=typecode):
+                self.assertEqual(write_sorted(self.path, values, typecode), 0)
+                with SortedFile(self.path) as keys:
+                    self.assertEqual(len(keys), 0)
+                    self.assertEqual(list(keys), [])
+                    self.assertEqual(keys[:], [])
+                    self.assertNotIn(0, keys)
+                    self.assertEqual(keys.rank(5), 0)
+                    self.assertEqual(list(keys.irange(0, 10)), [])
+                    self.assertRaises(IndexError, keys.__getitem__, 0)
+
+    def test_unsorted_input(self):
+        for values in ([1, 3, 2], [1, 2, 2], ['b', 'a'], [b'a', b'a'], [0.5, 0.5]):
+            with self.subTest(values=values):
+                self.assertRaises(ValueError, write_sorted, self.path, values)
+                self.assertEqual(os.listdir(self.directory.name), [])
+
+        # a failed rewrite leaves the previous file as it was
+        self.open([1, 2, 3])
+        self.assertRaises(ValueError, write_sorted, self.path, [5, 4])
+        self.assertRaises(TypeError, write_sorted, self.path, ['a', 5])
+        self.assertEqual(os.listdir(self.directory.name), ['keys.idx'])
+        with SortedFile(self.path) as keys:
+            self.assertEqual(list(keys), [1, 2, 3])
+
+    def test_rank_and_index(self):
+        keys = self.open([10, 20, 30])
+        self.assertEqual([keys.rank(x) for x in (5, 10, 15, 30, 35)], [0, 0, 1, 2, 3])
+        self.assertEqual(keys.index(20), 1)
+        self.assertRaises(ValueError, keys.index, 15)
+        self.assertRaises(ValueError, keys.index, 35)
+        self.assertEqual((keys.count(30), keys.count(31)), (1, 0))
+
+        words = self.open(['apple', 'pear', 'été'])
+        self.assertEqual(words.rank('banana'), 1)
+        self.assertEqual(words.index('été'), 2)
+        self.assertRaises(ValueError, words.index, 'fig')
+
+    def test_irange_bounds(self):
+        values = list(range(0, 100, 10))
+        keys = self.open(values)
+        for lo in (None, -5, 0, 25, 30, 90, 95):
+            for hi in (None, -5, 0, 25, 30, 90, 95):
+                for inclusive in ((True, True), (True, False), (False, True), (False, False)):
+                    expected = [x for x in values
+                                if (lo is None or (lo <= x if inclusive[0] else lo < x))
+                                and (hi is None or (x <= hi if inclusive[1] else x < hi))]
+                    self.assertEqual(list(keys.irange(lo, hi, inclusive)), expected,
+                                     (lo, hi, inclusive))
+
+        self.assertEqual(list(keys.range(20, 50)), [20, 30, 40])
+        self.assertEqual(list(keys.range(50, 20)), [])
+        self.assertEqual(list(keys.items_from(75)), [80, 90])
+
+        words = self.open(['a', 'b', 'c', 'd'])
+        self.assertEqual(list(words.irange('b', 'd', inclusive=(False, True))), ['c', 'd'])
+        self.assertEqual(list(words.range('b', 'd')), ['b', 'c'])
+
+    def test_indexing(self):
+        values = list(range(-20, 20, 3))
+        keys = self.open(values)
+        for i in range(-len(values), len(values)):
+            self.assertEqual(keys[i], values[i])
+        self.assertRaises(IndexError, keys.__getitem__, len(values))
+        self.assertRaises(IndexError, keys.__getitem__, -len(values) - 1)
+
+        slices = [slice(None), slice(2, 5), slice(-4, None), slice(None, -3), slice(5, 2),
+                  slice(None, None, 2), slice(None, None, -1), slice(-2, 1, -3), slice(100, 200)]
+        for part in slices:
+            self.assertEqual(keys[part], values[part], part)
+
+        words = self.open(['x', 'y', 'z'])
+        self.assertEqual((words[-1], words[::-2]), ('z', ['z', 'x']))
+
+    def test_membership_of_other_types(self):
+        numbers = self.open([1, 2, 3])
+        self.assertNotIn('a', numbers)
+        self.assertNotIn(None, numbers)
+        self.assertIn(2.0, numbers)
+
+        words = self.open(['1', '2'])
+        self.assertNotIn(1, words)
+        self.assertNotIn(b'1', words)
+        self.assertEqual(words.count(1), 0)
+
+    def test_close_in_with_block(self):
+        write_sorted(self.path, ['a', 'b'])
+        with SortedFile(self.path) as keys:
+            self.assertEqual(keys[0], 'a')
+            keys.close()
+        self.assertRaises(ValueError, keys.__getitem__, 0)
+
+        with SortedFile(self.path) as keys:
+            self.assertEqual(list(keys), ['a', 'b'])
+        self.assertRaises(ValueError, len, keys)
+
+    def test_not_a_sorted_file(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'x' * 40)
+        self.assertRaises(ValueError, SortedFile, self.path)
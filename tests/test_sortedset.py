@@ -0,0 +1,233 @@
+import os
+import random
+import tempfile
+import unittest
+
+from sortedset import BACKENDS, BlockList, SortedSet
+
+
+class SortedSetTestCase(unittest.TestCase):
+    """
+    Every test runs once per backend.
+    """
+
+    def setUp(self):
+        rng = random.Random(3)
+        self.values = rng.sample(range(-500, 500), 300)
+
+    def test_add_discard(self):
+        for backend in sorted(BACKENDS):
+            with self.subTest(backend=backend):
+                s = SortedSet(backend=backend)
+                expected = set()
+                for x in self.values + self.values[:50]:
+                    s.add(x)
+                    expected.add(x)
+                self.assertEqual(len(s), len(expected))
+                self.assertEqual(list(s), sorted(expected))
+
+                for x in self.values[::3] + [1000]:
+                    s.discard(x)
+                    expected.discard(x)
+                self.assertEqual(list(s), sorted(expected))
+                self.assertEqual(len(s), len(expected))
+                for x in range(-510, 510):
+                    self.assertEqual(x in s, x in expected)
+
+                self.assertRaises(KeyError, s.delete, 1000)
+                s.clear()
+                self.assertEqual((len(s), list(s)), (0, []))
+
+    def test_range(self):
+        ordered = sorted(self.values)
+        for backend in sorted(BACKENDS):
+            with self.subTest(backend=backend):
+                s = SortedSet(self.values, backend=backend)
+                self.assertEqual(list(s.range(-100, 100)), [x for x in ordered if -100 <= x < 100])
+                self.assertEqual(list(s.range(ordered[10], ordered[20])), ordered[10:20])
+                self.assertEqual(list(s.range(hi=ordered[5])), ordered[:5])
+                self.assertEqual(list(s.range(ordered[-3])), ordered[-3:])
+                self.assertEqual(list(s.range(1000)), [])
+                self.assertEqual(list(s.range()), ordered)
+
+    def test_backend_factory(self):
+        s = SortedSet([3, 1, 2], backend=lambda: BACKENDS['array']())
+        self.assertEqual(list(s), [1, 2, 3])
+        self.assertEqual(list(s | {0}), [0, 1, 2, 3])
+        self.assertRaises(KeyError, SortedSet, backend='nope')
+
+    def test_set_algebra(self):
+        rng = random.Random(4)
+        a = set(rng.sample(range(300), 150))
+        b = set(rng.sample(range(100, 400), 150))
+        c = set(rng.sample(range(0, 400, 3), 60))
+        for backend in sorted(BACKENDS):
+            with self.subTest(backend=backend):
+                s = SortedSet(a, backend=backend)
+                t = SortedSet(b, backend=s.backend)
+                results = [
+                    (s | t, a | b), (s & t, a & b), (s - t, a - b), (s ^ t, a ^ b),
+                    (s | b, a | b), (b | s, a | b), (b & s, a & b), (b ^ s, a ^ b),
+                    (s.union(b, c), a | b | c), (s.intersection(b, c), a & b & c),
+                    (s.difference(b, c), a - b - c), (s.symmetric_difference(list(b)), a ^ b),
+                    (s.union(iter(c)), a | c),
+                ]
+                for result, expected in results:
+                    self.assertIsInstance(result, SortedSet)
+                    self.assertEqual(result.backend, s.backend)
+                    self.assertEqual(list(result), sorted(expected))
+                    self.assertEqual(len(result), len(expected))
+                # operands are left alone
+                self.assertEqual(list(s), sorted(a))
+
+    def test_in_place_algebra(self):
+        rng = random.Random(6)
+        a = set(rng.sample(range(300), 150))
+        for operand in (set(rng.sample(range(100, 400), 150)), {5, 7}, set()):
+            for backend in sorted(BACKENDS):
+                with self.subTest(backend=backend):
+                    s = SortedSet(a, backend=backend)
+                    expected = set(a)
+                    s |= operand
+                    expected |= operand
+                    self.assertEqual(list(s), sorted(expected))
+                    s &= set(range(0, 400, 2)) | operand
+                    expected &= set(range(0, 400, 2)) | operand
+                    self.assertEqual(list(s), sorted(expected))
+                    s -= operand
+                    expected -= operand
+                    self.assertEqual(list(s), sorted(expected))
+                    s ^= operand
+                    expected ^= operand
+                    self.assertEqual(list(s), sorted(expected))
+                    self.assertEqual(len(s), len(expected))
+
+                    s.update(range(10), [400, 401])
+                    s.discard_many(range(5))
+                    s.difference_update([400], [401])
+                    expected = (expected | set(range(10))) - set(range(5))
+                    self.assertEqual(list(s), sorted(expected))
+
+    def test_intersection_update_without_arguments(self):
+        for backend in sorted(BACKENDS):
+            with self.subTest(backend=backend):
+                s = SortedSet(self.values, backend=backend)
+                s.intersection_update()
+                self.assertEqual(list(s), sorted(self.values))
+                self.assertEqual(list(s.intersection()), sorted(self.values))
+                s &= s
+                self.assertEqual(len(s), len(self.values))
+
+    def test_snapshot_isolation(self):
+        ordered = sorted(self.values)
+        for backend in sorted(BACKENDS):
+            with self.subTest(backend=backend):
+                s = SortedSet(self.values, backend=backend)
+                snapshot = s.snapshot()
+                self.assertEqual(snapshot.backend, s.backend)
+                self.assertEqual(list(snapshot), ordered)
+
+                # neither side sees the other's changes
+                s.add(1000)
+                s.discard(ordered[0])
+                snapshot.add(-1000)
+                snapshot.discard(ordered[-1])
+                self.assertEqual(list(s), ordered[1:] + [1000])
+                self.assertEqual(list(snapshot), [-1000] + ordered[:-1])
+                self.assertNotIn(-1000, s)
+                self.assertIn(ordered[0], snapshot)
+
+                older = snapshot.snapshot()
+                snapshot.clear()
+                self.assertEqual(len(older), len(ordered))
+                self.assertEqual(list(s.range(-100, 100)), [x for x in ordered[1:] if -100 <= x < 100])
+
+    def test_persistent_snapshot_shares_the_tree(self):
+        s = SortedSet(self.values, backend='persistent')
+        snapshot = s.snapshot()
+        self.assertIs(snapshot.tree.tree, s.tree.tree)
+        s.add(1000)
+        self.assertIsNot(snapshot.tree.tree, s.tree.tree)
+        self.assertNotIn(1000, snapshot)
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'set.idx')
+            for backend in sorted(BACKENDS):
+                with self.subTest(backend=backend):
+                    s = SortedSet(self.values, backend=backend)
+                    self.assertEqual(s.save(path), len(self.values))
+                    loaded = SortedSet.load(path, backend=backend)
+                    self.assertEqual(loaded.backend, s.backend)
+                    self.assertEqual(list(loaded), sorted(self.values))
+                    loaded.add(1000)
+                    self.assertEqual(len(loaded), len(self.values) + 1)
+
+            SortedSet(backend='array').save(path)
+            self.assertEqual(len(SortedSet.load(path)), 0)
+            self.assertEqual(os.listdir(directory), ['set.idx'])
+
+
+class BlockListTestCase(unittest.TestCase):
+
+    def check_blocks(self, blocks):
+        self.assertEqual(blocks.maxes, [block[-1] for block in blocks.blocks])
+        self.assertEqual(blocks.size, sum(map(len, blocks.blocks)))
+        values = list(blocks)
+        self.assertEqual(values, sorted(set(values)))
+        for block in blocks.blocks:
+            self.assertLessEqual(len(block), 2 * blocks.load)
+
+    def test_split(self):
+        blocks = BlockList(load=4)
+        for x in range(8):
+            blocks.insert(x)
+        self.assertEqual(len(blocks.blocks), 1)
+
+        # the ninth value overflows 2 * load: halves of 4 and 5
+        blocks.insert(8)
+        self.assertEqual([list(block) for block in blocks.blocks], [[0, 1, 2, 3], [4, 5, 6, 7, 8]])
+        self.check_blocks(blocks)
+
+        blocks.insert(3)
+        self.assertEqual(len(blocks), 9)
+
+    def test_merge(self):
+        blocks = BlockList(load=4)
+        blocks.load_sorted(list(range(12)))
+        self.assertEqual([len(block) for block in blocks.blocks], [4, 4, 4])
+
+        # under load // 2 values, a block joins the previous one
+        blocks.delete(5)
+        blocks.delete(6)
+        blocks.delete(4)
+        self.assertEqual([list(block) for block in blocks.blocks], [[0, 1, 2, 3, 7], [8, 9, 10, 11]])
+        self.check_blocks(blocks)
+
+        # the first block takes the next one instead
+        for x in (0, 1, 2, 3):
+            blocks.delete(x)
+        self.assertEqual([list(block) for block in blocks.blocks], [[7, 8, 9, 10, 11]])
+        self.assertRaises(KeyError, blocks.delete, 0)
+
+        for x in (7, 8, 9, 10, 11):
+            blocks.delete(x)
+        self.assertEqual((blocks.blocks, blocks.maxes, len(blocks)), ([], [], 0))
+        self.assertRaises(KeyError, blocks.delete, 7)
+
+    def test_random_changes(self):
+        rng = random.Random(5)
+        for typecode in (None, 'q'):
+            blocks = BlockList(load=8, typecode=typecode)
+            expected = set()
+            for _ in range(3000):
+                x = rng.randrange(400)
+                if rng.random() < 0.6:
+                    blocks.insert(x)
+                    expected.add(x)
+                elif x in expected:
+                    blocks.delete(x)
+                    expected.discard(x)
+            self.check_blocks(blocks)
+            self.assertEqual(list(blocks), sorted(expected))
+            self.assertEqual(list(blocks.range(100, 200)), [x for x in sorted(expected) if 100 <= x < 200])